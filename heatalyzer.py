@@ -0,0 +1,196 @@
+##Command line entrypoint to run the simulate-and-analyse pipeline without the web interface
+import argparse
+import glob
+import json
+import os
+import sys
+from pathlib import Path
+
+script_dir = Path(__file__).parent
+sys.path.append(str(script_dir / 'pages'))
+
+from utils.app_pipeline import run_pipeline
+from utils.app_preprocessing import fidelity_presets
+from utils.app_fidelity import compare_fidelity
+from utils.app_catalog import list_runs, collect_garbage
+from utils.app_compaction import compact_runs
+from utils.app_epw_cache import prune_cache, max_cache_bytes
+from utils.app_ingest import extract_archive, validate_inputs
+from utils.app_workspace import new_run_id, run_workspace, read_manifest
+from utils.app_surrogate import add_screening_scenarios
+from utils.app_weather_years import scan_years, hottest_year, export_years
+from utils.app_screening import screen_weathers, screening_statistics, default_screening_metric
+
+
+#Expand files, directories and glob patterns into a sorted list of files with the given extension
+def collect_files(patterns, extension):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*' + extension))
+        else:
+            matches = glob.glob(pattern)
+        files.extend(path for path in matches if path.lower().endswith(extension) and os.path.isfile(path))
+    return sorted(set(files))
+
+
+def print_progress(stage, fraction, text):
+    print(f'[{stage}] {fraction:4.0%} {text}', file=sys.stderr, flush=True)
+
+
+def run(args):
+
+    run_id = args.run_id or new_run_id()
+
+    buildings = [(os.path.basename(path), path) for path in collect_files(args.buildings, '.idf')]
+    weathers = [(os.path.basename(path), path) for path in collect_files(args.weather, '.epw')]
+
+    #Archives are extracted into the inputs folder of the run
+    for archive in args.archive:
+        archive_buildings, archive_weathers = extract_archive(archive, os.path.join(run_workspace(args.output, run_id), 'inputs'))
+        buildings += archive_buildings
+        weathers += archive_weathers
+
+    if not buildings or not weathers:
+        raise ValueError('At least one building (.idf) and one weather (.epw) file is required')
+
+    errors = validate_inputs(buildings, weathers)
+    if errors:
+        raise ValueError('Invalid input files: ' + '; '.join(errors))
+
+    settings = {}
+    if args.config:
+        with open(args.config) as f:
+            settings = json.load(f)
+    if args.rerun_all:
+        settings['rerun_all'] = True
+    if args.fidelity:
+        settings['fidelity'] = args.fidelity
+
+    #Run with the full and the given preset and report the runtime saved and the error of the hottest-week results
+    if args.compare_fidelity:
+        comparison = compare_fidelity(buildings, weathers, settings, args.output, args.jobs,
+                                      None if args.quiet else print_progress, args.compare_fidelity)
+        return {'status': 'ok', 'buildings': [path for _, path in buildings], 'weather': [path for _, path in weathers],
+                'comparison': comparison}
+
+    result = run_pipeline(buildings, weathers, settings, args.output, args.jobs,
+                          None if args.quiet else print_progress, run_id)
+
+    return {'status': 'ok', 'buildings': [path for _, path in buildings], 'weather': [path for _, path in weathers], **result}
+
+
+def runs(args):
+    return {'status': 'ok', 'runs': [{key: run[key] for key in ('run_id', 'created', 'building_names', 'weather_folders', 'data_path')}
+                                     for run in list_runs(args.output)]}
+
+
+def gc(args):
+    max_size_bytes = None if args.max_size_gb is None else int(args.max_size_gb * 1e9)
+    max_cache_size = max_cache_bytes if args.max_cache_gb is None else int(args.max_cache_gb * 1e9)
+    return {'status': 'ok', **collect_garbage(args.output, args.max_age_days, max_size_bytes, args.keep),
+            'cache': prune_cache(max_cache_size)}
+
+
+def compact(args):
+    max_size_bytes = None if args.max_size_gb is None else int(args.max_size_gb * 1e9)
+    return {'status': 'ok', **compact_runs(args.output, args.max_age_days, max_size_bytes, args.keep)}
+
+
+#Predict new weather scenarios of a completed run with its surrogate models instead of simulating them
+def predict(args):
+    weathers = [(os.path.basename(path), path) for path in collect_files(args.weather, '.epw')]
+    if not weathers:
+        raise ValueError('At least one weather (.epw) file is required')
+    manifest = add_screening_scenarios(read_manifest(run_workspace(args.output, args.run_id)), weathers, args.output,
+                                       None if args.quiet else print_progress)
+    return {'status': 'ok', 'run_id': args.run_id, 'weather_folders': manifest['weather_folders'], 'surrogate': manifest['surrogate']}
+
+
+#Rank weather scenarios by their outdoor heat without simulating them
+def screen(args):
+    weathers = [(os.path.basename(path), path) for path in collect_files(args.weather, '.epw')]
+    if not weathers:
+        raise ValueError('At least one weather (.epw) file is required')
+    selected, table = screen_weathers(weathers, args.threshold, args.metric, args.min_severity, not args.keep_duplicates)
+    return {'status': 'ok', 'selected': [path for _, path in selected], 'screening': table.to_dict(orient='records')}
+
+
+#Hottest week of every year of a multi-year weather file, and the selected years as single-year files
+def years(args):
+    weather_years = scan_years(args.weather)
+    report = {'status': 'ok', 'weather': args.weather, 'hottest_year': hottest_year(weather_years),
+              'years': weather_years.to_dict(orient='records')}
+    if args.export:
+        report['files'] = export_years(args.weather, args.export, args.output)
+    return report
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='heatalyzer', description='Heatalyzer batch runs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Preprocess, simulate and postprocess building and weather files')
+    run_parser.add_argument('--buildings', nargs='+', default=[], help='IDF files, directories or glob patterns')
+    run_parser.add_argument('--weather', nargs='+', default=[], help='EPW files, directories or glob patterns')
+    run_parser.add_argument('--archive', nargs='+', default=[], help='Zip or tar archives of IDF and EPW files')
+    run_parser.add_argument('--config', help='JSON file with baseline, start_month, summer_months, metrics_thresholds, rerun_all, screening, fidelity and compact')
+    run_parser.add_argument('--output', default='Output', help='Output folder (default: Output)')
+    run_parser.add_argument('--run-id', help='Run to (re)use; a new run is created if not given')
+    run_parser.add_argument('--jobs', type=int, default=1, help='Number of EnergyPlus simulations to run in parallel')
+    run_parser.add_argument('--rerun-all', action='store_true', help='Rerun simulations that have been run before')
+    run_parser.add_argument('--fidelity', choices=list(fidelity_presets), help='Simulation fidelity preset (default: full)')
+    run_parser.add_argument('--compare-fidelity', choices=[preset for preset in fidelity_presets if preset != 'full'],
+                            help='Run with this and the full preset and compare their runtime and hottest-week results')
+    run_parser.add_argument('--quiet', action='store_true', help='Do not report progress on stderr')
+
+    runs_parser = subparsers.add_parser('runs', help='List the completed runs')
+    runs_parser.add_argument('--output', default='Output', help='Output folder (default: Output)')
+
+    gc_parser = subparsers.add_parser('gc', help='Remove old runs')
+    gc_parser.add_argument('--output', default='Output', help='Output folder (default: Output)')
+    gc_parser.add_argument('--max-age-days', type=float, help='Remove runs older than this')
+    gc_parser.add_argument('--max-size-gb', type=float, help='Remove the oldest runs until all runs fit into this size')
+    gc_parser.add_argument('--keep', nargs='*', default=[], help='Run ids never to remove')
+    gc_parser.add_argument('--max-cache-gb', type=float,
+                           help=f'Remove the least recently used parsed weather files until the cache fits into this size (default: {max_cache_bytes / 1e9:g})')
+
+    compact_parser = subparsers.add_parser('compact', help='Delete or compress the EnergyPlus artifacts of runs that were not compacted')
+    compact_parser.add_argument('--output', default='Output', help='Output folder (default: Output)')
+    compact_parser.add_argument('--max-age-days', type=float, help='Compact runs older than this')
+    compact_parser.add_argument('--max-size-gb', type=float, help='Compact the oldest runs until all runs fit into this size')
+    compact_parser.add_argument('--keep', nargs='*', default=[], help='Run ids never to compact')
+
+    predict_parser = subparsers.add_parser('predict', help='Predict weather files for the buildings of a run without EnergyPlus')
+    predict_parser.add_argument('--run-id', required=True, help='Completed run whose simulations train the surrogate models')
+    predict_parser.add_argument('--weather', nargs='+', default=[], help='EPW files, directories or glob patterns')
+    predict_parser.add_argument('--output', default='Output', help='Output folder (default: Output)')
+    predict_parser.add_argument('--quiet', action='store_true', help='Do not report progress on stderr')
+
+    screen_parser = subparsers.add_parser('screen', help='Rank weather files by their outdoor heat before simulating them')
+    screen_parser.add_argument('--weather', nargs='+', default=[], help='EPW files, directories or glob patterns')
+    screen_parser.add_argument('--threshold', type=float, default=30, help='Temperature threshold of the Degree hours (default: 30)')
+    screen_parser.add_argument('--metric', default=default_screening_metric, choices=screening_statistics, help='Statistic to rank by')
+    screen_parser.add_argument('--min-severity', type=float, help='Skip weather files whose metric is below this')
+    screen_parser.add_argument('--keep-duplicates', action='store_true', help='Do not skip weather files with identical content')
+
+    years_parser = subparsers.add_parser('years', help='Find the hottest week of every year of a multi-year weather file')
+    years_parser.add_argument('weather', help='EPW file with one or more years of hourly data')
+    years_parser.add_argument('--export', nargs='+', type=int, default=[], help='Years to write as single-year EPW files')
+    years_parser.add_argument('--output', default='Extreme Weather/Years', help='Folder of the exported years (default: Extreme Weather/Years)')
+
+    args = parser.parse_args(argv)
+    commands = {'run': run, 'runs': runs, 'gc': gc, 'compact': compact, 'predict': predict, 'screen': screen, 'years': years}
+
+    try:
+        report = commands[args.command](args)
+    except Exception as e:
+        report = {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+
+    print(json.dumps(report, indent=2, default=str))
+    return 0 if report['status'] == 'ok' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
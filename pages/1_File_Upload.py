@@ -1,14 +1,22 @@
 import streamlit as st
 import os
+import pandas as pd
+import shutil
+import tarfile
+import zipfile
 from pathlib import Path
 import sys
 
 script_dir = Path(__file__).parent
 sys.path.append(str(script_dir))
 
-from utils.app_preprocessing import preprocess
-from utils.app_BEM import BEM_simulation
-from utils.app_postprocessing import postprocess
+from utils.app_pipeline import run_pipeline
+from utils.app_workspace import new_run_id, run_workspace, read_manifest, manifest_file_name
+from utils.app_surrogate import add_screening_scenarios, screening_suffix
+from utils.app_ingest import extract_archive, scan_server_directory, server_input_root, validate_inputs
+from utils.app_postprocessing import summer_month_range
+from utils.app_preprocessing import fidelity_presets
+from utils.app_screening import screen_weathers, screening_statistics, default_screening_metric
 
 st.set_page_config(page_title='File Upload')
 
@@ -38,6 +46,15 @@ if 'start_month' not in st.session_state:
 if 'rerun_all' not in st.session_state:
     st.session_state.rerun_all = False
 
+#Every session simulates in its own run workspace, so concurrent users never share files
+if 'run_id' not in st.session_state:
+    st.session_state.run_id = new_run_id()
+
+
+input_sources = ['Upload files', 'Upload archive', 'Server directory']
+
+#Archive types accepted for bulk uploads
+archive_types = ['zip', 'tar', 'gz', 'tgz', 'bz2', 'xz']
 
 months = ['January', 'February', 'March', 'April', 'May', 'June','July', 'August', 'September', 'October', 'November', 'December']
 
@@ -46,20 +63,21 @@ def main():
 
     st.markdown("Please upload your building and weather data files.")
 
-    st.subheader('Building Data')
-    building_files = st.file_uploader('Upload Building Data Files', accept_multiple_files=True, type='idf')
-    st.markdown('**Note**: The tool supports IDF files of version 23.1.0. You can upload a maximum of 10 building files at a time for analysis.')
+    input_source = st.radio('Input source', input_sources, horizontal=True)
 
-    st.subheader('Weather Data')
-    weather_files = st.file_uploader('Upload Weather Data Files', accept_multiple_files=True, type='epw',
-                                     key='weather')
-    st.markdown('**Note**: The tool supports EPW files. You can upload a maximum of 5 weather files at a time for analysis.')
+    #Building and weather files as lists of (file name, uploaded file or path)
+    if input_source == 'Upload files':
+        building_files, weather_files = upload_files()
+    elif input_source == 'Upload archive':
+        building_files, weather_files = upload_archive()
+    else:
+        building_files, weather_files = server_directory()
 
     if weather_files:
         st.markdown('---')
 
         baseline_weather_file = st.radio("Select a Baseline Weather File:",
-                                         [file.name for file in weather_files], key='baseline_weather')
+                                         [name for name, _ in weather_files], key='baseline_weather')
 
     if weather_files and building_files:
         st.markdown('---')
@@ -76,12 +94,7 @@ def main():
         start_index = months.index(start_month) + 1
         end_index = months.index(end_month) + 1
 
-        if end_index < start_index:
-            summer_months_indices = list(range(start_index, 13)) + list(range(1, end_index + 1))
-        else:
-            summer_months_indices = list(range(start_index, end_index + 1))
-
-        st.session_state.summer_months = summer_months_indices
+        st.session_state.summer_months = summer_month_range(start_index, end_index)
 
         st.markdown('---')
 
@@ -100,85 +113,191 @@ def main():
 
         st.markdown('---')
 
-        st.markdown('**Note**: The tool is designed to avoid rerunning previously simulated scenarios. Should you wish to rerun all simulations, including those previously executed, please select the "Re-run All" option. Without this selection, scenarios sharing identical weather and building file names as past simulations will not be processed again.')
+        screening = weather_screening(weather_files, baseline_weather_file)
+
+        st.markdown('---')
+
+        st.markdown('Select the simulation fidelity ("screening" runs faster with fewer timesteps and warm-up days, for a first triage):')
+        fidelity = st.selectbox('Fidelity', list(fidelity_presets), index=0)
+
+        st.markdown('---')
+
+        st.markdown('**Note**: Every browser session simulates in its own run. Within this session, scenarios with the same building and weather file names as earlier simulations of the same fidelity are not simulated again; select "Re-run simulations" to simulate them all. Simulations of other sessions and past runs are not reused, so opening this page in a new session simulates all scenarios.')
 
         rerun_all = st.checkbox('Re-run simulations', value=False)
         st.session_state.rerun_all = rerun_all
 
+        #EnergyPlus artifacts that are not needed for reruns or the results are removed unless they are kept
+        keep_artifacts = st.checkbox('Keep all EnergyPlus output files', value=False)
+
         if st.button('Simulate'):
-            if len(weather_files) > 5 or len(building_files) > 10:
+            if input_source == 'Upload files' and (len(weather_files) > 5 or len(building_files) > 10):
                 st.error('Please upload no more than 10 building and 5 weather files.')
             elif validate_files(building_files, '.idf') and validate_files(weather_files, '.epw'):
-                baseline_file = next((file for file in weather_files if file.name == baseline_weather_file), None).name
-                st.session_state.baseline_file=os.path.splitext(baseline_file)[0]
+                errors = validate_inputs(building_files, weather_files)
+                if errors:
+                    st.error('File validation failed:\n\n' + '\n\n'.join(errors))
+                    return
+                st.session_state.baseline_file=os.path.splitext(baseline_weather_file)[0]
                 st.success('Files validated. Starting simulation...')
-                create_folders_and_move_files(building_files, weather_files)
-                run_simulation()
+                run_simulation(building_files, weather_files, screening, fidelity, not keep_artifacts)
                 st.session_state.current_page = 'results'
                 st.success('Processing finished. You can view the results!')
             else:
                 st.error('File validation failed. Please upload correct file types.')
 
-def validate_files(files, extension):
-    return all(file.name.endswith(extension) for file in files) if files else False
+    screening_predictions()
 
-def create_folders_and_move_files(building_files, weather_files):
 
-    #Define and create folder for outputs
-    output_folder = 'Output'
-    os.makedirs(output_folder, exist_ok=True)
+def upload_files():
 
-    simulation_folders = []
-    building_folders = []
-    weather_folders = []
-    building_names = []
+    st.subheader('Building Data')
+    building_files = st.file_uploader('Upload Building Data Files', accept_multiple_files=True, type='idf')
+    st.markdown('**Note**: The tool supports IDF files of version 23.1.0. You can upload a maximum of 10 building files at a time for analysis.')
 
-    #Create one output folder for each building and copy over building and weather data for that simulation
-    for building_file in building_files:
-        building_name = os.path.splitext(building_file.name)[0]
-        building_names.append(building_name)
-        building_folder = os.path.join(output_folder, building_name)
-        building_folders.append(building_folder)
-        os.makedirs(building_folder, exist_ok=True)
+    st.subheader('Weather Data')
+    weather_files = st.file_uploader('Upload Weather Data Files', accept_multiple_files=True, type='epw',
+                                     key='weather')
+    st.markdown('**Note**: The tool supports EPW files. You can upload a maximum of 5 weather files at a time for analysis.')
+
+    return [(file.name, file) for file in building_files or []], [(file.name, file) for file in weather_files or []]
+
+
+#Extract an uploaded archive once into the inputs folder of the session's run, not again on every rerun of the page
+def upload_archive():
+
+    st.subheader('Building and Weather Data')
+    archive = st.file_uploader('Upload a zip or tar archive of building (IDF) and weather (EPW) files', type=archive_types)
+    st.markdown('**Note**: Files are taken from all folders of the archive; there is no limit on the number of files.')
+
+    if not archive:
+        return [], []
+
+    archive_key = (archive.name, archive.size)
+    if st.session_state.get('archive_key') != archive_key:
+        inputs_folder = os.path.join(run_workspace('Output', st.session_state.run_id), 'inputs')
+        shutil.rmtree(inputs_folder, ignore_errors=True)
+        try:
+            st.session_state.archive_inputs = extract_archive(archive, inputs_folder)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            st.error(f'The archive cannot be read: {e}')
+            return [], []
+        st.session_state.archive_key = archive_key
+
+    building_files, weather_files = st.session_state.archive_inputs
+    st.markdown(f'Found {len(building_files)} building and {len(weather_files)} weather files.')
+    return building_files, weather_files
 
-        for weather_file in weather_files:
-            weather_folder = os.path.splitext(weather_file.name)[0]
-            final_dir = os.path.join(building_folder, weather_folder)
-            simulation_folders.append(final_dir)
-            os.makedirs(final_dir, exist_ok=True)
 
-            # Copy building file
-            building_file_path = os.path.join(final_dir, 'in.idf')
-            with open(building_file_path, "wb") as f:
-                f.write(building_file.getbuffer())
+#Use the files of a directory on the server in place, without uploading them
+#Only directories under the input root of the server (HEATALYZER_INPUT_ROOT) can be used
+def server_directory():
 
-            # Copy weather file
-            weather_file_path = os.path.join(final_dir, 'weather.epw')
-            with open(weather_file_path, "wb") as f:
-                f.write(weather_file.getbuffer())
+    st.subheader('Building and Weather Data')
+    directory = st.text_input(f'Directory under {os.path.abspath(server_input_root)} with building (IDF) and weather (EPW) files')
 
-    for weather_file in weather_files:
-        weather_folder = os.path.splitext(weather_file.name)[0]
-        weather_folders.append(weather_folder)
+    if not directory:
+        return [], []
+    try:
+        building_files, weather_files = scan_server_directory(directory)
+    except ValueError as e:
+        st.error(f'{e}.')
+        return [], []
 
-    st.session_state.weather_folders = weather_folders
-    st.session_state.building_folders = building_folders
-    st.session_state.simulation_folders = simulation_folders
-    st.session_state.building_names = building_names
+    st.markdown(f'Found {len(building_files)} building and {len(weather_files)} weather files.')
+    return building_files, weather_files
 
 
-def run_simulation():
+#Optional screening of the weather scenarios by their outdoor heat before simulating; returns the screening settings or None
+def weather_screening(weather_files, baseline_weather_file):
 
-    #Preprocess building input files to configure variables for thermal comfort computations
-    preprocess(st.session_state.simulation_folders)
+    st.markdown('Screen the weather scenarios by their outdoor heat before simulating:')
+    if not st.checkbox('Screen weather scenarios', value=False, key='screen_weather'):
+        return None
 
-    #Run EnergyPlus simulations for the input building and weather file combinations
-    BEM_simulation(st.session_state.simulation_folders)
+    col1, col2 = st.columns(2)
+    with col1:
+        metric = st.selectbox('Rank by', screening_statistics, index=screening_statistics.index(default_screening_metric))
+    with col2:
+        min_severity = st.number_input('Skip scenarios below', value=0.0, format="%.1f")
+    dedupe = st.checkbox('Skip duplicate weather files', value=True)
 
-    st.success('Simulation finished. Starting processing results...')
+    screening = {'metric': metric, 'min_severity': min_severity or None, 'dedupe': dedupe}
 
-    #Postprocess the output to extract data for the result visualizations
-    postprocess(st.session_state.simulation_folders, st.session_state.building_folders, st.session_state.weather_folders)
+    #Show the ranking and which scenarios would be simulated, without simulating
+    if st.button('Screen Weather Files'):
+        selected, table = screen_weathers(weather_files, st.session_state.metrics_thresholds['Temperature'],
+                                          baseline=os.path.splitext(baseline_weather_file)[0], **screening)
+        st.dataframe(table, hide_index=True)
+        st.markdown(f'{len(selected)} of {len(weather_files)} weather scenarios will be simulated.')
+
+    return screening
+
+
+#Predict further weather scenarios for the buildings of the session's completed run, without EnergyPlus
+def screening_predictions():
+
+    workspace = run_workspace('Output', st.session_state.run_id)
+    if not os.path.exists(os.path.join(workspace, manifest_file_name)):
+        return
+
+    st.markdown('---')
+    st.subheader('Screening Predictions')
+    st.markdown(f'Predict further weather scenarios in seconds with surrogate models trained on the simulations of this run. The predictions are approximate and are shown on the Results page as weather scenarios ending in "{screening_suffix}".')
+    prediction_files = st.file_uploader('Upload Weather Data Files to Predict', accept_multiple_files=True, type='epw',
+                                        key='prediction_weather')
+
+    if prediction_files and st.button('Predict'):
+        manifest = add_screening_scenarios(read_manifest(workspace), [(file.name, file) for file in prediction_files],
+                                           progress=streamlit_progress())
+        st.session_state.weather_folders = manifest['weather_folders']
+        st.session_state.simulation_folders = manifest['simulation_folders']
+        st.session_state.zones = manifest['zones']
+
+        #Validation error of every building: root mean square error of held-out simulations per output
+        for building, validation in manifest['surrogate']['validation'].items():
+            st.markdown(f"**{building}** ({validation['method']})")
+            st.dataframe(pd.Series(validation['rmse'], name='RMSE'))
+        st.success('Predictions finished. You can view the results!')
+
+
+def validate_files(files, extension):
+    return all(name.lower().endswith(extension) for name, _ in files) if files else False
+
+#Show the progress of every pipeline stage in its own Streamlit progress bar
+def streamlit_progress():
+    bars = {}
+
+    def update(stage, fraction, text):
+        if stage not in bars:
+            bars[stage] = (st.progress(0), st.empty())
+        progress_bar, status_text = bars[stage]
+        progress_bar.progress(fraction)
+        status_text.text(text)
+
+    return update
+
+
+def run_simulation(building_files, weather_files, screening=None, fidelity='full', compact=True):
+
+    settings = {'baseline': st.session_state.baseline_file,
+                'start_month': st.session_state.start_month,
+                'summer_months': st.session_state.summer_months,
+                'metrics_thresholds': st.session_state.metrics_thresholds,
+                'rerun_all': st.session_state.rerun_all,
+                'screening': screening,
+                'fidelity': fidelity,
+                'compact': compact}
+
+    #Preprocess, simulate and postprocess all building and weather file combinations
+    result = run_pipeline(building_files, weather_files, settings, progress=streamlit_progress(), run_id=st.session_state.run_id)
+
+    st.session_state.weather_folders = result['weather_folders']
+    st.session_state.building_folders = result['building_folders']
+    st.session_state.simulation_folders = result['simulation_folders']
+    st.session_state.building_names = result['building_names']
+    st.session_state.zones = result['zones']
+    st.session_state.data_path = result['data_path']
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,9 +3,19 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from thermofeel import calculate_wbt
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
 import plotly.express as px
+from pathlib import Path
+import sys
+
+script_dir = Path(__file__).parent
+sys.path.append(str(script_dir))
+
+from utils.app_data_access import read_summary, read_summary_values, read_distribution_summary, read_dh_eh, read_hottest_data
+from utils.app_postprocessing import summer_month_range, summary_points, activity_levels, age_groups
+from utils.app_survivability import load_grids, calculate_humidex, humidex_isolines
+from utils.app_catalog import list_runs
+from utils.app_workspace import run_workspace, mark_open
 
 st.set_page_config(page_title='Results')
 
@@ -18,21 +28,38 @@ if 'selected_building' not in st.session_state:
 if 'building_names' not in st.session_state:
         st.session_state['building_names'] = []
 
-if 'metrics_thresholds' not in st.session_state:
-    st.session_state.metrics_thresholds = {'Temperature': 30, 'Humidex': 35, 'SET': 30, 'PMV': 1.5, 'WBGT': 23}
-
 result_types = ['Thermal comfort during hottest weeks', 'Summer distribution shifts', 'Liveability and survivability during hottest week']
 
 comparison_types = ['Degree and Exceedance hours', 'Activity hours', 'Peak Humidex values']
 
 metrics = ['Temperature', 'Humidex', 'SET', 'PMV', 'WBGT']
 
+#Boundaries of the Humidex ranges
+humidex_levels = [29, 39, 45, 54]
+
+months = ['January', 'February', 'March', 'April', 'May', 'June','July', 'August', 'September', 'October', 'November', 'December']
+
 def main():
     st.title("Results")
 
-    building_options = st.session_state.building_names + ['Comparisons across buildings']
+    runs = list_runs()
+
+    if runs:
+        #Open the run of this session by default; other completed runs can be chosen in the sidebar
+        runs = {run['run_id']: run for run in runs}
+        run_ids = list(runs)
+        own_run = st.session_state.get('run_id')
+        run_id = st.sidebar.selectbox("Choose run", run_ids, index=run_ids.index(own_run) if own_run in run_ids else 0,
+                                      format_func=lambda run_id: run_label(runs[run_id]))
+        open_run(runs[run_id])
+
+        #Scenarios predicted by the surrogate models are approximate and labelled as such
+        surrogate = runs[run_id].get('surrogate')
+        if surrogate and surrogate['weathers']:
+            st.info(f"{', '.join(surrogate['weathers'])}: {surrogate['label']} results predicted by surrogate models, not simulated with EnergyPlus.")
+
+        building_options = st.session_state.building_names + ['Comparisons across buildings']
 
-    if st.session_state.current_page == 'results':
         option = st.sidebar.selectbox("Choose building", building_options)
         if option == 'Comparisons across buildings':
             building_comparison_page(option)
@@ -42,6 +69,27 @@ def main():
         st.error('Please run simulation first')
 
 
+def run_label(run):
+    return f"{run['created'].replace('T', ' ')} ({', '.join(run['building_names'])})"
+
+
+#Load the buildings, weather scenarios, zones and settings of a run into the session
+#The settings of the run are kept apart from those of the File Upload page, so opening a past run does not change them
+#The run is marked as open, so collect_garbage keeps it while it is shown in any session
+def open_run(run):
+    mark_open(run_workspace('Output', run['run_id']))
+    st.session_state.building_names = run['building_names']
+    st.session_state.weather_folders = run['weather_folders']
+    st.session_state.zones = run['zones']
+    st.session_state.run_settings = run['settings']
+    st.session_state.data_path = run['data_path']
+
+    settings = run['settings']
+    summer = f"{months[settings['summer_months'][0] - 1]} to {months[settings['summer_months'][-1] - 1]}"
+    thresholds = ', '.join(f'{metric} {value:g}' for metric, value in settings['metrics_thresholds'].items())
+    st.sidebar.caption(f"Settings of this run: baseline {settings['baseline']}, summer {summer}, thresholds {thresholds}")
+
+
 def building_comparison_page(option):
 
     comparison_type = st.sidebar.selectbox("Choose comparison type", comparison_types)
@@ -71,22 +119,16 @@ def building_details_page(building):
 
 def activity_hours_comparison():
 
-    ah_file_path = 'Output/data/ah_data.h5'
-
-    activity_levels = ['Moderate to vigorous physical activities', 'Light physical activities', 'No activity possible', 'Not survivable']
-
     activity_level = st.radio("Select level of safe sustained activities :", activity_levels)
 
-    age_groups = ['Young (18-40 years)', 'Elderly (over 65 years)']
     selected_age_groups = st.multiselect("Select age groups to display:", age_groups, default=age_groups)
 
     # Function call to create the table based on selections
-    create_ah_table(ah_file_path, activity_level, selected_age_groups)
+    create_ah_table(activity_level, selected_age_groups)
 
 
 def peak_humidex_comparison():
 
-    max_hum_file_path = 'Output/data/max_hum_data.h5'
     weather_folders = st.session_state.weather_folders
     building_names = st.session_state.building_names
     all_zones = np.unique([value for values in st.session_state.zones.values() for value in values])
@@ -108,55 +150,29 @@ def peak_humidex_comparison():
         (1, 'rgba(255, 99, 71, 0.4)')  # Red
     ]
 
-    temperature = np.linspace(25, 45, 200)  # Temperature range
-    humidity = np.linspace(0, 100, 200)
-
-    temp_grid, humid_grid = np.meshgrid(temperature, humidity)
-    humidex_grid = calculate_humidex(temp_grid, humid_grid)
-    fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, colorscale=pastel_colorscale, showscale=False,
-                             contours=dict(start=29, end=54, size=1, coloring='heatmap'),
-                             line=dict(color='black', width=0)))
-    # colorbar=dict(tickvals=[29,39,45,54], ticktext=['low', 'med', 'high', 'extreme'], len=.8)))
-
-    fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                             contours=dict(type='constraint', operation='=', value=29),
-                             line=dict(color='grey', width=2), showlegend=False))
-
-    fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                             contours=dict(type='constraint', operation='=', value=39),
-                             line=dict(color='grey', width=2), showlegend=False))
+    temperature, humidity, humidex_grid, isolines = peak_humidex_background()
+    add_humidex_ranges(fig, temperature, humidity, humidex_grid, isolines, pastel_colorscale)
 
-    fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                             contours=dict(type='constraint', operation='=', value=45),
-                             line=dict(color='grey', width=2), showlegend=False))
-
-    fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                             contours=dict(type='constraint', operation='=', value=54),
-                             line=dict(color='grey', width=2), showlegend=False))
+    #Peak Humidex conditions of the selected scenarios, from the portfolio summary
+    peaks = read_summary(st.session_state.data_path).xs(('Humidex', ''), level=['Metric', 'Age group']).unstack('Statistic')
+    peaks = peaks[['Peak', 'Peak temperature', 'Peak relative humidity']].reset_index()
+    peaks = peaks[peaks['Building'].isin(selected_buildings) & peaks['Zone'].isin(selected_zones)]
 
+    #One trace per weather scenario, with the building given by the marker symbol
     for k, weather_folder in enumerate(weather_folders):
 
         if weather_folder not in selected_weather_files:
             continue
 
-        for i, building in enumerate(st.session_state.building_names):
-
-            symbol = symbols[i]
-
-            if building not in selected_buildings:
-                continue
-
-            for zone in st.session_state.zones[building]:
-
-                if zone not in selected_zones:
-                    continue
-
-                (max_humidex, max_hum_temp, max_hum_rh) = read_data_for_display(max_hum_file_path, building, weather_folder, 'Humidex', zone)
+        weather_peaks = peaks[peaks['Weather'] == weather_folder]
+        marker_symbols = [symbols[building_names.index(building) % len(symbols)] for building in weather_peaks['Building']]
+        hover_text = [f'{building}<br>{zone}<br>Humidex: {max_humidex:.1f}' for building, zone, max_humidex
+                      in zip(weather_peaks['Building'], weather_peaks['Zone'], weather_peaks['Peak'])]
 
-                fig.add_trace(
-                    go.Scatter(x=[max_hum_temp], y=[max_hum_rh], name=zone, marker_color=colors[k], marker_symbol=symbol,
-                               marker=dict(size=12, line=dict(width=2, color=colors[k])), mode="markers+text",
-                               textposition="top center", textfont=dict(color=colors[k]), showlegend=False))
+        fig.add_trace(
+            go.Scatter(x=weather_peaks['Peak temperature'], y=weather_peaks['Peak relative humidity'], name=weather_folder, mode="markers",
+                       marker=dict(size=12, color=colors[k], symbol=marker_symbols, line=dict(width=2, color=colors[k])),
+                       hovertext=hover_text, hoverinfo='text+x+y', showlegend=False))
 
         fig.add_trace(go.Scatter(x=[None], y=[None], mode="markers", name=weather_folder,
                                  legendgrouptitle_text="Weather scenario", legendgroup='group1',
@@ -167,7 +183,7 @@ def peak_humidex_comparison():
 
         fig.add_trace(go.Scatter(x=[None], y=[None], mode="markers", name=building,
                                  legendgrouptitle_text="Buildings", legendgroup='group2',
-                                 marker=dict(size=7, color='black', symbol=symbols[i],
+                                 marker=dict(size=7, color='black', symbol=symbols[i % len(symbols)],
                                              line=dict(width=2, color='black'))))
 
     fig.update_layout(title="Comparison of peak Humidex values",
@@ -187,6 +203,36 @@ def peak_humidex_comparison():
 
     st.plotly_chart(fig)
 
+#Humidex grid and its range boundaries for the peak Humidex chart, computed once
+@st.cache_data(show_spinner=False)
+def peak_humidex_background():
+    temperature = np.linspace(25, 45, 200)  # Temperature range
+    humidity = np.linspace(0, 100, 200)
+
+    temp_grid, humid_grid = np.meshgrid(temperature, humidity)
+    humidex_grid = calculate_humidex(temp_grid, humid_grid)
+    return temperature, humidity, humidex_grid, humidex_isolines(temperature, humidity, humidex_grid, humidex_levels)
+
+#Range boundaries on the precomputed survivability chart grid
+@st.cache_data(show_spinner=False)
+def survivability_humidex_isolines():
+    grids = load_grids()
+    return humidex_isolines(grids['temperature'], grids['humidity'], grids['humidex_grid'], humidex_levels)
+
+#Add the Humidex ranges as one filled contour and their boundaries as one line trace
+def add_humidex_ranges(fig, temperature, humidity, humidex_grid, isolines, colorscale):
+    fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, colorscale=colorscale, showscale=False,
+                             contours=dict(start=29, end=54, size=1, coloring='heatmap'),
+                             line=dict(color='black', width=0)))
+
+    x_lines, y_lines = [], []
+    for level in humidex_levels:
+        x_lines.extend(isolines[level].tolist() + [None])
+        y_lines.extend(list(humidity) + [None])
+
+    fig.add_trace(go.Scatter(x=x_lines, y=y_lines, mode='lines', line=dict(color='grey', width=2),
+                             showlegend=False, hoverinfo='skip'))
+
 #Visualize Degree and Exceedance Hours for Temperature, Humidex and SET with options for annual or maximum value over one week
 def dh_eh_comparison():
 
@@ -194,55 +240,35 @@ def dh_eh_comparison():
     time_period = st.radio("Select time period", ["Annual", "Maximum Week"])
     metric_type = st.radio("Select metric type", ["Degree hours", "Exceedance hours"])
 
-    dh_eh_file_path = "Output/data/dh_eh_data.h5"
+    #Dh and Eh are recomputed from the annual data, so the threshold can be changed without reprocessing
+    threshold = st.number_input(f'{tc_model} threshold', value=float(st.session_state.run_settings['metrics_thresholds'][tc_model]), format="%.1f")
 
     # Function call to create the table based on selections
-    create_dh_eh_table(dh_eh_file_path, tc_model, time_period, metric_type)
+    create_dh_eh_table(tc_model, threshold, time_period, metric_type)
 
 #Visualize liveability and survivability over the hottest summer week
 def hottest_week_survivability(building):
 
+    #Precomputed grids and limit curves, loaded once per process
+    grids = load_grids()
+    temperature = grids['temperature']
+    humidity = grids['humidity']
+    wbt_grid = grids['wbt_grid']
+    humidex_grid = grids['humidex_grid']
+
     #Extract survivability line
-    surv_path_elderly = 'pages/survivability_data/rh_version_NewSurvivability_limits_Night-Indoors_3H-65_over.csv'
-    surv_path_young = 'pages/survivability_data/rh_version_NewSurvivability_limits_Night-Indoors_3H-Young_adult.csv'
-    survivability_elderly = pd.read_csv(surv_path_elderly)
-    survivability_young = pd.read_csv(surv_path_young)
+    survivability_elderly = limit_curve(grids, 'surv', 'elderly')
+    survivability_young = limit_curve(grids, 'surv', 'young')
 
     #Extract liveability line
-    liv_path_elderly = 'pages/survivability_data/rh_version_Liveability_limits_Night-Indoors_3H-65_over.csv'
-    liv_path_young = 'pages/survivability_data/rh_version_Liveability_limits_Night-Indoors_3H-Young_adult.csv'
-    liv_elderly = pd.read_csv(liv_path_elderly)
-    liv_young = pd.read_csv(liv_path_young)
-
-    #Extract liveability ranges
-    mmax_path_elderly = 'pages/survivability_data/rh_Mmax_Livability_Night-Indoors_3H-65_over.csv'
-    mmax_path_young = 'pages/survivability_data/rh_Mmax_Livability_Night-Indoors_3H-Young_adult.csv'
-
-    #Extract survivable but not liveable region
-    surv_not_liv_path_elderly = 'pages/survivability_data/rh_survive_but_not_livable_survivability_Night-Indoors_3H-65_over.csv'
-    surv_not_liv_path_young = 'pages/survivability_data/rh_survive_but_not_livable_survivability_Night-Indoors_3H-Young_adult.csv'
-
-    #Extract not survivable region
-    not_surv_path_elderly = 'pages/survivability_data/rh_survivability_array_Night-Indoors_3H-65_over.csv'
-    not_surv_path_young = 'pages/survivability_data/rh_survivability_array_Night-Indoors_3H-Young_adult.csv'
-
-    #Temperature and relative humidity ranges
-    temperature = np.arange(25, 60, 0.1)
-    humidity = np.arange(0.5, 100.5, 0.5)
-
-    #Calculate WBT and Humidex grid
-    temp_grid, humid_grid = np.meshgrid(temperature, humidity)
-    K = 273.15
-    wbt_grid = calculate_wbt(temp_grid + K, humid_grid) - K
-    humidex_grid = calculate_humidex(temp_grid, humid_grid)
+    liv_elderly = limit_curve(grids, 'liv', 'elderly')
+    liv_young = limit_curve(grids, 'liv', 'young')
 
     weather_files = st.session_state.weather_folders
 
     zones = st.session_state.zones[building]
     zone = st.sidebar.selectbox("Choose zone", zones)
 
-    hottest_file_path = 'Output/data/hottest_weeks_data.h5'
-
     #Colors for plotting the hourly values of the different scenarios
     colors = ['green', 'orange', 'red', 'purple', 'royalblue']
 
@@ -282,19 +308,18 @@ def hottest_week_survivability(building):
     if show_liv_young:
         liv = liv_young
         title_ending = 'Young (18-40 years)'
-        surv_not_liv_path = surv_not_liv_path_young
-        Mmax_MET = pd.read_csv(mmax_path_young, index_col=0)
-        not_surv = pd.read_csv(not_surv_path_young, index_col=0)
-        not_surv = not_surv.map(lambda x: None if x else 1)
+        age = 'young'
+        Mmax_MET = grids['mmax_young']
 
     if show_liv_elderly:
         liv = liv_elderly
         title_ending = 'Elderly (over 65 years)'
-        surv_not_liv_path = surv_not_liv_path_elderly
-        Mmax_MET = pd.read_csv(mmax_path_elderly, index_col=0)
-        Mmax_MET.iloc[185:, 50:] = np.nan
-        not_surv = pd.read_csv(not_surv_path_elderly, index_col=0)
-        not_surv = not_surv.map(lambda x: None if x else 1)
+        age = 'elderly'
+        Mmax_MET = grids['mmax_elderly'].copy()
+        Mmax_MET[185:, 50:] = np.nan
+
+    if show_liv_young or show_liv_elderly:
+        not_surv = np.where(grids['survivable_' + age], np.nan, 1)
 
     # Plotting
     fig = go.Figure()
@@ -326,8 +351,7 @@ def hottest_week_survivability(building):
             go.Scatter(x=liv['Tair'], y=liv['rh'], mode='lines', name=title_ending,legendgroup='group3',
                        legendgrouptitle_text="Liveability limit", showlegend=True, line=dict(color='darkblue', width=2)))
 
-        surv_not_liv = pd.read_csv(surv_not_liv_path, index_col=0)
-        surv_not_liv = surv_not_liv.map(lambda x: 1 if x else None)
+        surv_not_liv = np.where(grids['surv_not_liv_' + age], 1, np.nan)
 
         set3_colors = px.colors.qualitative.Set3
         muted_yellow = set3_colors[11]
@@ -471,25 +495,7 @@ def hottest_week_survivability(building):
 
     #Show Humidex range
     if show_humidex_range:
-        fig.add_trace(
-            go.Contour(x=temperature, y=humidity, z=humidex_grid, colorscale=pastel_colorscale, showscale=False,
-                       contours=dict(start=29, end=54, size=1, coloring='heatmap'), line=dict(color='black', width=0)))
-
-        fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                                 contours=dict(type='constraint', operation='=', value=29),
-                                 line=dict(color='grey', width=2), showlegend=False))
-
-        fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                                 contours=dict(type='constraint', operation='=', value=39),
-                                 line=dict(color='grey', width=2), showlegend=False))
-
-        fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                                 contours=dict(type='constraint', operation='=', value=45),
-                                 line=dict(color='grey', width=2), showlegend=False))
-
-        fig.add_trace(go.Contour(x=temperature, y=humidity, z=humidex_grid, showscale=False,
-                                 contours=dict(type='constraint', operation='=', value=54),
-                                 line=dict(color='grey', width=2), showlegend=False))
+        add_humidex_ranges(fig, temperature, humidity, humidex_grid, survivability_humidex_isolines(), pastel_colorscale)
 
         color_scale_labels = ['<29: No discomfort', '30-39: Some discomfort', '40-45: Great discomfort; avoid exertion',
                               '45-54: Dangerous', '>54: Heat stroke imminent']
@@ -504,8 +510,8 @@ def hottest_week_survivability(building):
             continue
 
         #We only display the values for the hottest week (not previous and succeeding week)
-        temp = read_data_for_display(hottest_file_path, building, weather, 'Temperature', zone)[7*24:2*7*24]
-        rh = read_data_for_display(hottest_file_path, building, weather, 'Relative Humidity', zone)[7*24:2*7*24]
+        temp = read_hottest_data(st.session_state.data_path, building, weather, 'Temperature', zone)[7*24:2*7*24]
+        rh = read_hottest_data(st.session_state.data_path, building, weather, 'Relative Humidity', zone)[7*24:2*7*24]
 
         fig.add_trace(go.Scatter(x=temp, y=rh, mode='markers+text', name=weather,showlegend=False, textposition='top center', marker=dict(color=colors[k], size=5)))
 
@@ -535,16 +541,15 @@ def hottest_week_survivability(building):
     # Add the activity hours below the plot
     if show_liv_young or show_liv_elderly:
         st.markdown("##### Activity hours")
-        ah_file_path = 'Output/data/ah_data.h5'
-        create_ah_table_building(ah_file_path, building, zone, title_ending)
+        create_ah_table_building(building, zone, title_ending)
 
 
 #Visualization for the distribution shifts of the hourly summer values compared to the baseline file
+#The violins are drawn from precomputed density summaries instead of sending every hourly value to the browser
 def summer_diff_distr_plot(building):
 
     zones = st.session_state.zones[building]
-    zone = st.sidebar.selectbox("Choose zone", zones)
-    summer_diff_file_path = 'Output/data/summer_differences_data.h5'
+    selected_zones = st.sidebar.multiselect("Choose zones", zones, default=zones[:1])
     weather_files = st.session_state.weather_folders
 
     #Need to uplaod at least two weather scenarios for calculating differences to baseline scenario
@@ -552,42 +557,81 @@ def summer_diff_distr_plot(building):
         st.error("Comparison Not Available: Only one weather file has been uploaded. To enable assessment of distribution shifts, please upload additional weather files.")
         return
 
+    if not selected_zones:
+        st.error("Please select at least one zone.")
+        return
+
+    #Summer subsets and baseline differences are derived from the annual data, so they can be changed here without reprocessing
+    baseline = st.selectbox("Baseline weather scenario", weather_files, index=weather_files.index(st.session_state.run_settings['baseline']))
+    col1, col2 = st.columns(2)
+    with col1:
+        start_month = st.selectbox('Summer start month', months, index=st.session_state.run_settings['summer_months'][0] - 1)
+    with col2:
+        end_month = st.selectbox('Summer end month', months, index=st.session_state.run_settings['summer_months'][-1] - 1)
+
+    summer_months = tuple(summer_month_range(months.index(start_month) + 1, months.index(end_month) + 1))
+
     #Colors to use for displaying distribution shifts
     colors = ['orange', 'red', 'purple', 'royalblue']
 
+    scenarios = [weather for weather in weather_files if weather != baseline]
+
+    #Each zone takes one unit on the x-axis, shared by the violins of the scenarios
+    violin_width = 0.9 / len(scenarios)
+
     nr_rows = len(metrics)
     fig = make_subplots(rows=nr_rows, cols=1, shared_xaxes=True, vertical_spacing=0.05)
 
     for i, metric in enumerate(metrics):
-        j = 0
-        for weather in weather_files:
+        for j, weather in enumerate(scenarios):
+
+            #Outlines and mean lines of all zones of one scenario are combined into one trace each, separated by None
+            x_outline, y_outline, x_mean, y_mean = [], [], [], []
+            x_hover, y_hover, hover = [], [], []
+
+            for z, zone in enumerate(selected_zones):
+                summary = read_distribution_summary(st.session_state.data_path, building, weather, baseline, metric, zone, summer_months)
+                if np.isnan(summary['mean']):
+                    continue
+
+                center = z + (j - (len(scenarios) - 1) / 2) * violin_width
+                grid = np.linspace(summary['grid_start'], summary['grid_end'], summary_points)
+                density = np.array([summary[f'd{k}'] for k in range(summary_points)])
+                half_width = 0.45 * violin_width * density / density.max()
 
-            if weather == st.session_state.baseline_file:
-                continue
+                x_outline.extend(np.concatenate([center - half_width, (center + half_width)[::-1], [center - half_width[0]]]).tolist() + [None])
+                y_outline.extend(np.concatenate([grid, grid[::-1], [grid[0]]]).tolist() + [None])
 
-            y_values = read_data_for_display(summer_diff_file_path, building, weather, metric, zone)
-            x_values = [zone] * len(y_values)
+                mean_width = np.interp(summary['mean'], grid, half_width)
+                x_mean.extend([center - mean_width, center + mean_width, None])
+                y_mean.extend([summary['mean'], summary['mean'], None])
 
-            fig.add_trace(go.Violin(x=x_values, y=y_values, box_visible=False, name=weather + ' - Baseline', line_color=colors[j], showlegend=False, offsetgroup=j), row=i + 1, col=1)
+                x_hover.append(center)
+                y_hover.append(summary['mean'])
+                hover.append(f"{zone}<br>{weather} - Baseline<br>mean: {summary['mean']:.2f}<br>median: {summary['q50']:.2f}"
+                             f"<br>5-95%: {summary['q5']:.2f} to {summary['q95']:.2f}<br>min/max: {summary['q0']:.2f} / {summary['q100']:.2f}")
 
-            j+=1
+            fig.add_trace(go.Scatter(x=x_outline, y=y_outline, mode='lines', fill='toself', line=dict(color=colors[j], width=1.5),
+                                     name=weather + ' - Baseline', showlegend=False, hoverinfo='skip'), row=i + 1, col=1)
 
-    fig.update_traces(meanline_visible=True)
+            fig.add_trace(go.Scatter(x=x_hover, y=y_hover, mode='markers', marker=dict(size=1, color=colors[j]), name=weather + ' - Baseline',
+                                     showlegend=False, hovertext=hover, hoverinfo='text'), row=i + 1, col=1)
+            fig.add_trace(go.Scatter(x=x_mean, y=y_mean, mode='lines', line=dict(color=colors[j], width=2), showlegend=False, hoverinfo='skip'),
+                          row=i + 1, col=1)
 
     for i, metric in enumerate(metrics):
         yaxis_nr = 'yaxis' + str(i + 1)
         fig['layout'][yaxis_nr].update(title=metrics[i])
 
-    fig.update_layout(template='simple_white', width=1000, height=700, violinmode='group')
-    fig.update_xaxes(linecolor='lightgrey', showticklabels=False, ticks="")
+    fig.update_layout(template='simple_white', width=1000, height=700)
+    fig.update_xaxes(linecolor='lightgrey', ticks="", showticklabels=False, range=[-0.5, len(selected_zones) - 0.5],
+                     tickvals=list(range(len(selected_zones))), ticktext=selected_zones)
+    fig.update_xaxes(showticklabels=len(selected_zones) > 1, row=nr_rows, col=1)
     fig.add_hline(y=0, line_width=1, line_dash="solid", line_color="black", opacity=1)
     fig.update_yaxes(secondary_y=False, gridcolor='lightgrey', showgrid=True)
 
     #Add a legend for the weather scenarios
-    i=0
-    for weather_file in weather_files:
-        if weather_file == st.session_state.baseline_file:
-            continue
+    for i, weather_file in enumerate(scenarios):
 
         line_dash = 'solid'
         fig.add_trace(go.Scatter(
@@ -600,8 +644,6 @@ def summer_diff_distr_plot(building):
             name=weather_file + ' - Baseline',
             line=dict(color=colors[i])))
 
-        i+=1
-
     fig.update_layout(
         legend2=dict(yanchor="top", xanchor="center", y=-0.12, x=0.5, orientation='h', title='Weather scenarios:'))
 
@@ -614,8 +656,6 @@ def hottest_weeks_plot(building):
     zones = st.session_state.zones[building]
     zone = st.sidebar.selectbox("Choose zone", zones)
 
-    hottest_file_path = 'Output/data/hottest_weeks_data.h5'
-
     x_values = np.arange(1, 21 * 24 + 1)
     colors = ['green', 'orange', 'red', 'purple', 'royalblue']
 
@@ -628,11 +668,11 @@ def hottest_weeks_plot(building):
     for k, metric in enumerate(metrics):
         for i, weather in enumerate(weather_files):
 
-            data = read_data_for_display(hottest_file_path, building, weather, metric, zone)
+            data = read_hottest_data(st.session_state.data_path, building, weather, metric, zone)
 
             fig.add_trace(go.Scatter(x=x_values, y=data, xaxis="x1", line_dash='solid', name=weather,line=dict(color=colors[i]), showlegend=False), row=k + 1, col=1)
 
-        fig.add_hline(y=st.session_state.metrics_thresholds[metric], row=k + 1, col=1, line_width=1.5, line_dash="dash", line_color='black',opacity=1)
+        fig.add_hline(y=st.session_state.run_settings['metrics_thresholds'][metric], row=k + 1, col=1, line_width=1.5, line_dash="dash", line_color='black',opacity=1)
 
     x_values = x_values[::24]
     ticktext = 21 * ['']
@@ -670,25 +710,14 @@ def hottest_weeks_plot(building):
     st.plotly_chart(fig)
 
 
-#Reading data for a specific building, weather file, metric and zone
-def read_data_for_display(hdf5_file_path, building_folder, weather, metric, zone):
-    hdf_key = f'{building_folder}/{zone}/{weather}/{metric}'
-    arr = pd.read_hdf(hdf5_file_path, key=hdf_key).to_numpy()
-    return np.concatenate(arr)
-
+#Limit curve (Tair over rh) of the given kind and age group from the precomputed grids
+def limit_curve(grids, name, age):
+    return {'Tair': grids[f'{name}_{age}_Tair'], 'rh': grids[f'{name}_{age}_rh']}
 
-def calculate_humidex(temperature, humidity):
-    e = 6.112 * np.exp(17.67 * temperature / (temperature + 243.5)) * humidity / 100
-    humidex = temperature + (5/9) * (e - 10)
-    return humidex
-
-def create_dh_eh_table(dh_eh_file_path, tc_model, time_period, metric_type):
+def create_dh_eh_table(tc_model, threshold, time_period, metric_type):
     # metric_type: 'dh' or 'eh'
     # time_period: 'annual' or 'max'
 
-    # Reading data from HDF and creating a table
-    all_data = []
-
     show_leeds = False
 
     idx = 0
@@ -698,30 +727,37 @@ def create_dh_eh_table(dh_eh_file_path, tc_model, time_period, metric_type):
         idx = 2
         if tc_model == 'SET':
             show_leeds = st.radio("Highlight archetype zones that surpass LEED's passive survivability threshold (120 SET Dh)", ["Yes", "No"]) == "Yes"
-            if show_leeds and st.session_state.metrics_thresholds['SET'] != 30:
-                st.error(f"SET threshold is set to {round(st.session_state.metrics_thresholds['SET'], 1)} and not 30 as specified by LEED's passive survivability pilot")
+            if show_leeds and threshold != 30:
+                st.error(f"SET threshold is set to {round(threshold, 1)} and not 30 as specified by LEED's passive survivability pilot")
     elif time_period == "Maximum Week" and metric_type == "Exceedance hours":
         idx = 3
 
-    with pd.HDFStore(dh_eh_file_path, 'r') as store:
-
-        for building_key in store.keys():
-            building_key = building_key.lstrip('/')
-            building_data = store[building_key]
-            building_name, zone, weather, metric = building_key.split('/')
-            if metric == tc_model:
-                data = {
-                    'Building': building_name,
-                    'Zone': zone,
-                    'Weather': weather,
-                    metric_type: building_data[idx]
-                }
-                all_data.append(data)
-
-    # Creating a DataFrame for the table
-    df = pd.DataFrame(all_data)
-
-    pivot_df = df.pivot_table(index=['Building', 'Zone'], columns='Weather', values=metric_type)
+    #Use the portfolio summary when it holds all scenarios of the table, computed with the threshold of this model,
+    #otherwise compute the values from the annual data
+    scenarios = pd.MultiIndex.from_tuples([(building_name, zone, weather) for building_name in st.session_state.building_names
+                                           for zone in st.session_state.zones[building_name]
+                                           for weather in st.session_state.weather_folders])
+    thresholds = read_summary_values(st.session_state.data_path, tc_model, 'Threshold').reindex(scenarios)
+    if np.isclose(thresholds.to_numpy(dtype=float), threshold).all():
+        df = read_summary_values(st.session_state.data_path, tc_model, f'{time_period} {metric_type}').reindex(scenarios)
+        df = df.rename(metric_type).rename_axis(['Building', 'Zone', 'Weather']).reset_index()
+    else:
+        all_data = []
+        for building_name in st.session_state.building_names:
+            for zone in st.session_state.zones[building_name]:
+                for weather in st.session_state.weather_folders:
+                    data = {
+                        'Building': building_name,
+                        'Zone': zone,
+                        'Weather': weather,
+                        metric_type: read_dh_eh(st.session_state.data_path, building_name, weather, tc_model, zone, threshold)[idx]
+                    }
+                    all_data.append(data)
+
+        # Creating a DataFrame for the table
+        df = pd.DataFrame(all_data)
+
+    pivot_df = df.pivot_table(index=['Building', 'Zone'], columns='Weather', values=metric_type, observed=True)
     pivot_df = pivot_df.reset_index()
 
     gb = GridOptionsBuilder.from_dataframe(pivot_df)
@@ -747,106 +783,45 @@ def create_dh_eh_table(dh_eh_file_path, tc_model, time_period, metric_type):
     AgGrid(pivot_df, gridOptions=gridOptions, theme=theme,fit_columns_on_grid_load=True, height=400, allow_unsafe_jscode=True)
 
 
-def create_ah_table_building(ah_file_path, building, zone, age_group):
-    # Reading data from HDF and creating a table
-    all_data = []
-    activity_levels = ['Moderate to vigorous physical activities', 'Light physical activities', 'No activity possible', 'Not survivable']
-
-
-    # [moderate or vigorous activities, at most light, non-liveable, non-survivable] is the order of the activities in the vector
-    with pd.HDFStore(ah_file_path, 'r') as store:
-
-        for building_key in store.keys():
-            building_key = building_key.lstrip('/')
-            #print(building_key)
-            building_data = store[building_key]
-            building_st, zone_st, weather, age_st = building_key.split('/')
+def create_ah_table_building(building, zone, age_group):
+    # Filtering the portfolio summary, indexed by (weather, activity level) after the selection
+    ah_values = read_summary(st.session_state.data_path).xs((building, zone, 'Activity hours', age_group),
+                                                             level=['Building', 'Zone', 'Metric', 'Age group'])
 
-            if building == building_st and zone == zone_st and age_st == age_group :
-                print('here')
-                for i, act_level in enumerate(activity_levels):
-                    data = {
-                        'Weather': weather,
-                        'Activity level': act_level,
-                        'Activity hours': building_data[0][i]
-                    }
-                    all_data.append(data)
-
-        # Creating a DataFrame for the table
-        df = pd.DataFrame(all_data)
-        # print(all_data)
-
-        pivot_df = df.pivot_table(index=['Weather'], columns='Activity level', values='Activity hours')
-        pivot_df = pivot_df.reset_index()
-
-        # Ensure columns are in the desired order
-        desired_column_order = ['Weather'] + activity_levels
-        # Reorder the DataFrame columns
-        pivot_df = pivot_df[desired_column_order]
-
-        #df = pd.DataFrame(pivot_df)
-
-        #st.dataframe(df.set_index(df.columns[0]), use_container_width=True)
+    pivot_df = ah_values.unstack('Statistic')
+    pivot_df = pivot_df.reset_index()
 
-        gb = GridOptionsBuilder.from_dataframe(pivot_df)
+    # Ensure columns are in the desired order
+    desired_column_order = ['Weather'] + activity_levels
+    # Reorder the DataFrame columns
+    pivot_df = pivot_df[desired_column_order]
 
-        gb.configure_default_column(groupable=True, value=True, enableRowGroup=True, aggFunc='sum', editable=True)
+    gb = GridOptionsBuilder.from_dataframe(pivot_df)
 
-        gb.configure_grid_options(headerHeight=50)
+    gb.configure_default_column(groupable=True, value=True, enableRowGroup=True, aggFunc='sum', editable=True)
 
-        gb.configure_grid_options(
-            domLayout='autoHeight',
-            pagination=False
-        )
+    gb.configure_grid_options(headerHeight=50)
 
-        gridOptions = gb.build()
-        theme = 'alpine'
+    gb.configure_grid_options(
+        domLayout='autoHeight',
+        pagination=False
+    )
 
-        AgGrid(pivot_df, gridOptions=gridOptions, theme=theme, fit_columns_on_grid_load=True, height=400,
-               allow_unsafe_jscode=True)
+    gridOptions = gb.build()
+    theme = 'alpine'
 
-        #'''
-def create_ah_table(ah_file_path, activity_level, selected_age_groups):
-    # Reading data from HDF and creating a table
-    all_data = []
+    AgGrid(pivot_df, gridOptions=gridOptions, theme=theme, fit_columns_on_grid_load=True, height=400,
+           allow_unsafe_jscode=True)
 
-    idx = 0
-    if activity_level == 'Light physical activities':
-        idx = 1
-    elif activity_level == "No activity possible":
-        idx = 2
-    elif activity_level == "Not survivable":
-        idx = 3
+def create_ah_table(activity_level, selected_age_groups):
+    # Filtering the portfolio summary, indexed by (building, zone, weather, age group) after the selection
+    df = read_summary(st.session_state.data_path).xs(('Activity hours', activity_level), level=['Metric', 'Statistic'])
+    df = df.rename('Activity hours').reset_index().rename(columns={'Age group': 'Age'})
+    df = df[df['Age'].isin(selected_age_groups)]
 
-    #[moderate or vigorous activities, at most light, non-liveable, non-survivable] is the order of the activities in the vector
-    with pd.HDFStore(ah_file_path, 'r') as store:
-
-        for building_key in store.keys():
-            building_key = building_key.lstrip('/')
-            building_data = store[building_key]
-            building_name, zone, weather, age = building_key.split('/')
-            if age in selected_age_groups:
-                data = {
-                    'Building': building_name,
-                    'Zone': zone,
-                    'Age': age,
-                    'Weather': weather,
-                    'Activity hours': building_data[0][idx]
-                }
-                all_data.append(data)
-
-    # Creating a DataFrame for the table
-    df = pd.DataFrame(all_data)
-    #print(all_data)
-
-    pivot_df = df.pivot_table(index=['Building', 'Zone', 'Age'], columns='Weather', values='Activity hours')
+    pivot_df = df.pivot_table(index=['Building', 'Zone', 'Age'], columns='Weather', values='Activity hours', observed=True)
     pivot_df = pivot_df.reset_index()
 
-    # Ensure columns are in the desired order
-    #desired_column_order = ['Weather'] + activity_levels
-    # Reorder the DataFrame columns
-    #pivot_df = pivot_df[desired_column_order]
-
     gb = GridOptionsBuilder.from_dataframe(pivot_df)
 
     gb.configure_default_column(groupable=True, value=True, enableRowGroup=True, aggFunc='sum', editable=True)
@@ -7,7 +7,9 @@ import io
 script_dir = Path(__file__).parent
 sys.path.append(str(script_dir))
 
-from utils.app_heatwave_creation import create_future_heatwave, extend_heatwave, include_uhi_effect
+from utils.app_heatwave_creation import create_future_heatwave, extend_heatwave, include_uhi_effect, generate_scenarios, zip_files, create_future_heatwave_ensemble, \
+    generate_stochastic_heatwaves
+from utils.app_weather_years import scan_years, hottest_year, export_years
 
 st.set_page_config(page_title='Extreme Weather Generation')
 
@@ -38,10 +40,13 @@ if 'created_uhi_scenario' not in st.session_state:
     st.session_state['uhi_file_name'] = None
 
 os.makedirs('Extreme Weather', exist_ok=True)
-os.makedirs('Extreme Weather/Input', exist_ok=True)
 os.makedirs('Extreme Weather/Prolonged Heatwave', exist_ok=True)
 os.makedirs('Extreme Weather/Future Heatwave', exist_ok=True)
+os.makedirs('Extreme Weather/Future Heatwave Ensemble', exist_ok=True)
 os.makedirs('Extreme Weather/UHI Effect', exist_ok=True)
+os.makedirs('Extreme Weather/Batch', exist_ok=True)
+os.makedirs('Extreme Weather/Stochastic Heatwave', exist_ok=True)
+os.makedirs('Extreme Weather/Years', exist_ok=True)
 
 def main():
     st.markdown("""
@@ -55,21 +60,14 @@ def main():
     heatwave_file = st.file_uploader('Upload Heatwave Data File', accept_multiple_files=False, type='epw')
     days = st.slider('Specify Duration', 2, 7, value=2)
 
-    input_folder = 'Extreme Weather/Input/'
-
     if heatwave_file and validate_files([heatwave_file], 'epw'):
         if st.button('Create Prolonged Heatwave Scenario'):
 
-            #Move provided input file into the "Input" folder
-            input_file = input_folder + heatwave_file.name
             file_name = os.path.splitext(heatwave_file.name)[0] + '_' + str(days) + os.path.splitext(heatwave_file.name)[1]
             output_file = 'Extreme Weather/Prolonged Heatwave/' + file_name
 
-            with open(input_file, "wb") as f:
-                f.write(heatwave_file.getbuffer())
-
-            #Create prolonged heatwave and save in output folder
-            extend_heatwave(input_file, output_file, days)
+            #Create prolonged heatwave from the uploaded file (parsed in memory) and save in output folder
+            extend_heatwave(heatwave_file, output_file, days)
             st.session_state['created_prolonged_heatwave'] = True
             st.session_state['prolonged_heatwave_output_file'] = output_file
             st.session_state['prolonged_heatwave_file_name'] = file_name
@@ -97,37 +95,38 @@ def main():
 
         #Assign the uploaded files to their respective category
         baseline_weather_file = st.selectbox("Select the Typical Year File:", file_options, key='baseline_weather')
-        heatwave_scenario_file = st.selectbox("Select the Heatwave Scenario File:", file_options,
-                                              key='heatwave_scenario')
-        future_tmy_file = st.selectbox("Select the Future Typical Year File:", file_options, key='future_tmy')
-
-        if st.button('Create Future Heatwave Scenario'):
-
-            #Move provided input files into the "Input" folder
-            for file in weather_files:
-                input_file = input_folder + file.name
-                with open(input_file, "wb") as f:
-                    f.write(file.getbuffer())
-
-            #Create future heatwave and save in output folder
-            file_name = 'Future_Heatwave.epw'
-            output_file = 'Extreme Weather/Future Heatwave/' + file_name
-
-            create_future_heatwave(input_folder + baseline_weather_file, input_folder + heatwave_scenario_file, input_folder + future_tmy_file, output_file)
 
-            st.session_state['created_future_heatwave'] = True
-            st.session_state['future_heatwave_output_file'] = output_file
-            st.session_state['future_heatwave_file_name'] = file_name
-
-        if st.session_state.created_future_heatwave:
-            #Read future heatwave data from output folder and allow for download
-            buffer = get_file_buffer(st.session_state.future_heatwave_output_file)
-            st.download_button(
-                label="Download File",
-                data=buffer,
-                file_name=st.session_state.future_heatwave_file_name,
-                mime="text/plain"
-            )
+        #An ensemble combines every selected heatwave with every selected future typical year
+        ensemble = st.checkbox('Create an ensemble from several heatwaves and future typical years', key='future_ensemble')
+        if ensemble:
+            future_heatwave_ensemble(weather_files, file_options, baseline_weather_file)
+        else:
+            heatwave_scenario_file = st.selectbox("Select the Heatwave Scenario File:", file_options,
+                                                  key='heatwave_scenario')
+            future_tmy_file = st.selectbox("Select the Future Typical Year File:", file_options, key='future_tmy')
+
+            if st.button('Create Future Heatwave Scenario'):
+
+                #Create future heatwave and save in output folder
+                file_name = 'Future_Heatwave.epw'
+                output_file = 'Extreme Weather/Future Heatwave/' + file_name
+
+                uploads = {file.name: file for file in weather_files}
+                create_future_heatwave(uploads[baseline_weather_file], uploads[heatwave_scenario_file], uploads[future_tmy_file], output_file)
+
+                st.session_state['created_future_heatwave'] = True
+                st.session_state['future_heatwave_output_file'] = output_file
+                st.session_state['future_heatwave_file_name'] = file_name
+
+            if st.session_state.created_future_heatwave:
+                #Read future heatwave data from output folder and allow for download
+                buffer = get_file_buffer(st.session_state.future_heatwave_output_file)
+                st.download_button(
+                    label="Download File",
+                    data=buffer,
+                    file_name=st.session_state.future_heatwave_file_name,
+                    mime="text/plain"
+                )
 
     st.subheader('Urban Heat Island Effect Integration')
     st.markdown("""
@@ -141,17 +140,12 @@ def main():
     if uhi_file and uhi_intensity is not None:
         if st.button('Create UHI Effect Scenario'):
 
-            #Move provided input file into the "Input" folder
-            input_file = input_folder + uhi_file.name
             file_name = os.path.splitext(uhi_file.name)[0] + '_UHI_' + str(uhi_intensity) + \
                         os.path.splitext(uhi_file.name)[1]
 
-            with open(input_file, "wb") as f:
-                f.write(uhi_file.getbuffer())
-
-            #Integrate UHI effect and save in output folder
+            #Integrate UHI effect into the uploaded file (parsed in memory) and save in output folder
             output_file = 'Extreme Weather/UHI Effect/' + file_name
-            include_uhi_effect(input_file, uhi_intensity, output_file)
+            include_uhi_effect(uhi_file, uhi_intensity, output_file)
 
             st.session_state['created_uhi_scenario'] = True
             st.session_state['uhi_output_file'] = output_file
@@ -167,6 +161,131 @@ def main():
                 mime="text/plain"
             )
 
+    st.subheader('Stochastic Heatwave Ensemble')
+    st.markdown("""
+                 Upload a weather file to generate many plausible heatwaves for uncertainty analysis. Each heatwave is assembled from random blocks of the hottest days of the file, with a random duration and intensity, and starts at the hottest day of the hottest week. The same seed always gives the same heatwaves.
+                """)
+
+    stochastic_file = st.file_uploader('Upload Weather Data File', accept_multiple_files=False, type='epw', key='stochastic')
+    n_scenarios = st.number_input('Number of Heatwaves', min_value=1, max_value=500, value=20, key='stochastic_count')
+    duration_range = st.slider('Duration Range (days)', 2, 14, value=(3, 7), key='stochastic_duration')
+    intensity_range = st.slider('Intensity Range (K added to the temperature)', 0.0, 5.0, value=(0.0, 2.0), step=0.1,
+                                key='stochastic_intensity')
+    seed = st.number_input('Seed', min_value=0, value=0, key='stochastic_seed')
+
+    if stochastic_file and validate_files([stochastic_file], 'epw'):
+        if st.button('Create Stochastic Heatwaves'):
+            output_folder = 'Extreme Weather/Stochastic Heatwave/' + os.path.splitext(stochastic_file.name)[0]
+            output_files = generate_stochastic_heatwaves(stochastic_file, output_folder, int(n_scenarios), duration_range,
+                                                         intensity_range, int(seed))
+
+            st.session_state['stochastic_zip'] = zip_files(output_files).getvalue()
+            st.session_state['stochastic_zip_name'] = os.path.splitext(stochastic_file.name)[0] + '_stochastic.zip'
+            st.success(f'Created {int(n_scenarios)} heatwaves.')
+
+        if st.session_state.get('stochastic_zip'):
+            st.download_button(
+                label="Download Heatwaves",
+                data=st.session_state.stochastic_zip,
+                file_name=st.session_state.stochastic_zip_name,
+                mime="application/zip"
+            )
+
+    st.subheader('Multi-Year Weather')
+    st.markdown("""
+                 Upload a weather file with several years of hourly data (e.g. 30 years of observations) to find the hottest week of every year, and export the selected years as single-year weather files.
+                """)
+
+    years_file = st.file_uploader('Upload Multi-Year Weather Data File', accept_multiple_files=False, type='epw', key='years')
+
+    if years_file and validate_files([years_file], 'epw'):
+        #The file is scanned one year at a time, once per uploaded file
+        if st.session_state.get('years_scan_file') != (years_file.name, years_file.size):
+            st.session_state['years_scan'] = scan_years(years_file)
+            st.session_state['years_scan_file'] = (years_file.name, years_file.size)
+            st.session_state['years_zip'] = None
+        years = st.session_state.years_scan
+
+        st.dataframe(years.rename(columns={'year': 'Year', 'hours': 'Hours', 'hottest_week_start': 'Hottest Week Start',
+                                           'hottest_week_mean': 'Hottest Week Mean (°C)', 'max_temperature': 'Max (°C)',
+                                           'mean_temperature': 'Mean (°C)'}), hide_index=True)
+        st.markdown(f'The hottest week of all years is in {hottest_year(years)}.')
+
+        selected_years = st.multiselect('Select Years', years['year'].tolist(), default=[hottest_year(years)], key='years_selected')
+        if selected_years and st.button('Export Years'):
+            output_folder = 'Extreme Weather/Years/' + os.path.splitext(years_file.name)[0]
+            output_files = export_years(years_file, selected_years, output_folder)
+
+            st.session_state['years_zip'] = zip_files(output_files).getvalue()
+            st.session_state['years_zip_name'] = os.path.splitext(years_file.name)[0] + '_years.zip'
+
+        if st.session_state.get('years_zip'):
+            st.download_button(
+                label="Download Years",
+                data=st.session_state.years_zip,
+                file_name=st.session_state.years_zip_name,
+                mime="application/zip"
+            )
+
+    st.subheader('Batch Scenario Generation')
+    st.markdown("""
+                 Upload a weather file and select several heatwave durations and UHI intensities to generate all scenarios at once. The scenarios are downloaded as one zip archive, which can be uploaded directly on the File Upload page.
+                """)
+
+    batch_file = st.file_uploader('Upload Weather Data File', accept_multiple_files=False, type='epw', key='batch')
+    heat_lengths = st.multiselect('Specify Durations', list(range(2, 8)), key='batch_lengths')
+    uhi_text = st.text_input('Specify UHI Intensities (comma-separated, e.g. 1, 2.5, 4)', key='batch_uhi')
+    combine = st.checkbox('Combine every duration with every UHI intensity', key='batch_combine')
+
+    #Process the batch of scenarios
+    if batch_file and (heat_lengths or uhi_text):
+        try:
+            uhi_intensities = [float(value) for value in uhi_text.split(',') if value.strip()]
+        except ValueError:
+            st.error('Please specify the UHI intensities as comma-separated numbers.')
+            return
+
+        if st.button('Create Scenarios'):
+            file_name = os.path.splitext(batch_file.name)[0] + '_scenarios.zip'
+            output_folder = 'Extreme Weather/Batch/' + os.path.splitext(batch_file.name)[0]
+            output_files = generate_scenarios(batch_file, output_folder, heat_lengths, uhi_intensities, combine)
+
+            st.session_state['batch_zip'] = zip_files(output_files).getvalue()
+            st.session_state['batch_zip_name'] = file_name
+            st.success(f'Created {len(output_files)} scenarios.')
+
+        if st.session_state.get('batch_zip'):
+            st.download_button(
+                label="Download Scenarios",
+                data=st.session_state.batch_zip,
+                file_name=st.session_state.batch_zip_name,
+                mime="application/zip"
+            )
+
+def future_heatwave_ensemble(weather_files, file_options, baseline_weather_file):
+
+    heatwave_scenario_files = st.multiselect("Select the Heatwave Scenario Files:", file_options, key='heatwave_scenarios')
+    future_tmy_files = st.multiselect("Select the Future Typical Year Files:", file_options, key='future_tmys')
+
+    if heatwave_scenario_files and future_tmy_files:
+        if st.button('Create Future Heatwave Ensemble'):
+            uploads = {file.name: file for file in weather_files}
+            output_files = create_future_heatwave_ensemble(uploads[baseline_weather_file],
+                                                           [uploads[name] for name in heatwave_scenario_files],
+                                                           [uploads[name] for name in future_tmy_files],
+                                                           'Extreme Weather/Future Heatwave Ensemble')
+
+            st.session_state['future_ensemble_zip'] = zip_files(output_files).getvalue()
+            st.success(f'Created {len(output_files)} future heatwave scenarios.')
+
+        if st.session_state.get('future_ensemble_zip'):
+            st.download_button(
+                label="Download Scenarios",
+                data=st.session_state.future_ensemble_zip,
+                file_name='Future_Heatwave_Ensemble.zip',
+                mime="application/zip"
+            )
+
 def get_file_buffer(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
         text_data = file.read()
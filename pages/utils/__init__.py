@@ -3,3 +3,17 @@ from . import epw
 from . import app_BEM
 from . import app_postprocessing
 from . import app_preprocessing
+from . import app_results
+from . import app_data_access
+from . import app_stores
+from . import app_survivability
+from . import app_pipeline
+from . import app_workspace
+from . import app_catalog
+from . import app_ingest
+from . import app_epw_cache
+from . import app_weather_years
+from . import app_screening
+from . import app_surrogate
+from . import app_fidelity
+from . import app_compaction
@@ -1,42 +1,80 @@
 ##EnergyPlus Simulations
 import os
 import os.path
-import streamlit as st
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 #Specify path to EnergyPlus executable
 eplus_path = '/Applications/EnergyPlus-23-1-0/energyplus'
 
+#Fidelity preset of the simulation that wrote the eplusout.csv next to it; simulations without it were run with 'full'
+fidelity_file_name = 'eplusout.fidelity'
+
+
+#Fidelity preset of the results of a simulation folder
+def simulation_fidelity(path):
+    fidelity_path = os.path.join(path, fidelity_file_name)
+    if not os.path.exists(fidelity_path):
+        return 'full'
+    with open(fidelity_path) as f:
+        return f.read().strip()
+
+
+#Run EnergyPlus for one simulation folder and return its exit code
+#The fidelity is recorded once the simulation has completed, so an interrupted run is never taken for a valid one
+def run_energyplus(path, fidelity='full'):
+
+    weather_path = path + '/weather.epw'
+    building_path = path + '/in.idf'
+    fidelity_path = os.path.join(path, fidelity_file_name)
+    if os.path.exists(fidelity_path):
+        os.remove(fidelity_path)
+
+    #Arguments are passed as a list, so paths with spaces need no escaping
+    completed = subprocess.run([eplus_path, '-d', path, '-w', weather_path, '-r', building_path])
+    if completed.returncode == 0:
+        with open(fidelity_path, 'w') as f:
+            f.write(fidelity)
+    return completed.returncode
+
+
 #Receives an array of output locations where each location contains an in.idf and weather.epw file and runs them all
-def BEM_simulation(simulation_folders):
+#Up to `workers` simulations run at the same time; progress(stage, fraction, text) is called from the calling thread only
+#Returns the EnergyPlus exit code of every simulation folder (None if it was skipped because it had been run before with the same fidelity)
+def BEM_simulation(simulation_folders, rerun_all=False, workers=1, progress=None, fidelity='full'):
 
     #Total number of simulations to run
     total_simulations = len(simulation_folders)
     completed_simulations = 0
+    return_codes = {}
 
-    #Initialize Streamlit progress bar
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
+    #Only run EnergyPlus for configurations that have not been run before with the same fidelity
+    to_run = []
     for path in simulation_folders:
-
-        #Update the progress bar
-        progress_bar.progress(completed_simulations / total_simulations)
-        status_text.text(f'Running simulation {completed_simulations + 1} of {total_simulations}...')
-
-        #Only run EnergyPlus for this configuration if it has not been run before
-        if os.path.exists(path + '/eplusout.csv') and not st.session_state.rerun_all:
+        if os.path.exists(path + '/eplusout.csv') and simulation_fidelity(path) == fidelity and not rerun_all:
+            return_codes[path] = None
             completed_simulations += 1
-            continue
+        else:
+            to_run.append(path)
 
-        weather_path = path + '/weather.epw'
-        building_path = path + '/in.idf'
+    if progress:
+        progress('simulation', completed_simulations / total_simulations,
+                 f'Running simulation {completed_simulations + 1} of {total_simulations}...')
 
-        #Specify and execute command for EnergyPlus simulation
-        path = eplus_path + ' -d ' + path.replace(" ", "\ ") + ' -w ' + weather_path.replace(" ", "\ ") + ' -r ' + building_path.replace(" ", "\ ")
-        os.system(path)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run_energyplus, path, fidelity): path for path in to_run}
 
-        completed_simulations += 1
+        for future in as_completed(futures):
+            return_codes[futures[future]] = future.result()
+            completed_simulations += 1
+
+            #Update the progress bar
+            if progress and completed_simulations < total_simulations:
+                progress('simulation', completed_simulations / total_simulations,
+                         f'Running simulation {completed_simulations + 1} of {total_simulations}...')
 
     #Complete the progress bar
-    progress_bar.progress(1.0)
-    status_text.text(f'Simulation complete. {total_simulations} simulations run.')
\ No newline at end of file
+    if progress:
+        progress('simulation', 1.0, f'Simulation complete. {total_simulations} simulations run.')
+
+    return return_codes
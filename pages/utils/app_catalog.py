@@ -0,0 +1,178 @@
+##SQLite catalog of completed runs, so results can be listed and reopened without resimulating
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from .app_stores import close_stores
+from .app_workspace import runs_folder, run_workspace, read_manifest, manifest_file_name, workspace_lock, last_opened
+
+catalog_file_name = 'catalog.sqlite'
+
+#Runs shown on the Results page within this many hours count as open in a session and are never removed
+open_run_hours = 12
+
+#One row per run with its manifest (folders, zones, settings, timings, data folder) and one row per input file
+schema = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created TEXT NOT NULL,
+    workspace TEXT NOT NULL,
+    data_path TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    manifest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inputs (
+    run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (run_id, kind, name)
+);
+CREATE INDEX IF NOT EXISTS runs_created ON runs(created);
+'''
+
+
+def catalog_path(output_folder='Output'):
+    return os.path.join(output_folder, catalog_file_name)
+
+
+def connect(output_folder='Output'):
+    os.makedirs(output_folder, exist_ok=True)
+    connection = sqlite3.connect(catalog_path(output_folder), timeout=30)
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.executescript(schema)
+    return connection
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names)
+
+
+#Hashes of the input files of a run as [kind, name, sha256] with kind 'building' or 'weather'
+#Computed when the simulation folders are created, before preprocessing modifies the building files
+def input_hashes(folders):
+    return [[kind, name, file_sha256(os.path.join(folder, file_name))]
+            for kind, file_name in (('building', 'in.idf'), ('weather', 'weather.epw'))
+            for name, folder in first_simulation_folders(folders, kind).items()]
+
+
+#One simulation folder per building or weather scenario of a run
+def first_simulation_folders(folders, kind):
+    first_folders = {}
+    for building, building_folder in zip(folders['building_names'], folders['building_folders']):
+        for weather in folders['weather_folders']:
+            name = building if kind == 'building' else weather
+            first_folders.setdefault(name, os.path.join(building_folder, weather))
+    return first_folders
+
+
+#Add or replace a run in the catalog
+def record_run(manifest, output_folder='Output'):
+    inputs = manifest.get('inputs') or input_hashes(manifest)
+    with closing(connect(output_folder)) as connection, connection:
+        connection.execute('DELETE FROM runs WHERE run_id = ?', (manifest['run_id'],))
+        connection.execute('INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)',
+                           (manifest['run_id'], manifest['created'], manifest['workspace'], manifest['data_path'],
+                            folder_size(manifest['workspace']), json.dumps(manifest, default=str)))
+        connection.executemany('INSERT INTO inputs VALUES (?, ?, ?, ?)',
+                               [(manifest['run_id'], kind, name, sha256) for kind, name, sha256 in inputs])
+
+
+#Manifests of all catalogued runs, newest first
+def list_runs(output_folder='Output'):
+    if not os.path.exists(catalog_path(output_folder)):
+        rebuild_catalog(output_folder)
+    with closing(connect(output_folder)) as connection:
+        rows = connection.execute('SELECT manifest FROM runs ORDER BY created DESC').fetchall()
+    return [json.loads(manifest) for manifest, in rows]
+
+
+def run_inputs(run_id, output_folder='Output'):
+    with closing(connect(output_folder)) as connection:
+        return connection.execute('SELECT kind, name, sha256 FROM inputs WHERE run_id = ? ORDER BY kind, name',
+                                  (run_id,)).fetchall()
+
+
+#Index the manifests of workspaces written before the catalog existed (or after it was deleted)
+#Hashes missing from old manifests are computed from the (preprocessed) files in the workspace
+def rebuild_catalog(output_folder='Output'):
+    runs_path = os.path.join(output_folder, runs_folder)
+    if not os.path.isdir(runs_path):
+        return
+    for run_id in os.listdir(runs_path):
+        workspace = os.path.join(runs_path, run_id)
+        if os.path.exists(os.path.join(workspace, manifest_file_name)):
+            record_run(read_manifest(workspace), output_folder)
+
+
+#Catalogued runs as (run id, created, workspace, size in bytes), oldest first
+#Workspaces are resolved against output_folder, so the catalog does not depend on the working directory of the process that wrote it
+def catalogued_runs(output_folder='Output'):
+    with closing(connect(output_folder)) as connection:
+        rows = connection.execute('SELECT run_id, created, size_bytes FROM runs ORDER BY created').fetchall()
+    return [(run_id, created, run_workspace(output_folder, run_id), size_bytes) for run_id, created, size_bytes in rows]
+
+
+#Runs a session of the Results page showed within the last open_run_hours
+def open_runs(runs):
+    cutoff = time.time() - open_run_hours * 3600
+    return {run_id for run_id, _, workspace, _ in runs if (last_opened(workspace) or 0) > cutoff}
+
+
+#Remove runs older than max_age_days, then the oldest runs until all runs fit into max_size_bytes
+#Runs in keep and runs open in a session of the Results page are never removed; runs whose workspace is missing are
+#reported but neither removed nor counted. Returns the removed run ids and the space freed
+def collect_garbage(output_folder='Output', max_age_days=None, max_size_bytes=None, keep=()):
+
+    runs = catalogued_runs(output_folder)
+    missing = [run[0] for run in runs if not os.path.isdir(run[2])]
+    runs = [run for run in runs if run[0] not in missing]
+    keep = set(keep) | open_runs(runs)
+
+    to_remove = []
+    if max_age_days is not None:
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec='seconds')
+        to_remove = [run for run in runs if run[1] < cutoff and run[0] not in keep]
+    if max_size_bytes is not None:
+        total_size = sum(run[3] for run in runs if run not in to_remove)
+        for run in runs:
+            if total_size <= max_size_bytes:
+                break
+            if run not in to_remove and run[0] not in keep:
+                to_remove.append(run)
+                total_size -= run[3]
+
+    removed = []
+    not_removed = []
+    freed_bytes = 0
+    for run_id, _, workspace, _ in to_remove:
+        #Wait for a job still writing to the workspace and release the read handles of its data files
+        with workspace_lock(workspace):
+            size_bytes = folder_size(workspace)
+            close_stores(os.path.join(workspace, 'data'))
+            shutil.rmtree(workspace, ignore_errors=True)
+        left_bytes = folder_size(workspace) if os.path.isdir(workspace) else 0
+        freed_bytes += size_bytes - left_bytes
+
+        #A workspace that could not be removed completely (e.g. a file still open on Windows) stays in the catalog
+        with closing(connect(output_folder)) as connection, connection:
+            if os.path.isdir(workspace):
+                connection.execute('UPDATE runs SET size_bytes = ? WHERE run_id = ?', (left_bytes, run_id))
+                not_removed.append(run_id)
+            else:
+                connection.execute('DELETE FROM runs WHERE run_id = ?', (run_id,))
+                removed.append(run_id)
+
+    return {'removed': removed, 'freed_bytes': freed_bytes, 'not_removed': not_removed, 'missing': missing}
@@ -0,0 +1,93 @@
+##Compaction of the EnergyPlus artifacts of simulation folders, keeping only what reruns, postprocessing and the surrogates read
+import gzip
+import os
+import shutil
+from datetime import datetime, timedelta
+from .app_catalog import catalogued_runs, record_run
+from .app_workspace import read_manifest, workspace_lock, write_manifest
+
+#Files kept as they are: the inputs, the hourly results (an existing eplusout.csv marks a simulation as done), the fidelity
+#it was simulated with and the run status
+keep_files = {'in.idf', 'weather.epw', 'eplusout.csv', 'eplusout.fidelity', 'eplusout.err', 'eplusout.end'}
+
+#Reports kept gzip-compressed for inspection (summary tables and the model description); all other artifacts
+#(eso, mtr, audit, shading, rdd/mdd, sql, ...) are deleted, as eplusout.csv holds all results that are used
+compress_extensions = {'.htm', '.html', '.eio'}
+
+
+#Compact one simulation folder; returns the number of deleted and compressed files and the bytes reclaimed
+def compact_simulation_folder(simulation_folder):
+
+    deleted = compressed = freed_bytes = 0
+    for file_name in os.listdir(simulation_folder):
+        file_path = os.path.join(simulation_folder, file_name)
+        if file_name in keep_files or file_name.endswith('.gz') or not os.path.isfile(file_path):
+            continue
+
+        size = os.path.getsize(file_path)
+        if os.path.splitext(file_name)[1].lower() in compress_extensions:
+            with open(file_path, 'rb') as source, gzip.open(file_path + '.gz', 'wb') as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+            freed_bytes += size - os.path.getsize(file_path + '.gz')
+            compressed += 1
+        else:
+            freed_bytes += size
+            deleted += 1
+        os.remove(file_path)
+
+    return {'deleted_files': deleted, 'compressed_files': compressed, 'freed_bytes': freed_bytes}
+
+
+#Compact all simulation folders of a run; the caller holds the lock of its workspace
+def compact_simulation_folders(simulation_folders):
+    report = {'deleted_files': 0, 'compressed_files': 0, 'freed_bytes': 0}
+    for simulation_folder in simulation_folders:
+        if os.path.isdir(simulation_folder):
+            for key, value in compact_simulation_folder(simulation_folder).items():
+                report[key] += value
+    return report
+
+
+#Compact a completed run that has not been compacted before; returns its compaction report or None
+def compact_run(workspace, output_folder='Output'):
+
+    #Wait for a job still writing to the workspace
+    with workspace_lock(workspace):
+        manifest = read_manifest(workspace)
+        if manifest.get('compaction'):
+            return None
+        #The manifest holds the folders as written by the pipeline, relative to its working directory
+        simulation_folders = [os.path.join(workspace, os.path.relpath(folder, manifest['workspace'])) for folder in manifest['simulation_folders']]
+        report = compact_simulation_folders(simulation_folders)
+        manifest['compaction'] = {'compacted': datetime.now().isoformat(timespec='seconds'), **report}
+        write_manifest(workspace, manifest)
+
+    record_run(manifest, output_folder)
+    return report
+
+
+#Compact the runs older than max_age_days, and the oldest runs while all runs together are larger than max_size_bytes
+#Runs in keep and runs compacted before are left as they are; returns the compacted run ids and the space reclaimed
+def compact_runs(output_folder='Output', max_age_days=None, max_size_bytes=None, keep=()):
+
+    rows = [row for row in catalogued_runs(output_folder) if os.path.isdir(row[2])]
+    cutoff = None if max_age_days is None else (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec='seconds')
+    total_size = sum(row[3] for row in rows)
+
+    compacted = []
+    report = {'deleted_files': 0, 'compressed_files': 0, 'freed_bytes': 0}
+    for run_id, created, workspace, _ in rows:
+        too_old = cutoff is not None and created < cutoff
+        too_large = max_size_bytes is not None and total_size > max_size_bytes
+        if run_id in keep or not (too_old or too_large):
+            continue
+
+        run_report = compact_run(workspace, output_folder)
+        if run_report is None:
+            continue
+        compacted.append(run_id)
+        total_size -= run_report['freed_bytes']
+        for key, value in run_report.items():
+            report[key] += value
+
+    return {'compacted': compacted, **report, 'total_bytes': total_size}
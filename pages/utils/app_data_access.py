@@ -0,0 +1,144 @@
+##Memoized reading of the postprocessed results for the Results page
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+from .app_postprocessing import calculate_dh_eh, distribution_summary, summer_key, summary_columns, read_summary_table
+from .app_stores import open_store, stores_lock
+
+#Data files in the data folder of every run; only the annual series are stored, summer subsets and baseline differences are derived from them
+annual_file_name = 'annual_data.h5'
+hottest_file_name = 'hottest_weeks_data.h5'
+distribution_file_name = 'distribution_data.h5'
+summary_file_name = 'summary.parquet'
+
+#All readers take the data folder of the run to read from, so sessions viewing different runs never share cache entries
+
+
+def file_mtime(file_path):
+    return os.path.getmtime(file_path)
+
+
+#Memoized by file path, modification time and key, so rewritten files are never served from stale cache entries
+@st.cache_data(show_spinner=False, max_entries=10000)
+def _read_key(hdf5_file_path, mtime, hdf_key):
+    with stores_lock:
+        return open_store(hdf5_file_path, mtime)[hdf_key]
+
+
+#Reading data for a specific building, weather file, metric and zone
+def read_data_for_display(hdf5_file_path, building_folder, weather, metric, zone):
+    hdf_key = f'{building_folder}/{zone}/{weather}/{metric}'
+    arr = _read_key(hdf5_file_path, file_mtime(hdf5_file_path), hdf_key).to_numpy()
+    return np.concatenate(arr)
+
+
+#Hourly values over the hottest weeks of all zones, weather scenarios and metrics of a building, loaded in one read
+#Columns are indexed by (zone, weather, metric)
+def read_hottest_block(data_path, building):
+    hottest_file_path = os.path.join(data_path, hottest_file_name)
+    return _read_key(hottest_file_path, file_mtime(hottest_file_path), building)
+
+
+def read_hottest_data(data_path, building, weather, metric, zone):
+    return read_hottest_block(data_path, building)[(zone, weather, metric)].to_numpy()
+
+
+#Month of every hourly value of the annual series of a building
+def read_months(data_path, building):
+    annual_file_path = os.path.join(data_path, annual_file_name)
+    return _read_key(annual_file_path, file_mtime(annual_file_path), f'{building}/months').to_numpy().flatten()
+
+
+#Boolean mask selecting the summer hours of the annual series of a building
+@st.cache_data(show_spinner=False)
+def _summer_filter(data_path, building, summer_months, mtime):
+    return np.isin(read_months(data_path, building), summer_months)
+
+
+#Hourly values over the summer months
+@st.cache_data(show_spinner=False)
+def _read_summer_data(data_path, building, weather, metric, zone, summer_months, mtime):
+    data = read_data_for_display(os.path.join(data_path, annual_file_name), building, weather, metric, zone)
+    return data[_summer_filter(data_path, building, summer_months, mtime)]
+
+
+def read_summer_data(data_path, building, weather, metric, zone, summer_months):
+    mtime = file_mtime(os.path.join(data_path, annual_file_name))
+    return _read_summer_data(data_path, building, weather, metric, zone, summer_months, mtime)
+
+
+#Hourly differences to the baseline scenario over the summer months
+@st.cache_data(show_spinner=False)
+def _read_summer_differences(data_path, building, weather, baseline, metric, zone, summer_months, mtime):
+    current = _read_summer_data(data_path, building, weather, metric, zone, summer_months, mtime)
+    baseline_data = _read_summer_data(data_path, building, baseline, metric, zone, summer_months, mtime)
+    return current - baseline_data
+
+
+def read_summer_differences(data_path, building, weather, baseline, metric, zone, summer_months):
+    mtime = file_mtime(os.path.join(data_path, annual_file_name))
+    return _read_summer_differences(data_path, building, weather, baseline, metric, zone, summer_months, mtime)
+
+
+#Degree and Exceedance hours of a stored annual series for a given threshold (cached per threshold)
+@st.cache_data(show_spinner=False)
+def _read_dh_eh(data_path, building, weather, metric, zone, threshold, mtime):
+    data = read_data_for_display(os.path.join(data_path, annual_file_name), building, weather, metric, zone)
+    return calculate_dh_eh(data, threshold)
+
+
+def read_dh_eh(data_path, building, weather, metric, zone, threshold):
+    mtime = file_mtime(os.path.join(data_path, annual_file_name))
+    return _read_dh_eh(data_path, building, weather, metric, zone, threshold, mtime)
+
+
+#Distribution summaries precomputed in postprocessing, indexed by (zone, weather, metric, baseline, summer months)
+@st.cache_data(show_spinner=False)
+def _read_distribution_table(data_path, building, mtime):
+    distribution_file_path = os.path.join(data_path, distribution_file_name)
+    if not os.path.exists(distribution_file_path):
+        return None
+    with stores_lock:
+        store = open_store(distribution_file_path, mtime)
+        if '/' + building not in store.keys():
+            return None
+        table = store[building]
+    return table.set_index(['Zone', 'Weather', 'Metric', 'Baseline', 'Summer']).sort_index()
+
+
+@st.cache_data(show_spinner=False)
+def _compute_distribution_summary(data_path, building, weather, baseline, metric, zone, summer_months, mtime):
+    differences = _read_summer_differences(data_path, building, weather, baseline, metric, zone, summer_months, mtime)
+    return pd.Series(distribution_summary(differences))
+
+
+#Summary of the summer differences to the baseline; computed and memoized when the baseline or summer months differ from postprocessing
+def read_distribution_summary(data_path, building, weather, baseline, metric, zone, summer_months):
+    distribution_file_path = os.path.join(data_path, distribution_file_name)
+    mtime = file_mtime(distribution_file_path) if os.path.exists(distribution_file_path) else None
+    table = _read_distribution_table(data_path, building, mtime)
+    key = (zone, weather, metric, baseline, summer_key(summer_months))
+    if table is not None and key in table.index:
+        return table.loc[key]
+    mtime = file_mtime(os.path.join(data_path, annual_file_name))
+    return _compute_distribution_summary(data_path, building, weather, baseline, metric, zone, summer_months, mtime)
+
+
+#Portfolio summary (Dh/Eh, Activity hours and peak Humidex of all scenarios) indexed by (building, zone, weather, metric, age group, statistic)
+#Kept as a shared resource rather than copied per read, as it is only filtered and never modified
+@st.cache_resource(show_spinner=False, max_entries=20)
+def _read_summary(summary_file_path, mtime):
+    summary = read_summary_table(summary_file_path)
+    return summary.set_index(summary_columns[:-1]).sort_index()['Value']
+
+
+def read_summary(data_path):
+    summary_file_path = os.path.join(data_path, summary_file_name)
+    return _read_summary(summary_file_path, file_mtime(summary_file_path))
+
+
+#Values of one metric and statistic (and age group of the Activity hours) for all buildings, zones and weather scenarios,
+#indexed by (building, zone, weather)
+def read_summary_values(data_path, metric, statistic, age_group=''):
+    return read_summary(data_path).xs((metric, age_group, statistic), level=['Metric', 'Age group', 'Statistic'])
@@ -0,0 +1,183 @@
+##Cache of parsed weather files keyed by content hash, shared by all pipeline stages and the heatwave tools
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .epw import epw
+from .app_ingest import read_input
+
+#Parsed files are kept on disk as parquet, with the headers and formatting in the file metadata, and derived values as JSON
+epw_cache_folder = 'Output/cache/epw'
+
+#Number of parsed files kept in memory per process
+max_parsed_files = 32
+
+#Size of the disk cache; the least recently used files are removed beyond it
+max_cache_bytes = int(2e9)
+
+#Number of locks the file contents are spread over
+lock_stripes = 64
+
+_parsed = OrderedDict()
+_derived = {}
+#Content hash, modification time and size of every weather file path hashed, so unchanged files are not read to be hashed again
+_path_hashes = {}
+#Guards the dictionaries above only; parsing and computing hold the lock of their file content
+_cache_lock = threading.RLock()
+_key_locks = [threading.RLock() for _ in range(lock_stripes)]
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+#Content hash of a path or file-like object; paths are only read again once their modification time or size changes
+def source_hash(source):
+    if not isinstance(source, (str, os.PathLike)):
+        return content_hash(read_input(source))
+
+    path = os.path.abspath(source)
+    stat = os.stat(path)
+    with _cache_lock:
+        mtime, size, key = _path_hashes.get(path, (None, None, None))
+    if (mtime, size) != (stat.st_mtime_ns, stat.st_size):
+        key = content_hash(read_input(path))
+        with _cache_lock:
+            _path_hashes[path] = (stat.st_mtime_ns, stat.st_size, key)
+    return key
+
+
+def _cache_file(key, extension):
+    return os.path.join(epw_cache_folder, key + extension)
+
+
+#Lock of one file content, so the same file is parsed (or a value derived) once while other files proceed in parallel
+#The contents share a fixed number of locks, so the locks do not grow with the number of files
+def _key_lock(key):
+    return _key_locks[int(key[:8], 16) % lock_stripes]
+
+
+#Write to a temporary file first so concurrent readers never see a partial file
+def _write_atomic(file_path, write):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = file_path + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+def _load_parsed(key, source):
+
+    #Files cached without the decimals of their columns are parsed again
+    cache_file = _cache_file(key, '.parquet')
+    if os.path.exists(cache_file):
+        table = pq.read_table(cache_file)
+        metadata = json.loads(table.schema.metadata[b'epw'])
+        if 'decimals' in metadata:
+            os.utime(cache_file)
+            return metadata['headers'], metadata['line_terminator'], metadata['decimals'], table.to_pandas()
+
+    file = epw()
+    file.read(io.BytesIO(read_input(source)))
+
+    table = pa.Table.from_pandas(file.dataframe, preserve_index=False)
+    metadata = json.dumps({'headers': file.headers, 'line_terminator': file.line_terminator, 'decimals': file.decimals}).encode()
+    table = table.replace_schema_metadata({**table.schema.metadata, b'epw': metadata})
+    _write_atomic(cache_file, lambda path: pq.write_table(table, path))
+    prune_cache()
+
+    return file.headers, file.line_terminator, file.decimals, file.dataframe
+
+
+#Parsed file of the given source and content hash, from memory, the disk cache or parsed and added to both
+def _parsed_file(key, source):
+
+    with _key_lock(key):
+        with _cache_lock:
+            parsed = _parsed.get(key)
+            if parsed is not None:
+                _parsed.move_to_end(key)
+        if parsed is None:
+            parsed = _load_parsed(key, source)
+            with _cache_lock:
+                _parsed[key] = parsed
+                if len(_parsed) > max_parsed_files:
+                    _parsed.popitem(last=False)
+    headers, line_terminator, decimals, dataframe = parsed
+
+    #Copies, so callers may modify the returned file
+    file = epw()
+    file.headers = {name: list(values) for name, values in headers.items()}
+    file.line_terminator = line_terminator
+    file.decimals = dict(decimals)
+    file.dataframe = dataframe.copy()
+    return file
+
+
+#Parsed epw file of a path or file-like object (e.g. a Streamlit upload); each unique file is parsed once
+def read_epw(source):
+    return _parsed_file(source_hash(source), source)
+
+
+def _write_json(file_path, value):
+    with open(file_path, 'w') as f:
+        json.dump(value, f)
+
+
+#Value derived from a weather file (e.g. the start of its hottest week), computed once per file content, name and version
+#compute(file) must return a JSON serializable value; callers increase version when they change how the value is computed
+def derived_value(source, name, compute, version=1):
+
+    key = source_hash(source)
+    name = f'{name}@{version}'
+
+    with _key_lock(key):
+        with _cache_lock:
+            derived = _derived.get(key)
+        if derived is None:
+            derived_file = _cache_file(key, '.json')
+            if os.path.exists(derived_file):
+                with open(derived_file) as f:
+                    derived = json.load(f)
+                os.utime(derived_file)
+            else:
+                derived = {}
+            with _cache_lock:
+                _derived[key] = derived
+
+        if name not in derived:
+            derived[name] = compute(_parsed_file(key, source))
+            _write_atomic(_cache_file(key, '.json'), lambda path: _write_json(path, derived))
+
+        return derived[name]
+
+
+#Remove the least recently used files of the disk cache until it fits into max_bytes; returns the files removed and the space freed
+def prune_cache(max_bytes=max_cache_bytes):
+
+    if not os.path.isdir(epw_cache_folder):
+        return {'removed_files': 0, 'freed_bytes': 0}
+
+    files = []
+    for entry in os.scandir(epw_cache_folder):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total_size = sum(size for _, size, _ in files)
+
+    removed = freed_bytes = 0
+    for _, size, file_path in sorted(files):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            continue
+        total_size -= size
+        removed += 1
+        freed_bytes += size
+
+    return {'removed_files': removed, 'freed_bytes': freed_bytes}
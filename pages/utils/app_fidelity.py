@@ -0,0 +1,44 @@
+##Comparison of simulation fidelity presets: runtime saved and error of the hottest-week results against the full preset
+import os
+import pandas as pd
+from .app_pipeline import run_pipeline
+from .app_postprocessing import dh_eh_statistics, activity_levels, summary_columns, read_summary_table
+
+#Statistics of the portfolio summary that describe the hottest week (and the peak Humidex)
+hottest_week_statistics = dh_eh_statistics[2:] + ['Peak'] + activity_levels
+
+#Stages whose duration depends on the fidelity
+simulation_stages = ['preprocess', 'simulation']
+
+
+#Run the same buildings and weather files with the full and another fidelity preset as two runs and compare them
+def compare_fidelity(buildings, weathers, settings=None, output_folder='Output', workers=1, progress=None, fidelity='screening'):
+    manifests = {preset: run_pipeline(buildings, weathers, {**(settings or {}), 'fidelity': preset}, output_folder, workers, progress)
+                 for preset in ('full', fidelity)}
+    return fidelity_report(manifests['full'], manifests[fidelity])
+
+
+#Runtime saved by a run and the error of its hottest-week results against a reference run of the same inputs
+#Errors are per metric, age group and statistic over all buildings, zones and weather scenarios
+def fidelity_report(reference, candidate):
+
+    keys = summary_columns[:-1]
+    summaries = [read_summary_table(os.path.join(run['data_path'], 'summary.parquet')) for run in (reference, candidate)]
+    summaries = [summary[summary['Statistic'].isin(hottest_week_statistics)].astype({key: str for key in keys})
+                 for summary in summaries]
+    compared = summaries[0].merge(summaries[1], on=keys, suffixes=(' reference', ' candidate'))
+    compared['Error'] = compared['Value candidate'] - compared['Value reference']
+    compared['Absolute Error'] = compared['Error'].abs()
+
+    errors = compared.groupby(['Metric', 'Age group', 'Statistic'], sort=False).agg(
+        **{'Mean Reference': ('Value reference', 'mean'), 'Mean Error': ('Error', 'mean'),
+           'Mean Absolute Error': ('Absolute Error', 'mean'), 'Maximum Absolute Error': ('Absolute Error', 'max')}).round(3)
+
+    reference_seconds = sum(reference['timings'][stage] for stage in simulation_stages)
+    candidate_seconds = sum(candidate['timings'][stage] for stage in simulation_stages)
+
+    return {'reference': {'run_id': reference['run_id'], 'fidelity': reference['settings']['fidelity'], 'seconds': round(reference_seconds, 2)},
+            'candidate': {'run_id': candidate['run_id'], 'fidelity': candidate['settings']['fidelity'], 'seconds': round(candidate_seconds, 2)},
+            'saved_seconds': round(reference_seconds - candidate_seconds, 2),
+            'saved_fraction': round(1 - candidate_seconds / reference_seconds, 3) if reference_seconds else None,
+            'errors': errors.reset_index().to_dict(orient='records')}
@@ -1,6 +1,13 @@
 ##Functions for creating extreme weather scenarios
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from .epw import epw
+from .app_epw_cache import read_epw, derived_value
 
 epw_cols = ['Year','Month','Day','Hour','Minute','Data Source and Uncertainty Flags','Dry Bulb Temperature','Dew Point Temperature','Relative Humidity',
 'Atmospheric Station Pressure','Extraterrestrial Horizontal Radiation','Extraterrestrial Direct Normal Radiation','Horizontal Infrared Radiation Intensity',
@@ -10,55 +17,46 @@ epw_cols = ['Year','Month','Day','Hour','Minute','Data Source and Uncertainty Fl
 'Albedo','Liquid Precipitation Depth','Liquid Precipitation Quantity']
 
 #Fins hottest day in hottest week
+#Weekly means are computed for all daily window starts at once; the year wraps around for weeks starting in the last days
 def find_hottest_day(epw_data):
 
-    temperature_data = epw_data['Dry Bulb Temperature']
+    temperature_data = epw_data['Dry Bulb Temperature'].to_numpy(dtype=float)
     week_hours = 24 * 7
     arr_len = len(temperature_data)
 
-    epw_data_extended = pd.concat([temperature_data, temperature_data]).reset_index(drop=True)
-
-    #Initialize variables for tracking the hottest week
-    week_data = epw_data_extended[:week_hours]
-    week_mean_temp = week_data.mean()
-
-    max_mean_temp = week_mean_temp
-    current_week_start = 0
-
-    #Iterate in steps of 24 hours / 1 day
-    for week_start in range(0, arr_len, 24):
-        # Calculate the mean temperature for the current window of one week
-        week_end = week_start + week_hours
-
-        week_data = epw_data_extended[week_start:week_end]
-        week_mean_temp = week_data.mean()
+    epw_data_extended = np.concatenate([temperature_data, temperature_data])
+    current_week_start, _ = hottest_week_index(temperature_data)
 
-        #Update if the current week's mean temperature is higher than the max found so far
-        if week_mean_temp > max_mean_temp:
-            max_mean_temp = week_mean_temp
-            current_week_start = week_start
+    #Find hottest day in hottest week (only days with a positive mean temperature replace the start of the week)
+    day_means = epw_data_extended[current_week_start:current_week_start + week_hours].reshape(7, 24).mean(axis=1)
+    hottest_offset = int(np.argmax(day_means))
+    hottest_day_idx = current_week_start + 24 * hottest_offset if day_means[hottest_offset] > 0 else current_week_start
 
-    hottest_day_idx = current_week_start
-    hottest_day_mean = 0
-    epw_data_extended[current_week_start:current_week_start+24]
+    month = epw_data['Month'].iloc[hottest_day_idx % arr_len]
+    day = epw_data['Day'].iloc[hottest_day_idx % arr_len]
 
-    #Find hottest day in hottest week
-    for offset in range(0, 7*24, 24):
+    return month, day
 
-        curr_day_start = current_week_start + offset
+#Start index and mean temperature of the hottest week of one year of hourly temperatures
+#Mean temperatures of the weeks starting at every day are computed at once; the first hottest week is taken
+#Weeks starting in the last days run into the following hours: the start of the same year for a typical year (the default),
+#the next year of an actual (multi-year) record, or none for its last year, where only complete weeks are compared
+def hottest_week_index(temperature_data, following=None):
 
-        day_data = epw_data_extended[curr_day_start:curr_day_start+24]
-        day_mean = day_data.mean()
+    week_hours = 24 * 7
+    arr_len = len(temperature_data)
+    if following is None:
+        following = temperature_data
 
-        # Update if the current day's mean temperature is higher than the max found so far
-        if day_mean > hottest_day_mean:
-            hottest_day_mean = day_mean
-            hottest_day_idx = curr_day_start
+    epw_data_extended = np.concatenate([temperature_data, following[:week_hours - 1]])
+    if len(epw_data_extended) < week_hours:
+        raise ValueError(f'{arr_len} hours of temperature data are shorter than one week')
 
-    month = epw_data['Month'].iloc[hottest_day_idx % arr_len]
-    day = epw_data['Day'].iloc[hottest_day_idx % arr_len]
+    week_starts = min(arr_len, len(epw_data_extended) - week_hours + 1)
+    week_means = sliding_window_view(epw_data_extended, week_hours)[0:week_starts:24].mean(axis=1)
 
-    return month, day
+    hottest_week = int(np.argmax(week_means))
+    return 24 * hottest_week, float(week_means[hottest_week])
 
 # Function to find the hottest day in summer
 def find_hottest_summer_day(epw_data):
@@ -84,108 +82,291 @@ def extend_heatwave(input_file, output_file, heat_length):
 
     #Load the EPW file
 
-    file = epw()
-    file.read(input_file)
-    epw_data = file.dataframe
-    file_len = len(epw_data)
+    file = read_epw(input_file)
+
+    #Find the hottest day of hottest week / heatwave (hottest in terms of highest mean temperature), once per unique file
+    hottest_month, hottest_day = hottest_day_of(input_file)
+
+    file.dataframe = extend_heatwave_data(file.dataframe, heat_length, hottest_month, hottest_day)
+
+    #Save the new EPW file
+    file.write(output_file)
+
+
+def hottest_day_of(input_file):
+    return derived_value(input_file, 'hottest_day', lambda file: [int(value) for value in find_hottest_day(file.dataframe)])
+
+
+#Replicate the data of the hottest day so that it lasts heat_length days, returns the new climate data
+def extend_heatwave_data(epw_data, heat_length, hottest_month, hottest_day):
 
-    #Find the hottest day of hottest week / heatwave (hottest in terms of highest mean temperature)
-    hottest_month, hottest_day = find_hottest_day(epw_data)
-    hottest_data = epw_data[(epw_data['Month'] == hottest_month) & (epw_data['Day'] == hottest_day)]
     #Find the index of the hottest day
-    hottest_day_index = hottest_data.index[0]
+    hottest_day_index = day_index(epw_data, hottest_month, hottest_day)
 
-    heatwave = hottest_data.copy()
+    return replace_days_data(epw_data, hottest_day_index, np.full(heat_length, hottest_day_index // 24))
 
-    #Create heatwave, which is heat_length * the data of the hottest day
-    for i in range(heat_length-1):
 
-        new_next_hot_day = hottest_data.copy()
-        new_next_hot_day['Month'] = epw_data['Month'][(hottest_day_index + 24*(i+1)) % file_len]
-        new_next_hot_day['Day'] = epw_data['Day'][(hottest_day_index + 24*(i+1)) % file_len]
+def day_index(epw_data, month, day):
+    return int(np.flatnonzero((epw_data['Month'] == month).to_numpy() & (epw_data['Day'] == day).to_numpy())[0])
 
-        heatwave = pd.concat([heatwave]+[new_next_hot_day])
 
-    #Select data before and after the hottest day that we do not replace
-    before_hottest_data = epw_data.iloc[:hottest_day_index]
+#Replace the days from start_index on with the days source_days (day numbers of the year), returns the new climate data
+#The output is one index mapping over the input rows: replaced hours take the rows of their source day (wrapping
+#around the end of the year) and keep the Month and Day of the day they replace, all other hours stay unchanged
+def replace_days_data(epw_data, start_index, source_days):
 
-    if hottest_day_index + 24 * heat_length > file_len:
-        hours_to_wrap = (hottest_day_index + 24 * heat_length) - file_len
-        before_hottest_data = pd.concat([heatwave[-hours_to_wrap:]] + [before_hottest_data[hours_to_wrap:]], ignore_index=True)
-        heatwave = heatwave[:-hours_to_wrap]
-        after_hottest_data = pd.DataFrame([])
-    else:
-        after_hottest_data = epw_data.iloc[hottest_day_index + 24 * heat_length:]
+    file_len = len(epw_data)
+    source_days = np.asarray(source_days)
 
-    #Concatenate the data
-    file.dataframe = pd.concat([before_hottest_data] + [heatwave] + [after_hottest_data], ignore_index=True)
+    #Hours from the start index for every row of the output (over the year boundary if needed)
+    offsets = (np.arange(file_len) - start_index) % file_len
+    in_heatwave = offsets < 24 * len(source_days)
 
-    #Save the new EPW file
-    file.write(output_file)
+    #Rows to take the data from, and rows to take Month and Day from (the start of each replaced day)
+    source_index = np.where(in_heatwave, 24 * source_days[np.minimum(offsets // 24, len(source_days) - 1)] + offsets % 24, np.arange(file_len))
+    date_index = np.where(in_heatwave, (start_index + 24 * (offsets // 24)) % file_len, np.arange(file_len))
 
-def create_future_heatwave(tmy_file, heatwave_file, future_file, output_file):
+    extended = epw_data.iloc[source_index].reset_index(drop=True)
+    extended['Month'] = epw_data['Month'].to_numpy()[date_index]
+    extended['Day'] = epw_data['Day'].to_numpy()[date_index]
+    return extended
+
+#Parameters of the stochastic heatwaves: days with a daily mean temperature above this quantile are hot days,
+#and heatwaves are assembled from blocks of this many consecutive days starting at a hot day
+hot_day_quantile = 0.9
+block_days = 3
+
+
+#Draw n_scenarios random heatwaves from the hot days of a weather file (block bootstrap), returns one row per scenario
+#Durations (days) and intensities (K added to the dry bulb temperature) are uniform in the given ranges; with the same seed
+#the same scenarios are drawn. All draws are made up front, so the result does not depend on the order of writing
+def sample_heatwaves(epw_data, n_scenarios, duration_range=(3, 7), intensity_range=(0.0, 2.0), seed=None):
+
+    rng = np.random.default_rng(seed)
+    n_days = len(epw_data) // 24
+
+    day_means = epw_data['Dry Bulb Temperature'].to_numpy(dtype=float)[:24 * n_days].reshape(n_days, 24).mean(axis=1)
+    hot_days = np.flatnonzero(day_means >= np.quantile(day_means, hot_day_quantile))
+
+    durations = rng.integers(duration_range[0], duration_range[1], size=n_scenarios, endpoint=True)
+    intensities = rng.uniform(intensity_range[0], intensity_range[1], size=n_scenarios).round(1)
+
+    #Blocks of consecutive days starting at random hot days, wrapping around the end of the year, cut to each duration
+    n_blocks = -(-int(durations.max()) // block_days)
+    block_starts = rng.choice(hot_days, size=(n_scenarios, n_blocks))
+    days = ((block_starts[:, :, None] + np.arange(block_days)) % n_days).reshape(n_scenarios, -1)
+
+    return pd.DataFrame({'scenario': np.arange(1, n_scenarios + 1),
+                         'duration': durations,
+                         'intensity': intensities,
+                         'source_days': [list(days[i, :durations[i]]) for i in range(n_scenarios)]})
+
+
+#Replace the days from the hottest day of the hottest week on with the sampled days, warmed by the intensity
+def stochastic_heatwave_data(epw_data, start_index, source_days, intensity):
+
+    heatwave_data = replace_days_data(epw_data, start_index, source_days)
+
+    hours = (start_index + np.arange(24 * len(source_days))) % len(epw_data)
+    dry_bulb = heatwave_data['Dry Bulb Temperature'].to_numpy(copy=True)
+    dry_bulb[hours] += intensity
+    heatwave_data['Dry Bulb Temperature'] = dry_bulb
 
-    #Read TMY data
-    tmy_df = epw()
-    tmy_df.read(tmy_file)
-    tmy_data = tmy_df.dataframe
+    #The dew point cannot exceed the dry bulb temperature, and the relative humidity of the warmed hours follows both
+    heatwave_data['Dew Point Temperature'] = np.minimum(heatwave_data['Dew Point Temperature'], heatwave_data['Dry Bulb Temperature'])
+    dew_point = heatwave_data['Dew Point Temperature'].to_numpy(dtype=float)
+    humidity = heatwave_data['Relative Humidity'].to_numpy(dtype=float, copy=True)
+    humidity[hours] = relative_humidity(dry_bulb[hours], dew_point[hours]).round()
+    heatwave_data['Relative Humidity'] = humidity.astype(heatwave_data['Relative Humidity'].dtype)
+    return heatwave_data
 
-    #Read heatwave data
-    heat_df = epw()
-    heat_df.read(heatwave_file)
-    heat_data = heat_df.dataframe
 
-    #Read future data
-    fut_heat_df = epw()
-    fut_heat_df.read(future_file)
-    fut_heat_data = fut_heat_df.dataframe.iloc[:8760,:]
+#Relative humidity (%) of air at a dry bulb and dew point temperature (°C), from the Magnus formula of the saturation vapour pressure
+def relative_humidity(dry_bulb, dew_point):
+    def saturation_pressure(temperature):
+        return np.exp(17.625 * temperature / (temperature + 243.04))
+    return np.clip(100 * saturation_pressure(dew_point) / saturation_pressure(dry_bulb), *clip_ranges['Relative Humidity'])
 
-    #The first 5 columns stay the same; for the remaining ones we always add the difference of the Heatwave-TMY to the typical future data
-    #The heatwave data provided by shinyweatherdata has missing data in the following columns, so we set them to the same values as in the Future TMY
-    #Assumes that the historical heatwave data has values available for the remaining weather variables
-    miss_data_idx = [5, 10, 11, 16, 17, 18, 19, 24, 25, 26, 27, 28, 29, 31, 32, 34]
-    date_idx = [0, 1, 2, 3, 4]
 
-    nr_cols = tmy_data.shape[1]
+#Generate n_scenarios stochastic heatwaves of one weather file (path or uploaded file) for Monte Carlo runs
+#The scenarios are written in parallel as <input>_MC_<scenario>.epw together with their parameters in <input>_MC.csv,
+#so the folder (or its zip archive) can be used as the weather input of a batch run; returns the written paths
+def generate_stochastic_heatwaves(input_file, output_folder, n_scenarios, duration_range=(3, 7), intensity_range=(0.0, 2.0),
+                                  seed=None, workers=4):
 
-    for i in range(nr_cols):
-        #we do not change the year, month, day, hour, minute data
-        if i in date_idx:
-            continue
+    base = read_epw(input_file)
+    start_index = day_index(base.dataframe, *hottest_day_of(input_file))
+    input_name = file_stem(input_file)
 
-        if i in miss_data_idx:
-            continue
+    scenarios = sample_heatwaves(base.dataframe, n_scenarios, duration_range, intensity_range, seed)
+    digits = len(str(n_scenarios))
 
-        fut_heat_data.iloc[:, i] += (heat_data.iloc[:, i] - tmy_data.iloc[:, i])
+    os.makedirs(output_folder, exist_ok=True)
 
-        #clip the RH to [0,100]
-        if epw_cols[i] == 'Relative Humidity':
-            fut_heat_data['Relative Humidity'] = fut_heat_data['Relative Humidity'].clip(lower=0, upper=100)
+    def write_scenario(scenario):
+        file = epw()
+        file.headers = base.headers
+        file.line_terminator = base.line_terminator
+        file.decimals = base.decimals
+        file.dataframe = stochastic_heatwave_data(base.dataframe, start_index, scenario.source_days, scenario.intensity)
 
-        #clip the cloud coverage to [0,10]
-        elif epw_cols[i] == 'Total Sky Cover':
-            fut_heat_data['Total Sky Cover'] = fut_heat_data['Total Sky Cover'].clip(lower=0, upper=10)
+        output_file = os.path.join(output_folder, f'{input_name}_MC_{scenario.scenario:0{digits}d}.epw')
+        file.write(output_file)
+        return output_file
 
-        #clip the sky coverage to [0,10]
-        elif epw_cols[i] == 'Opaque Sky Cover (used if Horizontal IR Intensity missing)':
-            fut_heat_data['Opaque Sky Cover (used if Horizontal IR Intensity missing)'] = fut_heat_data['Opaque Sky Cover (used if Horizontal IR Intensity missing)'].clip(lower=0, upper=10)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        output_files = list(executor.map(write_scenario, scenarios.itertuples()))
 
-        #clip the wind direction to [0,360]
-        elif epw_cols[i] == 'Wind Direction':
-            fut_heat_data['Wind Direction'] = fut_heat_data['Wind Direction'] % 360
+    parameters_file = os.path.join(output_folder, input_name + '_MC.csv')
+    scenarios.assign(file=[os.path.basename(output_file) for output_file in output_files],
+                     source_days=[' '.join(str(day + 1) for day in days) for days in scenarios.source_days]).to_csv(parameters_file, index=False)
 
-    fut_heat_df.dataframe = fut_heat_data
+    return output_files + [parameters_file]
+
+#The first 5 columns stay the same; for the remaining ones we always add the difference of the Heatwave-TMY to the typical future data
+#The heatwave data provided by shinyweatherdata has missing data in the following columns, so we set them to the same values as in the Future TMY
+#Assumes that the historical heatwave data has values available for the remaining weather variables
+miss_data_idx = [5, 10, 11, 16, 17, 18, 19, 24, 25, 26, 27, 28, 29, 31, 32, 34]
+date_idx = [0, 1, 2, 3, 4]
+morph_cols = [col for i, col in enumerate(epw_cols) if i not in date_idx and i not in miss_data_idx]
+
+#Physical ranges of the morphed variables (RH in %, cloud and sky coverage in tenths)
+clip_ranges = {'Relative Humidity': (0, 100),
+               'Total Sky Cover': (0, 10),
+               'Opaque Sky Cover (used if Horizontal IR Intensity missing)': (0, 10)}
+
+
+def create_future_heatwave(tmy_file, heatwave_file, future_file, output_file):
+
+    #Read TMY, heatwave and future data
+    tmy_data = read_epw(tmy_file).dataframe
+    heat_data = read_epw(heatwave_file).dataframe
+    fut_heat_df = read_epw(future_file)
+
+    fut_heat_df.dataframe = future_heatwave_data(fut_heat_df.dataframe, heatwave_delta(tmy_data, heat_data))
     fut_heat_df.write(output_file)
 
 
+#Difference of the Heatwave-TMY for all morphed columns
+def heatwave_delta(tmy_data, heat_data):
+    return heat_data[morph_cols] - tmy_data[morph_cols]
+
+
+#Add the heatwave delta to the first year of the typical future data, with all morphed columns shifted at once
+def future_heatwave_data(fut_data, delta):
+
+    fut_heat_data = fut_data.iloc[:8760, :].copy()
+    fut_heat_data[morph_cols] = fut_heat_data[morph_cols] + delta
+
+    #clip the RH to [0,100] and the cloud and sky coverage to [0,10]
+    for col, (lower, upper) in clip_ranges.items():
+        fut_heat_data[col] = fut_heat_data[col].clip(lower=lower, upper=upper)
+
+    #wrap the wind direction to [0,360)
+    fut_heat_data['Wind Direction'] = fut_heat_data['Wind Direction'] % 360
+
+    return fut_heat_data
+
+
+#Create the future heatwave of every combination of observed heatwave and future typical year (e.g. of a GCM ensemble or several horizons)
+#Every file is parsed once and every heatwave delta computed once; the scenarios are written in parallel
+#Files are paths or uploaded files; returns the paths of the written files
+def create_future_heatwave_ensemble(tmy_file, heatwave_files, future_files, output_folder, workers=4):
+
+    tmy_data = read_epw(tmy_file).dataframe
+    deltas = [(file_stem(heatwave_file), heatwave_delta(tmy_data, read_epw(heatwave_file).dataframe)) for heatwave_file in heatwave_files]
+    futures = [(file_stem(future_file), read_epw(future_file)) for future_file in future_files]
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    def write_scenario(scenario):
+        (heatwave_name, delta), (future_name, future) = scenario
+        file = epw()
+        file.headers = future.headers
+        file.line_terminator = future.line_terminator
+        file.decimals = future.decimals
+        file.dataframe = future_heatwave_data(future.dataframe, delta)
+
+        output_file = os.path.join(output_folder, f'Future_Heatwave_{heatwave_name}_{future_name}.epw')
+        file.write(output_file)
+        return output_file
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(write_scenario, [(delta, future) for delta in deltas for future in futures]))
+
+
+def file_stem(input_file):
+    return os.path.splitext(os.path.basename(getattr(input_file, 'name', input_file)))[0]
+
+
 #Shift all temperature values up by the number of degrees specified
 def include_uhi_effect(epw_file, uhi_degrees, output_file):
 
     #Read EPW data
-    epw_df = epw()
-    epw_df.read(epw_file)
-    epw_df_data = epw_df.dataframe
+    epw_df = read_epw(epw_file)
+    epw_df.dataframe = uhi_effect_data(epw_df.dataframe, uhi_degrees)
+
+    epw_df.write(output_file)
+
+
+def uhi_effect_data(epw_data, uhi_degrees):
+    epw_data = epw_data.copy()
+    epw_data['Dry Bulb Temperature'] += uhi_degrees
+    return epw_data
+
+
+#File name suffixes of the generated scenarios, as used on the Extreme Weather Generation page
+def scenario_suffix(heat_length=None, uhi_degrees=None):
+    suffix = ''
+    if heat_length is not None:
+        suffix += '_' + str(heat_length)
+    if uhi_degrees is not None:
+        suffix += '_UHI_' + str(uhi_degrees)
+    return suffix
+
+
+#Generate prolonged heatwave and UHI scenarios of one weather file (path or uploaded file) in one call
+#Each duration and UHI intensity gives one scenario; with combine, every duration is also combined with every UHI intensity
+#The input is parsed once and the scenarios are written in parallel; returns the paths of the written files
+def generate_scenarios(input_file, output_folder, heat_lengths=(), uhi_intensities=(), combine=False, workers=4):
+
+    base = read_epw(input_file)
+    hottest_month, hottest_day = hottest_day_of(input_file)
+    input_name = file_stem(input_file)
+
+    scenarios = [(heat_length, None) for heat_length in heat_lengths] + [(None, uhi_degrees) for uhi_degrees in uhi_intensities]
+    if combine:
+        scenarios += [(heat_length, uhi_degrees) for heat_length in heat_lengths for uhi_degrees in uhi_intensities]
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    def write_scenario(scenario):
+        heat_length, uhi_degrees = scenario
+        data = base.dataframe
+        if heat_length is not None:
+            data = extend_heatwave_data(data, heat_length, hottest_month, hottest_day)
+        if uhi_degrees is not None:
+            data = uhi_effect_data(data, uhi_degrees)
+
+        file = epw()
+        file.headers = base.headers
+        file.line_terminator = base.line_terminator
+        file.decimals = base.decimals
+        file.dataframe = data
+
+        output_file = os.path.join(output_folder, input_name + scenario_suffix(heat_length, uhi_degrees) + '.epw')
+        file.write(output_file)
+        return output_file
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(write_scenario, scenarios))
 
-    epw_df_data['Dry Bulb Temperature'] += uhi_degrees
 
-    epw_df.write(output_file)
\ No newline at end of file
+#Zip archive of the given files, e.g. for a single download that can be uploaded as an archive for simulation
+def zip_files(file_paths):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for file_path in file_paths:
+            zip_file.write(file_path, os.path.basename(file_path))
+    buffer.seek(0)
+    return buffer
\ No newline at end of file
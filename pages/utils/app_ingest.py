@@ -0,0 +1,151 @@
+##Bulk ingestion of building and weather files from archives and server-side directories
+import os
+import re
+import shutil
+import tarfile
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+input_extensions = {'.idf': 'building', '.epw': 'weather'}
+
+#An IDF file declares its version in a Version object, an EPW file starts with its LOCATION header
+idf_version_pattern = re.compile(rb'^\s*version\s*,', re.IGNORECASE | re.MULTILINE)
+
+#Size of the blocks in which inputs are searched, so large files are never read into memory at once for validation
+validation_chunk_size = 1 << 20
+
+#Directory under which the server directory input source may read files (HEATALYZER_INPUT_ROOT, by default Input)
+server_input_root = os.environ.get('HEATALYZER_INPUT_ROOT', 'Input')
+
+
+def input_kind(file_name):
+    return input_extensions.get(os.path.splitext(file_name)[1].lower())
+
+
+#Sort (file name, source) pairs into building and weather files
+def split_inputs(inputs):
+    buildings = sorted((name, source) for name, source in inputs if input_kind(name) == 'building')
+    weathers = sorted((name, source) for name, source in inputs if input_kind(name) == 'weather')
+    return buildings, weathers
+
+
+#Extract the IDF and EPW files of a zip or tar archive (path or file-like object) into target_folder
+#Members are streamed to disk one by one and stored under their base name, so no member can escape target_folder
+def extract_archive(archive, target_folder):
+
+    os.makedirs(target_folder, exist_ok=True)
+    extracted = []
+
+    def extract(name, open_member):
+        file_name = os.path.basename(name)
+        if not input_kind(file_name) or file_name.startswith('.'):
+            return
+        target_path = os.path.join(target_folder, file_name)
+        with open_member() as member, open(target_path, 'wb') as f:
+            shutil.copyfileobj(member, f, 1 << 20)
+        extracted.append((file_name, target_path))
+
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if not info.is_dir():
+                    extract(info.filename, lambda: zip_file.open(info))
+    else:
+        if isinstance(archive, (str, os.PathLike)):
+            tar_file = tarfile.open(archive, mode='r:*')
+        else:
+            archive.seek(0)
+            tar_file = tarfile.open(fileobj=archive, mode='r:*')
+        with tar_file:
+            for member in tar_file:
+                if member.isfile():
+                    extract(member.name, lambda: tar_file.extractfile(member))
+
+    return split_inputs(extracted)
+
+
+#IDF and EPW files in a directory and its subdirectories, used in place without copying
+def scan_directory(directory):
+    inputs = [(file_name, os.path.join(root, file_name))
+              for root, _, file_names in os.walk(directory) for file_name in file_names
+              if input_kind(file_name) and not file_name.startswith('.')]
+    return split_inputs(inputs)
+
+
+#IDF and EPW files of a directory on the server under root; files linked from outside root are left out
+def scan_server_directory(directory, root=server_input_root):
+    root = os.path.realpath(root)
+    directory = os.path.realpath(os.path.join(root, directory))
+    if os.path.commonpath([root, directory]) != root:
+        raise ValueError(f'{directory} is not inside the input directory {root}')
+    if not os.path.isdir(directory):
+        raise ValueError(f'{directory} is not a directory on the server')
+
+    within_root = lambda item: os.path.commonpath([root, os.path.realpath(item[1])]) == root
+    return tuple([item for item in inputs if within_root(item)] for inputs in scan_directory(directory))
+
+
+#Read the content of a path or file-like object (e.g. a Streamlit upload)
+def read_input(source):
+    with open_input(source) as f:
+        return f.read()
+
+
+#Binary file object of a path or file-like object, positioned at its start
+def open_input(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    source.seek(0)
+    return nullcontext(source)
+
+
+#Whether the pattern (anchored at line starts) occurs in an input, read block by block
+#Every block is searched together with the unfinished line of the block before
+def search_input(source, pattern):
+    with open_input(source) as f:
+        rest = b''
+        while block := f.read(validation_chunk_size):
+            text = rest + block
+            if pattern.search(text):
+                return True
+            line_start = text.rfind(b'\n') + 1
+            #A line longer than a block is replaced by a placeholder byte, so the next block is not searched as a line start
+            rest = text[line_start:] if line_start or len(text) <= validation_chunk_size else b'-'
+    return False
+
+
+#Check the content of one input file; returns an error message or None
+def validate_input(name, source):
+    kind = input_kind(name)
+    try:
+        if kind == 'building' and not search_input(source, idf_version_pattern):
+            return f'{name}: not an IDF file (no Version object)'
+        if kind == 'weather':
+            with open_input(source) as f:
+                start = f.read(64)
+            if not start.lstrip(b'\xef\xbb\xbf').upper().startswith(b'LOCATION'):
+                return f'{name}: not an EPW file (no LOCATION header)'
+    except OSError as e:
+        return f'{name}: cannot be read ({e})'
+
+    if kind is None:
+        return f'{name}: unsupported file type'
+    return None
+
+
+#Validate all inputs in parallel; returns the error messages (empty if all inputs are valid)
+def validate_inputs(buildings, weathers, workers=8):
+
+    errors = []
+    for kind, inputs in (('building', buildings), ('weather', weathers)):
+        names = [os.path.splitext(name)[0] for name, _ in inputs]
+        duplicates = sorted(name for name, count in Counter(names).items() if count > 1)
+        if duplicates:
+            errors.append(f'Duplicate {kind} file names: {", ".join(duplicates)}')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        errors += [error for error in executor.map(lambda item: validate_input(*item), buildings + weathers) if error]
+
+    return errors
@@ -0,0 +1,169 @@
+##Simulate-and-analyse pipeline shared by the File Upload page and the command line
+import os
+import shutil
+import time
+from datetime import datetime
+from .app_preprocessing import preprocess, fidelity_presets
+from .app_BEM import BEM_simulation
+from .app_postprocessing import postprocess, summer_month_range
+from .app_catalog import input_hashes, record_run
+from .app_screening import screen_weathers, default_screening_metric
+from .app_compaction import compact_simulation_folders
+from .app_workspace import new_run_id, run_workspace, workspace_lock, write_manifest, discard_manifest
+
+#Settings used when not given (the defaults of the File Upload page)
+default_settings = {'baseline': None,
+                    'start_month': 1,
+                    'summer_months': summer_month_range(6, 8),
+                    'metrics_thresholds': {'Humidex': 35, 'SET': 30, 'Temperature': 30, 'PMV': 1.5, 'WBGT': 23},
+                    'rerun_all': False,
+                    'screening': None,
+                    'fidelity': 'full',
+                    'compact': True}
+
+#Screening used when screening is enabled without details (see app_screening.screen_weathers)
+default_screening = {'metric': default_screening_metric, 'min_severity': None, 'dedupe': True}
+
+
+#Complete the given settings with the defaults; the baseline defaults to the first weather scenario
+def resolve_settings(settings, weather_folders):
+
+    resolved = dict(default_settings)
+    resolved.update({key: value for key, value in settings.items() if value is not None})
+    resolved['metrics_thresholds'] = {**default_settings['metrics_thresholds'], **settings.get('metrics_thresholds', {})}
+
+    if resolved['screening'] is not None:
+        resolved['screening'] = {**default_screening, **resolved['screening']}
+
+    if resolved['baseline'] is None:
+        resolved['baseline'] = weather_folders[0]
+    resolved['baseline'] = os.path.splitext(os.path.basename(resolved['baseline']))[0]
+
+    if resolved['baseline'] not in weather_folders:
+        raise ValueError(f"Baseline weather file {resolved['baseline']} is not among the weather files {weather_folders}")
+    if resolved['start_month'] not in (1, 6):
+        raise ValueError('The start month must be 1 (January) or 6 (June)')
+    if resolved['fidelity'] not in fidelity_presets:
+        raise ValueError(f"Unknown fidelity {resolved['fidelity']}, choose one of {list(fidelity_presets)}")
+
+    return resolved
+
+
+#Write an input file from a path or a file-like object (e.g. a Streamlit upload)
+def copy_input_file(source, target_path):
+    if isinstance(source, (str, os.PathLike)):
+        shutil.copyfile(source, target_path)
+    else:
+        source.seek(0)
+        with open(target_path, 'wb') as f:
+            shutil.copyfileobj(source, f)
+
+
+#Create one output folder for each building and weather combination and copy over the building and weather data
+#buildings and weathers are lists of (file name, path or file-like object)
+def create_simulation_folders(buildings, weathers, output_folder='Output'):
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    simulation_folders = []
+    building_folders = []
+    building_names = []
+    weather_folders = [os.path.splitext(name)[0] for name, _ in weathers]
+
+    for building_file_name, building_source in buildings:
+        building_name = os.path.splitext(building_file_name)[0]
+        building_names.append(building_name)
+        building_folder = os.path.join(output_folder, building_name)
+        building_folders.append(building_folder)
+
+        for weather_folder, (_, weather_source) in zip(weather_folders, weathers):
+            final_dir = os.path.join(building_folder, weather_folder)
+            simulation_folders.append(final_dir)
+            os.makedirs(final_dir, exist_ok=True)
+
+            copy_input_file(building_source, os.path.join(final_dir, 'in.idf'))
+            copy_input_file(weather_source, os.path.join(final_dir, 'weather.epw'))
+
+    return {'simulation_folders': simulation_folders, 'building_folders': building_folders,
+            'building_names': building_names, 'weather_folders': weather_folders}
+
+
+#Preprocess, simulate and postprocess all building and weather combinations in the workspace of a run
+#A new run id is created if none is given; reusing a run id reuses its simulations unless rerun_all is set
+#Returns the manifest of the run: folders, inhabited zones, settings used, weather screening table, EnergyPlus exit codes
+#and the duration of every stage
+#Completed runs are recorded in the run catalog of the output folder
+def run_pipeline(buildings, weathers, settings=None, output_folder='Output', workers=1, progress=None, run_id=None):
+
+    run_id = run_id or new_run_id()
+    workspace = run_workspace(output_folder, run_id)
+    os.makedirs(workspace, exist_ok=True)
+
+    with workspace_lock(workspace):
+        manifest = _run_in_workspace(buildings, weathers, settings, workspace, run_id, workers, progress)
+
+    record_run(manifest, output_folder)
+    return manifest
+
+
+def _run_in_workspace(buildings, weathers, settings, workspace, run_id, workers, progress):
+
+    timings = {}
+    settings = resolve_settings(settings or {}, [os.path.splitext(name)[0] for name, _ in weathers])
+
+    discard_manifest(workspace)
+
+    #Screen the weather scenarios by their outdoor heat and drop mild and duplicate ones before simulating
+    screening = None
+    if settings['screening'] is not None:
+        start = time.perf_counter()
+        weathers, screening = screen_weathers(weathers, settings['metrics_thresholds']['Temperature'],
+                                              baseline=settings['baseline'], **settings['screening'])
+        screening = screening.to_dict(orient='records')
+        if progress:
+            progress('screening', 1.0, f'Simulating {len(weathers)} of {len(screening)} weather scenarios')
+        timings['screening'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    folders = create_simulation_folders(buildings, weathers, workspace)
+    inputs = input_hashes(folders)
+    timings['staging'] = time.perf_counter() - start
+
+    #Preprocess building input files to configure variables for thermal comfort computations
+    start = time.perf_counter()
+    preprocess(folders['simulation_folders'], settings['start_month'], progress, settings['fidelity'])
+    timings['preprocess'] = time.perf_counter() - start
+
+    #Run EnergyPlus simulations for the input building and weather file combinations
+    start = time.perf_counter()
+    #Simulations of a previous run are reused only if they were run with the same fidelity
+    return_codes = BEM_simulation(folders['simulation_folders'], settings['rerun_all'], workers, progress, settings['fidelity'])
+    timings['simulation'] = time.perf_counter() - start
+
+    failed = [path for path, code in return_codes.items() if code not in (None, 0)]
+    if failed:
+        raise RuntimeError(f'EnergyPlus failed for {failed}')
+
+    #Postprocess the output to extract data for the result visualizations
+    start = time.perf_counter()
+    data_path = os.path.join(workspace, 'data')
+    zones = postprocess(folders['simulation_folders'], folders['building_folders'], folders['weather_folders'],
+                        settings['baseline'], settings['summer_months'], settings['metrics_thresholds'],
+                        data_path, progress)
+    timings['postprocess'] = time.perf_counter() - start
+
+    #Delete or compress the EnergyPlus artifacts that reruns and postprocessing do not read
+    compaction = None
+    if settings['compact']:
+        start = time.perf_counter()
+        compaction = {'compacted': datetime.now().isoformat(timespec='seconds'),
+                      **compact_simulation_folders(folders['simulation_folders'])}
+        timings['compaction'] = time.perf_counter() - start
+
+    manifest = {'run_id': run_id, 'created': datetime.now().isoformat(timespec='seconds'), 'workspace': workspace,
+                **folders, 'inputs': inputs, 'zones': zones, 'settings': settings, 'screening': screening, 'data_path': data_path,
+                'compaction': compaction,
+                'return_codes': return_codes, 'timings': timings}
+    write_manifest(workspace, manifest)
+
+    return manifest
@@ -3,12 +3,15 @@ import os
 from eppy.modeleditor import IDF
 import os.path
 import pandas as pd
-from .epw import epw
+from .app_epw_cache import derived_value
+from .app_preprocessing import inhabited_zones
+from .app_results import BuildingResults
+from .app_stores import close_stores
+from .app_survivability import load_grids
 from datetime import datetime, timedelta
 from numpy import trapz
 import numpy as np
 from thermofeel import calculate_wbt, calculate_bgt
-import streamlit as st
 import shutil
 from pythermalcomfort import humidex
 
@@ -21,6 +24,20 @@ tc_models = ['Temperature', 'Humidex', 'SET', 'PMV', 'WBGT']
 #Metrics to report for Dh/Eh analysis
 metrics_dh_eh = ['Humidex', 'SET', 'Temperature']
 
+#Statistics of the Dh/Eh analysis, in the order returned by calculate_dh_eh
+dh_eh_statistics = ['Annual Degree hours', 'Annual Exceedance hours', 'Maximum Week Degree hours', 'Maximum Week Exceedance hours']
+
+#Age groups and activity levels of the Activity hours, in the order of the activity vectors
+age_groups = ['Young (18-40 years)', 'Elderly (over 65 years)']
+activity_levels = ['Moderate to vigorous physical activities', 'Light physical activities', 'No activity possible', 'Not survivable']
+
+#Columns of the tidy portfolio summary table; the Age group is that of the Activity hours and empty for the other metrics
+summary_columns = ['Building', 'Zone', 'Weather', 'Metric', 'Age group', 'Statistic', 'Value']
+
+#Quantiles and number of density points of the summer distribution summaries
+summary_quantiles = [0, 5, 25, 50, 75, 95, 100]
+summary_points = 100
+
 #Variables to read for thermal comfort models
 variables = {'Temperature': 'Zone Mean Air Temperature',
              'Relative Humidity':'Zone Air Relative Humidity',
@@ -28,12 +45,15 @@ variables = {'Temperature': 'Zone Mean Air Temperature',
              'PMV': 'Zone Thermal Comfort Fanger Model PMV',
              'MRT': 'Zone Thermal Comfort Mean Radiant Temperature'}
 
-def postprocess(output_folders, building_folders, weather_folders):
+#Processes the EnergyPlus outputs of all simulations and writes the data files for the Results page to data_path
+#progress(stage, fraction, text) is called to report progress; returns the inhabited zones of every building
+def postprocess(output_folders, building_folders, weather_folders, baseline_file, summer_months, metrics_thresholds,
+                data_path='Output/data', progress=None):
 
     IDF.setiddname(iddfile)
 
-    #Folder to save EnergyPlus simulation result data in
-    data_path = 'Output/data'
+    #Release the read handles of the Results page before the data files are replaced
+    close_stores(data_path)
 
     if os.path.exists(data_path):
         #Remove all files and folders in the directory (from potential previous runs)
@@ -52,96 +72,50 @@ def postprocess(output_folders, building_folders, weather_folders):
 
     #Output paths for all data files
     annual_file_path = data_path + '/annual_data.h5'
-    summer_file_path = data_path + '/summer_data.h5'
     hottest_file_path = data_path + '/hottest_weeks_data.h5'
-    summer_diff_file_path = data_path + '/summer_differences_data.h5'
-    dh_eh_file_path = data_path + '/dh_eh_data.h5'
-    max_hum_file_path = data_path + '/max_hum_data.h5'
-    ah_file_path = data_path + '/ah_data.h5'
+    distribution_file_path = data_path + '/distribution_data.h5'
+    summary_file_path = data_path + '/summary.parquet'
 
     #Total number of simulations to process
     total_simulations = len(output_folders)
     completed_simulations = 0
 
-    #Initialize Streamlit progress bar
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
     #Keep track of zones to report for different buildings
-    st.session_state.zones = {}
+    building_zones = {}
+
+    #Dh/Eh, Activity hours and peak Humidex of all buildings, zones and weather scenarios, written as one tidy table
+    summary_rows = []
 
     for building_folder in building_folders:
 
         #Read in building file
-        _, building_name = building_folder.split('/')
+        building_name = os.path.basename(building_folder)
         building_path = building_folder + '/' + weather_folders[0] + '/in.idf'
         idf = IDF(building_path)
 
-        zones = idf.idfobjects['ZONE']
-        zone_names = [zone.Name.upper() for zone in zones]
-
         #Determine Zones that People live in (only those are relevant and have all thermal comfort values)
-        zones_inh = []
-
-        for zone in zone_names:
-            people_objects = [obj for obj in idf.idfobjects['PEOPLE'] if obj.Zone_or_ZoneList_or_Space_or_SpaceList_Name.upper() == zone]
-
-            #Skip this zone if no people live in it
-            if people_objects == []:
-                continue
+        zones_inh = inhabited_zones(idf)
 
-            #Otherwise, append it to the list of zones to report
-            zones_inh.append(zone)
-
-        st.session_state.zones[building_name] = zones_inh
-
-        #Initialize the dictionaries
-        annual_data_dicts = {}
-        summer_data_dicts = {}
-        hottest_data_dicts = {}
-        summer_differences_dicts = {}
-        dh_eh_dicts = {}
-        max_hum_dicts = {}
-        ah_dicts = {}
-
-        for metric in metrics:
-            annual_data_dicts[metric] = {}
-            summer_data_dicts[metric] = {}
-            hottest_data_dicts[metric] = {}
-            summer_differences_dicts[metric] = {}
-            for zone in zones_inh:
-                annual_data_dicts[metric][zone] = {}
-                summer_data_dicts[metric][zone] = {}
-                hottest_data_dicts[metric][zone] = {}
-                summer_differences_dicts[metric][zone] = {}
-                max_hum_dicts[zone] = {}
-
-        age_groups = ['Young (18-40 years)', 'Elderly (over 65 years)']
-        for age in age_groups:
-            ah_dicts[age] = {}
-            for zone in zones_inh:
-                ah_dicts[age][zone] = {}
-
-        for metric in metrics_dh_eh:
-            dh_eh_dicts[metric] = {}
-            for zone in zones_inh:
-                dh_eh_dicts[metric][zone] = {}
+        building_zones[building_name] = zones_inh
 
         #Read in output data for baseline building
-        baseline_output_csv_path = building_folder + '/' + st.session_state.baseline_file + '/eplusout.csv'
+        baseline_output_csv_path = building_folder + '/' + baseline_file + '/eplusout.csv'
         baseline_output = pd.read_csv(baseline_output_csv_path)
         baseline_time_step = baseline_output.loc[:, 'Date/Time'].values
 
-        #Determine summer filter based on baseline file
-        summer_filter = filter_summer_months(transform_date(baseline_time_step))
-        baseline_file = st.session_state.baseline_file
+        #Determine the month of every hour based on baseline file (summer subsets are selected from it on read)
+        time_step_months = months_of_time_steps(transform_date(baseline_time_step))
+
+        #Preallocate the hourly results of all metrics, zones and weather scenarios of this building
+        results = BuildingResults(metrics, zones_inh, weather_folders, len(baseline_time_step))
 
         #Process all weather sceanarios for current building
         for weather_folder in weather_folders:
 
             # Update the progress bar
-            progress_bar.progress(completed_simulations / total_simulations)
-            status_text.text(f'Processing simulation {completed_simulations + 1} of {total_simulations}...')
+            if progress:
+                progress('postprocess', completed_simulations / total_simulations,
+                         f'Processing simulation {completed_simulations + 1} of {total_simulations}...')
 
             simulation_folder = building_folder + '/' + weather_folder
             weather_path = simulation_folder + '/weather.epw'
@@ -152,38 +126,37 @@ def postprocess(output_folders, building_folders, weather_folders):
             time_step = transform_date(time_step)
 
             #Look for hottest week in the year and extract time steps for the hottest week
-            file = epw()
-            file.read(weather_path)
             months = ['January', 'February', 'March', 'April', 'May', 'June',
                       'July', 'August', 'September', 'October', 'November', 'December']
 
-            start_month, start_day = find_most_extreme_week(file)
+            start_month, start_day = hottest_week_start(weather_path)
             start_month = months[start_month-1]
             start_day = f"{start_day:02d}"
             formatted_date = f"{start_month} {start_day} 01:00"
-            hottest_week_start = time_step.index(formatted_date)
-            hottest_start = hottest_week_start - 7*24
-            hottest_end = hottest_week_start + 2*7*24
+            week_start_index = time_step.index(formatted_date)
+            hottest_start = week_start_index - 7*24
+            hottest_end = week_start_index + 2*7*24
+            results.set_hottest_range(weather_folder, hottest_start, hottest_end)
 
             for zone in zones_inh:
 
                 for model in tc_models:
                     if model == 'Humidex':
-                        temp_data = annual_data_dicts['Temperature'][zone][weather_folder]
+                        temp_data = results.get('Temperature', zone, weather_folder)
 
                         #Extract relative humidity data form output
                         hum_column = zone + ':' + variables['Relative Humidity']
                         hum_idx = output.columns.str.startswith(hum_column)
                         hum_data = output.loc[:, hum_idx].values.flatten()
-                        annual_data_dicts['Relative Humidity'][zone][weather_folder] = hum_data
-
-                        #Extract relative humidity data for the hottest mean week and add to dictionary
-                        hottest_hum_data = hum_data[hottest_start:hottest_end]
-                        hottest_data_dicts['Relative Humidity'][zone][weather_folder] = hottest_hum_data
+                        results.set('Relative Humidity', zone, weather_folder, hum_data)
 
                         #Compute humidex from the temperature and humidity
                         data, max_hum_cond = humidex_list(temp_data, hum_data, True)
-                        max_hum_dicts[zone][weather_folder] = max_hum_cond  # max_hum_cond = (max_humidex, max_hum_temp, max_hum_rh)
+                        (max_humidex, max_hum_temp, max_hum_rh) = max_hum_cond
+                        scenario = (building_name, zone, weather_folder, 'Humidex', '')
+                        summary_rows.append(scenario + ('Peak', max_humidex))
+                        summary_rows.append(scenario + ('Peak temperature', max_hum_temp))
+                        summary_rows.append(scenario + ('Peak relative humidity', max_hum_rh))
 
                     elif model == 'WBGT':
                         #Extract MRT data form output
@@ -192,8 +165,8 @@ def postprocess(output_folders, building_folders, weather_folders):
                         mrt_data = output.loc[:, mrt_idx].values.flatten()
 
                         #Calculate indoor WBGT from these values
-                        hum_data = annual_data_dicts['Relative Humidity'][zone][weather_folder]
-                        temp_data = annual_data_dicts['Temperature'][zone][weather_folder]
+                        hum_data = results.get('Relative Humidity', zone, weather_folder)
+                        temp_data = results.get('Temperature', zone, weather_folder)
                         data = calculate_wbgt_lis(temp_data, hum_data, mrt_data)
 
                     else: #mode == Temperature, SET, and PMV
@@ -203,69 +176,47 @@ def postprocess(output_folders, building_folders, weather_folders):
                         idx = output.columns.str.contains(column)
                         data = output.loc[:, idx].values.flatten()
 
-                    #Add annual data to dictionary
-                    annual_data_dicts[model][zone][weather_folder] = data
-
-                    #Extract data for the hottest mean week and add to dictionary
-                    hottest_data = data[hottest_start:hottest_end]
-                    hottest_data_dicts[model][zone][weather_folder] = hottest_data
+                    #Add annual data to the results array (the hottest weeks are a view on it)
+                    results.set(model, zone, weather_folder, data)
 
                     if model in metrics_dh_eh:
                         # Calculate Temperature Degree and Exceedance hours
-                        data = annual_data_dicts[model][zone][weather_folder]
-                        auc_input = [max(0, element - st.session_state.metrics_thresholds[model]) for element in data]
-                        auc_val = trapz(auc_input)
-                        days_over = sum(elem > 0 for elem in auc_input)
-                        auc_max, max_days_over = find_week_with_max_total(auc_input)
-                        dh_eh_dicts[model][zone][weather_folder] = (round(auc_val, 2), days_over, round(auc_max, 2), max_days_over)
+                        data = results.get(model, zone, weather_folder)
+                        threshold = metrics_thresholds[model]
+                        scenario = (building_name, zone, weather_folder, model, '')
+                        summary_rows.append(scenario + ('Threshold', threshold))
+                        for statistic, value in zip(dh_eh_statistics, calculate_dh_eh(data, threshold)):
+                            summary_rows.append(scenario + (statistic, value))
 
                 #Compute Activity hours
-                hottest_temp_week = hottest_data_dicts['Temperature'][zone][weather_folder][7 * 24:2 * 7 * 24]
-                hottest_hum_week = hottest_data_dicts['Relative Humidity'][zone][weather_folder][7 * 24:2 * 7 * 24]
+                hottest_temp_week = results.hottest('Temperature', zone, weather_folder)[7 * 24:2 * 7 * 24]
+                hottest_hum_week = results.hottest('Relative Humidity', zone, weather_folder)[7 * 24:2 * 7 * 24]
                 day_hours_temp = extract_day_hours(hottest_temp_week)
                 day_hours_hum = extract_day_hours(hottest_hum_week)
                 (activities_vector_y, activities_vector_el) = identify_activity_hours(day_hours_temp,day_hours_hum)
-                ah_dicts['Young (18-40 years)'][zone][weather_folder] = activities_vector_y
-                ah_dicts['Elderly (over 65 years)'][zone][weather_folder] = activities_vector_el
+                for age, activities_vector in zip(age_groups, [activities_vector_y, activities_vector_el]):
+                    for activity_level, hours in zip(activity_levels, activities_vector):
+                        summary_rows.append((building_name, zone, weather_folder, 'Activity hours', age, activity_level, hours))
 
             completed_simulations += 1
 
-        #Calculate differences
-        for weather_folder in weather_folders:
-
-            # Skip baseline folder
-            if weather_folder == st.session_state.baseline_file:
-                for metric in metrics:
-                    for zone in zones_inh:
-                        baseline_metric_data = annual_data_dicts[metric][zone][baseline_file]
-                        summer_data_dicts[metric][zone][weather_folder] = np.array(baseline_metric_data)[summer_filter]
-
-                continue
-
-            #Calculate differences for each metric and zone
-            for metric in metrics:
-                for zone in zones_inh:
-                    baseline_metric_data = annual_data_dicts[metric][zone][baseline_file]
-                    current_metric_data = annual_data_dicts[metric][zone][weather_folder]
-
-                    summer_data_dicts[metric][zone][weather_folder] = np.array(current_metric_data)[summer_filter]
+        #Only the annual series are stored; summer subsets and differences to the baseline are derived on read
+        save_results_to_hdf(results, annual_file_path, building_name, results.get)
+        pd.DataFrame(time_step_months).to_hdf(annual_file_path, key=f'{building_name}/months', mode='a')
+        save_hottest_block_to_hdf(results, hottest_file_path, building_name)
 
-                    # Calculate differences only for summer months
-                    summer_diff = np.array(current_metric_data)[summer_filter] - np.array(baseline_metric_data)[summer_filter]
-                    summer_differences_dicts[metric][zone][weather_folder] = summer_diff
-
-        save_data_to_hdf(annual_data_dicts, annual_file_path, building_name)
-        save_data_to_hdf(summer_data_dicts, summer_file_path, building_name)
-        save_data_to_hdf(hottest_data_dicts, hottest_file_path, building_name)
-        save_data_to_hdf(summer_differences_dicts, summer_diff_file_path, building_name)
-        save_data_to_hdf(dh_eh_dicts, dh_eh_file_path, building_name, is_dh_eh=True)
-        save_data_to_hdf(max_hum_dicts, max_hum_file_path, building_name, is_max_hum=True)
-        save_data_to_hdf(ah_dicts, ah_file_path, building_name)
+        #Summaries of the summer differences to the baseline for the distribution shift plots
+        summer_filter = np.isin(time_step_months, summer_months)
+        save_distributions_to_hdf(results, distribution_file_path, building_name, baseline_file,
+                                  summer_filter, summer_months)
 
+    save_summary(summary_rows, summary_file_path)
 
     # Complete the progress bar
-    progress_bar.progress(1.0)
-    status_text.text(f'Processing complete. {total_simulations} simulations run.')
+    if progress:
+        progress('postprocess', 1.0, f'Processing complete. {total_simulations} simulations run.')
+
+    return building_zones
 
 
 
@@ -303,136 +254,181 @@ def transform_date(input_dates):
 
     return formatted_dates
 
-def save_data_to_hdf(data_dicts, file_path, building_name, is_dh_eh=False, is_max_hum=False):
-    for metric, data_dict in data_dicts.items():
-        for zone, data_dict2 in (data_dict.items() if not is_max_hum else [(metric, data_dict)]):
-            for weather, data in data_dict2.items():
-                hdf_key = f'{building_name}/{zone}/{weather}/{"Humidex" if is_max_hum else metric}'
-                if is_dh_eh or is_max_hum:
-                    df = pd.DataFrame([data]) # Handle special case for dh/eh and max_hum
-                else:
-                    df = pd.DataFrame(data)
+#Write the tidy portfolio summary (building, zone, weather, metric, statistic -> value) as one columnar file
+#The key columns are categorical and sorted, so the comparison pages can filter it in memory
+def save_summary(summary_rows, file_path):
+    df = pd.DataFrame(summary_rows, columns=summary_columns)
+    df['Value'] = df['Value'].astype(np.float64)
+    df = df.sort_values(summary_columns[:-1], kind='stable').reset_index(drop=True)
+    for column in summary_columns[:-1]:
+        df[column] = df[column].astype('category')
+    df.to_parquet(file_path, index=False)
+
+#Read the tidy portfolio summary; summaries written before the Age group column had the age group as the metric of the Activity hours
+def read_summary_table(file_path):
+    df = pd.read_parquet(file_path)
+    if 'Age group' not in df.columns:
+        metric = df['Metric'].astype(str)
+        activity_hours = metric.isin(age_groups)
+        df.insert(summary_columns.index('Age group'), 'Age group', pd.Categorical(np.where(activity_hours, metric, '')))
+        df['Metric'] = pd.Categorical(np.where(activity_hours, 'Activity hours', metric))
+        df = df.sort_values(summary_columns[:-1], kind='stable').reset_index(drop=True)
+    return df
+
+#Write the hourly series of a BuildingResults container, where get_series(metric, zone, weather) selects the stored view
+def save_results_to_hdf(results, file_path, building_name, get_series, skip_weather=None):
+    for metric in results.metrics:
+        for zone in results.zones:
+            for weather in results.weathers:
+                if weather == skip_weather:
+                    continue
+                hdf_key = f'{building_name}/{zone}/{weather}/{metric}'
+                df = pd.DataFrame(get_series(metric, zone, weather))
                 df.to_hdf(file_path, key=hdf_key, mode='a')
 
-def filter_summer_months(time_step):
-    summer_months = st.session_state.summer_months
-    month_filter = [datetime.strptime(x, "%B %d %H:%M").month in summer_months for x in time_step]
-    return month_filter
+#Write the hottest weeks of all zones, weather scenarios and metrics of a building as one block to load it in one read
+#Columns are indexed by (zone, weather, metric)
+def save_hottest_block_to_hdf(results, file_path, building_name):
+    columns = {}
+    for zone in results.zones:
+        for weather in results.weathers:
+            for metric in results.metrics:
+                columns[(zone, weather, metric)] = pd.Series(results.hottest(metric, zone, weather))
+    df = pd.DataFrame(columns)
+    df.to_hdf(file_path, key=building_name, mode='a')
+
+#Write the distribution summaries of the summer differences to the baseline of a building as one table
+def save_distributions_to_hdf(results, file_path, building_name, baseline, summer_filter, summer_months):
+    rows = []
+    for zone in results.zones:
+        for weather in results.weathers:
+            if weather == baseline:
+                continue
+            for metric in tc_models:
+                summary = distribution_summary(results.summer_difference(metric, zone, weather, baseline, summer_filter))
+                rows.append({'Zone': zone, 'Weather': weather, 'Metric': metric, 'Baseline': baseline,
+                             'Summer': summer_key(summer_months), **summary})
 
+    if rows:
+        pd.DataFrame(rows).to_hdf(file_path, key=building_name, mode='a')
 
-def identify_activity_hours(temperatures, humidities):
+#Summarize a distribution by its mean, quantiles and a Gaussian kernel density estimate on a fixed grid
+#The bandwidth follows Silverman's rule and the grid spans two bandwidths beyond the extreme values, as in Plotly violins
+def distribution_summary(values):
 
-    #Read in the file for survivability limit
-    # Extract survivability line
-    surv_file = 'pages/survivability_data/rh_version_NewSurvivability_limits_Night-Indoors_3H-Young_adult.csv'
-    surv_file_el = 'pages/survivability_data/rh_version_NewSurvivability_limits_Night-Indoors_3H-65_over.csv'
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
 
-    surv_line = pd.read_csv(surv_file)
-    surv_line_el = pd.read_csv(surv_file_el)
+    summary = {'mean': np.nan, 'grid_start': np.nan, 'grid_end': np.nan}
+    summary.update({f'q{q}': np.nan for q in summary_quantiles})
+    summary.update({f'd{i}': np.nan for i in range(summary_points)})
 
-    #Read in the file for liveability limit
-    liveab_limit = 'pages/survivability_data/rh_version_Liveability_limits_Night-Indoors_3H-Young_adult.csv'
-    liveab_limit_el = 'pages/survivability_data/rh_version_Liveability_limits_Night-Indoors_3H-65_over.csv'
+    if len(values) == 0:
+        return summary
 
-    liv_line = pd.read_csv(liveab_limit)
-    liv_line_el = pd.read_csv(liveab_limit_el)
+    quantiles = np.percentile(values, summary_quantiles)
+    iqr = quantiles[summary_quantiles.index(75)] - quantiles[summary_quantiles.index(25)]
+    std = values.std()
+    spread = min(std, iqr / 1.349) if iqr > 0 else std
+    bandwidth = 1.059 * spread * len(values) ** (-1 / 5)
 
-    #Read in the file for elderly and young representing the zone where occupants can perform at most light physical activities
-    light_activ_file = 'pages/survivability_data/rh_version_Liveability_light_physical_activity_Night-Indoors_3H-Young_adult.csv'
-    light_activ_el_file = 'pages/survivability_data/rh_version_Liveability_light_physical_activity_Night-Indoors_3H-65_over.csv'
+    #Constant distributions (e.g. no change to the baseline) get a narrow spike
+    if bandwidth <= 0:
+        bandwidth = 1e-3
 
-    light_activities = pd.read_csv(light_activ_file)
-    light_activities_el = pd.read_csv(light_activ_el_file)
+    grid = np.linspace(quantiles[0] - 2 * bandwidth, quantiles[-1] + 2 * bandwidth, summary_points)
+    density = np.exp(-0.5 * ((grid[:, None] - values[None, :]) / bandwidth) ** 2).sum(axis=1)
+    density /= len(values) * bandwidth * np.sqrt(2 * np.pi)
 
-    #Arrays to collect how many times we were in the non-survivable, non-liveable (but survivable), at most light physical activities (but liveable), and moderate or vigorous activities zones
-    #[moderate or vigorous activities, at most light, non-liveable, non-survivable]
+    summary['mean'] = values.mean()
+    summary['grid_start'] = grid[0]
+    summary['grid_end'] = grid[-1]
+    summary.update({f'q{q}': value for q, value in zip(summary_quantiles, quantiles)})
+    summary.update({f'd{i}': value for i, value in enumerate(density)})
 
-    vec_y = [0,0,0,0]
-    vec_el = [0,0,0,0]
+    return summary
 
-    #Round to the nearest 0.5 humidity
-    humidities = np.array(humidities)
-    humidities_round = np.clip(np.round(humidities*2)/2, 0.5, 100)
+#Identifier of a set of summer months, used to match stored summaries
+def summer_key(summer_months):
+    return ','.join(str(month) for month in summer_months)
 
-    hum_y = light_activities['rh']
+def months_of_time_steps(time_step):
+    return [datetime.strptime(x, "%B %d %H:%M").month for x in time_step]
 
-    surv_y = surv_line['Tair']
-    surv_el = surv_line_el['Tair']
+#List the month numbers from start_month to end_month, wrapping around the end of the year
+def summer_month_range(start_month, end_month):
+    if end_month < start_month:
+        return list(range(start_month, 13)) + list(range(1, end_month + 1))
+    return list(range(start_month, end_month + 1))
 
-    liv_y = liv_line['Tair']
-    liv_el = liv_line_el['Tair']
 
-    print(liv_y)
+def identify_activity_hours(temperatures, humidities):
 
-    light_y = light_activities['Tair']
-    light_el = light_activities_el['Tair']
+    #Survivability limit, liveability limit and the limit of at most light physical activities for young and elderly
+    grids = load_grids()
 
-    for i, humidity in enumerate(humidities_round):
+    #Arrays to collect how many times we were in the non-survivable, non-liveable (but survivable), at most light physical activities (but liveable), and moderate or vigorous activities zones
+    #[moderate or vigorous activities, at most light, non-liveable, non-survivable]
 
-        temperature = temperatures[i]
+    #Round to the nearest 0.5 humidity and look up the row of the limit curves
+    humidities = np.array(humidities)
+    humidities_round = np.clip(np.round(humidities*2)/2, 0.5, 100)
+    idx = np.searchsorted(grids['light_young_rh'], humidities_round)
 
-        matches_y = (hum_y == humidity)
+    temperatures = np.array(temperatures)
 
-        idx = matches_y[matches_y].index[0]
+    vectors = []
+    for age in ['young', 'elderly']:
+        not_survivable = temperatures >= grids[f'surv_{age}_Tair'][idx]
+        not_liveable = temperatures >= grids[f'liv_{age}_Tair'][idx]
+        light = temperatures >= grids[f'light_{age}_Tair'][idx]
 
+        #Each hour is counted in the most severe range it falls into
+        level = np.select([not_survivable, not_liveable, light], [3, 2, 1], default=0)
+        vectors.append(np.bincount(level, minlength=4).tolist())
 
-        if temperature >= surv_y[idx]:
-            vec_y[3] += 1
-        elif temperature >= liv_y[idx]:
-            vec_y[2] += 1
-        elif temperature >= light_y[idx]:
-            vec_y[1] += 1
-        else:
-            vec_y[0] += 1
-
-        if temperature >= surv_el[idx]:
-            vec_el[3] += 1
-        elif temperature >= liv_el[idx]:
-            vec_el[2] += 1
-        elif temperature >= light_el[idx]:
-            vec_el[1] += 1
-        else:
-            vec_el[0] += 1
+    vec_y, vec_el = vectors
 
     #return the vectors
     return vec_y, vec_el
 
 
-#Iterate over an array to find the week with maximum total Degree hours (Dh) over 0; returns the respective Dh and Exceedance hours (Eh)
+#Calculate the Degree hours (Dh) and Exceedance hours (Eh) of an hourly series over a threshold, annually and for the week with maximum Dh
+#Returns (annual Dh, annual Eh, maximum week Dh, maximum week Eh)
+def calculate_dh_eh(data, threshold):
+
+    auc_input = np.maximum(0, np.asarray(data, dtype=np.float64) - threshold)
+    auc_val = trapz(auc_input)
+    days_over = int(np.count_nonzero(auc_input > 0))
+    auc_max, max_days_over = find_week_with_max_total(auc_input)
+
+    return (round(auc_val, 2), days_over, round(auc_max, 2), max_days_over)
+
+#Find the week with maximum total Degree hours (Dh) over 0 in an array; returns the respective Dh and Exceedance hours (Eh)
 def find_week_with_max_total(array):
 
     week_hours = 24 * 7
+    array = np.asarray(array, dtype=np.float64)
     arr_len = len(array)
 
     #Extend the array to make sure we also wrap around the last month when looking for week with maximum Dh
-    array_extended = array * 2
-
-    #Initialize the first window
-    week_data = array_extended[:week_hours]
-    week_total = sum(week_data)
-    days_over = sum(int(item > 0) for item in week_data)
-
-    max_total = week_total
-    max_days_over = days_over
-
-    for week_start in range(1, arr_len):
-
-        #Update the start and end of the window
-        week_end = week_start + week_hours
+    array_extended = np.concatenate([array, array])
 
-        #Update totals by subtracting the first item and adding the new item
-        first_item = array_extended[week_start - 1]
-        new_item = array_extended[week_end - 1]
+    #Totals over the windows of one week starting at every hour, from cumulative sums
+    cum_total = np.concatenate([[0], np.cumsum(array_extended)])
+    cum_over = np.concatenate([[0], np.cumsum(array_extended > 0)])
+    week_totals = cum_total[week_hours:week_hours + arr_len] - cum_total[:arr_len]
+    week_days_over = cum_over[week_hours:week_hours + arr_len] - cum_over[:arr_len]
 
-        week_total = week_total - first_item + new_item
-        days_over = days_over - int(first_item > 0) + int(new_item > 0)
+    #First week with the maximum Dh value
+    max_week = np.argmax(week_totals)
 
-        #Update maximum Dh and Ex values if this window has a higher Dh value
-        if week_total > max_total:
-            max_total = week_total
-            max_days_over = days_over
+    return week_totals[max_week], int(week_days_over[max_week])
 
-    return max_total, max_days_over
+#Month and day of the start of the hottest week of a weather file, computed once per unique file
+#The weather file is the same for all buildings of a weather scenario
+def hottest_week_start(weather_path):
+    return derived_value(weather_path, 'hottest_week_start', lambda file: [int(value) for value in find_most_extreme_week(file)])
 
 #Identify the hottest (mean) week
 def find_most_extreme_week(file):
@@ -1,12 +1,38 @@
 ##Preprocess Building Data for EnergyPlus simulation
 from eppy import idf_helpers
 from eppy.modeleditor import IDF
-import streamlit as st
 
 #IDD file to use
 iddfile = '/Applications/EnergyPlus-23-1-0/Energy+.idd'
 
-def preprocess(simulation_folders):
+#Output variables reported for the thermal comfort models, with the kind of their keys (zones or People objects)
+output_variables = [('Zone Mean Air Temperature', 'zone'),
+                    ('Zone Air Relative Humidity', 'zone'),
+                    ('Zone Thermal Comfort Fanger Model PMV', 'people'),
+                    ('Zone Thermal Comfort Fanger Model PPD', 'people'),
+                    ('Zone Thermal Comfort Pierce Model Standard Effective Temperature', 'people'),
+                    ('Zone Thermal Comfort Mean Radiant Temperature', 'people')]
+
+#Preset value that caps the value of the building file, so a preset never makes a building more detailed than it is
+def at_most(limit):
+    return lambda value: limit if value in (None, '') else min(int(value), limit)
+
+
+#Simulation fidelity presets: fields set on the given objects of every building file (objects missing are added)
+#A field is set to its value, or to the result of calling the value with the field of the building file
+#'full' keeps the settings of the building file; 'screening' trades accuracy for speed with fewer timesteps per hour,
+#fewer and looser warm-up days and less frequent shading updates, e.g. to triage large portfolios
+fidelity_presets = {'full': {},
+                    'screening': {'TIMESTEP': {'Number_of_Timesteps_per_Hour': at_most(2)},
+                                  'BUILDING': {'Maximum_Number_of_Warmup_Days': 10,
+                                               'Minimum_Number_of_Warmup_Days': 1,
+                                               'Loads_Convergence_Tolerance_Value': 0.08,
+                                               'Temperature_Convergence_Tolerance_Value': 0.8},
+                                  'SHADOWCALCULATION': {'Shading_Calculation_Update_Frequency_Method': 'Periodic',
+                                                        'Shading_Calculation_Update_Frequency': 60}}}
+
+#progress(stage, fraction, text) is called to report progress, e.g. to a Streamlit progress bar or the command line
+def preprocess(simulation_folders, start_month=1, progress=None, fidelity='full'):
 
     nr_simulations = len(simulation_folders)
 
@@ -16,11 +42,14 @@ def preprocess(simulation_folders):
 
         simulation_folder = simulation_folders[i]
 
+        if progress:
+            progress('preprocess', i / nr_simulations, f'Preparing building file {i + 1} of {nr_simulations}...')
+
         #Preprocess Building Data by modifying the given idf file
         idf_file = IDF(simulation_folder + '/in.idf')
 
         #Define simulation to run either from June - May or January - December (depending on location)
-        define_runperiod(idf_file)
+        define_runperiod(idf_file, start_month)
 
         #Remove all output variables and only insert the ones of interest to my simulations
         define_output(idf_file)
@@ -28,17 +57,22 @@ def preprocess(simulation_folders):
         #Add specifications to enable thermal comfort calculation (PMV, SET, WBGT)
         add_thermal_comfort(idf_file)
 
+        #Apply the timestep, warm-up and shading settings of the fidelity preset
+        apply_fidelity(idf_file, fidelity)
+
         #Replace the current idf file with the updated one
         idf_file.save(simulation_folder + "/in.idf")
 
+    if progress:
+        progress('preprocess', 1.0, f'Preparation complete. {nr_simulations} building files prepared.')
 
-def define_runperiod(idf_file):
+
+def define_runperiod(idf_file, start_month):
 
     #Get all RUNPERIOD objects
     runperiods = idf_file.idfobjects['RUNPERIOD']
 
     #Keep only the first RUNPERIOD object and set its dates
-    start_month = st.session_state.start_month
     if start_month == 1:
         end_month = 12
     else:
@@ -55,6 +89,20 @@ def define_runperiod(idf_file):
         for runperiod in runperiods[1:]:
             idf_file.removeidfobject(runperiod)
 
+def apply_fidelity(idf_file, fidelity):
+
+    def field_value(value, current):
+        return value(current) if callable(value) else value
+
+    for object_type, fields in fidelity_presets[fidelity].items():
+        idf_objects = idf_file.idfobjects[object_type]
+        if not idf_objects:
+            idf_file.newidfobject(object_type, **{field: field_value(value, None) for field, value in fields.items()})
+            continue
+        for idf_object in idf_objects:
+            for field, value in fields.items():
+                setattr(idf_object, field, field_value(value, getattr(idf_object, field)))
+
 #Define thermal comfort model outputs to report and include assumptions for the models
 def define_output(idf_file):
 
@@ -67,30 +115,36 @@ def define_output(idf_file):
         for obj in objects_to_remove:
             idf_file.popidfobject(obj, 0)
 
-    #Specify the output values EnergyPlus should report for our thermal comfort models
-    idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value="*",
-                          Variable_Name="Zone Mean Air Temperature",
-                          Reporting_Frequency="Hourly")
+    #Specify the output values EnergyPlus should report for our thermal comfort models, only for the inhabited zones
+    #(none for a building without inhabited zones)
+    keys = output_keys(idf_file)
+    for variable_name, key_kind in output_variables:
+        for key in keys[key_kind]:
+            idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value=key,
+                                  Variable_Name=variable_name,
+                                  Reporting_Frequency="Hourly")
+
+
+#Zones with People objects, in the order of the zones; only these are reported and postprocessed
+def inhabited_zones(idf_file):
+    people_zones = {people.Zone_or_ZoneList_or_Space_or_SpaceList_Name.upper() for people in idf_file.idfobjects['PEOPLE']}
+    return [zone.Name.upper() for zone in idf_file.idfobjects['ZONE'] if zone.Name.upper() in people_zones]
 
-    idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value="*",
-                          Variable_Name="Zone Air Relative Humidity",
-                          Reporting_Frequency="Hourly")
 
-    idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value="*",
-                          Variable_Name='Zone Thermal Comfort Fanger Model PMV',
-                          Reporting_Frequency="Hourly")
+#Output keys of the inhabited zones and of their People objects (the keys of the thermal comfort variables)
+#A single "*" key is used where it is as compact, i.e. where all zones or People objects are inhabited ones; without any
+#inhabited zone there are no keys, as "*" would report the uninhabited zones
+def output_keys(idf_file):
 
-    idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value="*",
-                          Variable_Name='Zone Thermal Comfort Fanger Model PPD',
-                          Reporting_Frequency="Hourly")
+    zones = inhabited_zones(idf_file)
+    people = [people.Name for people in idf_file.idfobjects['PEOPLE']
+              if people.Zone_or_ZoneList_or_Space_or_SpaceList_Name.upper() in zones]
 
-    idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value="*",
-                          Variable_Name='Zone Thermal Comfort Pierce Model Standard Effective Temperature',
-                          Reporting_Frequency="Hourly")
+    def compact(keys, total):
+        return ['*'] if keys and len(keys) == total else keys
 
-    idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value="*",
-                          Variable_Name='Zone Thermal Comfort Mean Radiant Temperature',
-                          Reporting_Frequency="Hourly")
+    return {'zone': compact(zones, len(idf_file.idfobjects['ZONE'])),
+            'people': compact(people, len(idf_file.idfobjects['PEOPLE']))}
 
 
 #Add necessary assumptions for SET and PMV thermal comfort models
@@ -0,0 +1,81 @@
+##Compact in-memory container for the postprocessed results of one building
+import numpy as np
+
+
+class BuildingResults():
+    """A class which holds the hourly results of one building in a single
+    preallocated float64 array of shape (metric, zone, weather, hour)
+
+    The values keep the precision of the EnergyPlus output (float64), as the
+    Degree and Exceedance hours and Activity hours compare them with thresholds
+    """
+
+    def __init__(self, metrics, zones, weathers, nr_hours):
+        """
+        Arguments:
+            - metrics (list): the metrics to store
+            - zones (list): the (inhabited) zones of the building
+            - weathers (list): the weather scenarios simulated for the building
+            - nr_hours (int): the number of hourly values per series
+
+        """
+
+        self.metrics = list(metrics)
+        self.zones = list(zones)
+        self.weathers = list(weathers)
+        self.nr_hours = nr_hours
+
+        #Lookup tables from names to positions in the array
+        self.metric_idx = {metric: i for i, metric in enumerate(self.metrics)}
+        self.zone_idx = {zone: i for i, zone in enumerate(self.zones)}
+        self.weather_idx = {weather: i for i, weather in enumerate(self.weathers)}
+
+        self.values = np.full((len(self.metrics), len(self.zones), len(self.weathers), nr_hours), np.nan, dtype=np.float64)
+
+        #Start and end of the hottest week (with its preceding and following week) per weather scenario
+        self.hottest_ranges = {}
+
+    def set(self, metric, zone, weather, data):
+        """Stores the hourly series of a metric, zone and weather scenario
+
+        Arguments:
+            - data (array-like): the hourly values
+
+        """
+
+        self.values[self.metric_idx[metric], self.zone_idx[zone], self.weather_idx[weather]] = data
+
+    def get(self, metric, zone, weather):
+        """Returns a view on the annual hourly series of a metric, zone and weather scenario
+        """
+
+        return self.values[self.metric_idx[metric], self.zone_idx[zone], self.weather_idx[weather]]
+
+    def set_hottest_range(self, weather, start, end):
+        """Stores the hour range of the hottest week (with its preceding and following week) of a weather scenario
+        """
+
+        self.hottest_ranges[weather] = (start, end)
+
+    def hottest(self, metric, zone, weather):
+        """Returns a view on the hourly values over the hottest weeks of a weather scenario
+        """
+
+        start, end = self.hottest_ranges[weather]
+        return self.get(metric, zone, weather)[start:end]
+
+    def summer(self, metric, zone, weather, summer_filter):
+        """Returns the hourly values over the summer months
+
+        Arguments:
+            - summer_filter (array-like): boolean mask selecting the summer hours
+
+        """
+
+        return self.get(metric, zone, weather)[summer_filter]
+
+    def summer_difference(self, metric, zone, weather, baseline, summer_filter):
+        """Returns the hourly differences to the baseline scenario over the summer months
+        """
+
+        return self.summer(metric, zone, weather, summer_filter) - self.summer(metric, zone, baseline, summer_filter)
@@ -0,0 +1,96 @@
+##Screening of weather scenarios by their outdoor heat, so mild or duplicate scenarios need not be simulated
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from thermofeel import calculate_wbt, calculate_bgt
+from .app_epw_cache import derived_value, source_hash
+from .app_heatwave_creation import hottest_week_index
+from .app_postprocessing import calculate_dh_eh
+
+#Outdoor heat statistics of a weather file; Degree and Exceedance hours are of the dry bulb temperature over the Temperature threshold
+screening_statistics = ['Hottest Week Mean', 'Maximum Temperature', 'Degree hours', 'Maximum Week Degree hours',
+                        'Exceedance hours', 'Peak Humidex', 'Peak WBGT']
+
+#Statistic by which weather scenarios are ranked unless another is given
+default_screening_metric = 'Maximum Week Degree hours'
+
+#Smallest wind speed (m/s at 10 m) used for the globe temperature, which is undefined in still air
+min_wind_speed = 0.5
+
+
+#Outdoor heat statistics of a parsed weather file for the given Temperature threshold
+def weather_statistics(file, temperature_threshold):
+
+    data = file.dataframe
+    temperature = data['Dry Bulb Temperature'].to_numpy(dtype=float)
+    humidity = data['Relative Humidity'].to_numpy(dtype=float)
+    wind_speed = data['Wind Speed'].to_numpy(dtype=float)
+
+    _, week_mean = hottest_week_index(temperature)
+    degree_hours, exceedance_hours, week_degree_hours, _ = calculate_dh_eh(temperature, temperature_threshold)
+
+    return {'Hottest Week Mean': round(week_mean, 2),
+            'Maximum Temperature': round(float(temperature.max()), 1),
+            'Degree hours': float(degree_hours),
+            'Maximum Week Degree hours': float(week_degree_hours),
+            'Exceedance hours': exceedance_hours,
+            'Peak Humidex': round(float(outdoor_humidex(temperature, humidity).max()), 1),
+            'Peak WBGT': round(float(outdoor_wbgt(temperature, humidity, wind_speed).max()), 1)}
+
+
+#Humidex of hourly temperatures (°C) and relative humidities (%), the formula of pythermalcomfort.humidex for whole arrays
+def outdoor_humidex(temperature, humidity):
+    vapour_pressure = 6.112 * 10 ** (7.5 * temperature / (237.7 + temperature)) * humidity / 100
+    return temperature + 5 / 9 * (vapour_pressure - 10)
+
+
+#WBGT in the shade (mean radiant temperature equal to the air temperature), weighted as the indoor WBGT of the results
+def outdoor_wbgt(temperature, humidity, wind_speed):
+    K = 273.15
+    temp_K = temperature + K
+    wbt = calculate_wbt(temp_K, humidity) - K
+    bgt = calculate_bgt(temp_K, temp_K, np.maximum(wind_speed, min_wind_speed)) - K
+    return 0.7 * wbt + 0.3 * bgt
+
+
+#Statistics and content hash of one weather file (path or file-like), computed once per file content and threshold
+def screen_weather(source, temperature_threshold):
+    statistics = derived_value(source, f'screening_{temperature_threshold:g}',
+                               lambda file: weather_statistics(file, temperature_threshold))
+    return {**statistics, 'sha256': source_hash(source)}
+
+
+#Screen weather scenarios, given as a list of (file name, path or file-like object), before simulating them
+#Scenarios are ranked by the metric (most severe first); a scenario with the same content as the baseline or a higher ranked
+#scenario is a duplicate, and with min_severity, scenarios whose metric is below it are skipped. The baseline is always simulated.
+#Returns the weather scenarios to simulate, in their original order, and the screening table with a Decision column
+def screen_weathers(weathers, temperature_threshold, metric=default_screening_metric, min_severity=None, dedupe=True,
+                    baseline=None, workers=8):
+
+    if metric not in screening_statistics:
+        raise ValueError(f'Unknown screening metric {metric}, choose one of {screening_statistics}')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(lambda weather: screen_weather(weather[1], temperature_threshold), weathers))
+
+    #The index of the table stays the position of the scenario in weathers, so equal file names cannot be mixed up
+    table = pd.DataFrame(rows, columns=screening_statistics + ['sha256'])
+    table.insert(0, 'Weather', [os.path.splitext(name)[0] for name, _ in weathers])
+    baseline_index = next(iter(table.index[table['Weather'] == baseline]), None)
+    table = table.sort_values(metric, ascending=False, kind='stable')
+    table.insert(1, 'Rank', np.arange(1, len(table) + 1))
+
+    is_baseline = table.index == baseline_index
+    if dedupe:
+        baseline_content = table['sha256'] == table.loc[baseline_index, 'sha256'] if baseline_index is not None else False
+        duplicate = (table['sha256'].duplicated() | baseline_content) & ~is_baseline
+    else:
+        duplicate = pd.Series(False, index=table.index)
+    mild = table[metric] < min_severity if min_severity is not None else pd.Series(False, index=table.index)
+
+    table['Decision'] = np.select([is_baseline, duplicate, mild], ['Simulate (baseline)', 'Skip (duplicate)', 'Skip (below severity)'],
+                                  default='Simulate')
+
+    simulate = sorted(table.index[table['Decision'].str.startswith('Simulate')])
+    return [weathers[index] for index in simulate], table.drop(columns='sha256').reset_index(drop=True)
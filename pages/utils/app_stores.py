@@ -0,0 +1,30 @@
+##Shared read handles of the HDF data files
+import os
+import threading
+import pandas as pd
+
+#Open store handles, one per data file and reopened when the file changes
+#PyTables keeps a process-wide registry of open files, so the handles are shared by all sessions of the server
+_stores = {}
+stores_lock = threading.RLock()
+
+
+def open_store(hdf5_file_path, mtime):
+    with stores_lock:
+        if hdf5_file_path in _stores:
+            store, store_mtime = _stores[hdf5_file_path]
+            if store_mtime == mtime and store.is_open:
+                return store
+            store.close()
+        store = pd.HDFStore(hdf5_file_path, 'r')
+        _stores[hdf5_file_path] = (store, mtime)
+        return store
+
+
+#Close the open store handles of the data files in data_path (all if not given), needed before the data files are rewritten
+def close_stores(data_path=None):
+    with stores_lock:
+        for hdf5_file_path in list(_stores):
+            if data_path is None or os.path.dirname(os.path.abspath(hdf5_file_path)) == os.path.abspath(data_path):
+                store, _ = _stores.pop(hdf5_file_path)
+                store.close()
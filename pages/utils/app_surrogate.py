@@ -0,0 +1,201 @@
+##Surrogate models that predict the simulated zone conditions of new weather files without running EnergyPlus
+#A linear least-squares model per building maps weather drivers of every hour to the hourly outputs of all its zones;
+#predicted scenarios are postprocessed like simulated ones and labelled as screening results
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from .app_catalog import record_run
+from .app_epw_cache import read_epw
+from .app_ingest import read_input
+from .app_postprocessing import postprocess, variables
+from .app_workspace import workspace_lock, write_manifest
+
+surrogate_file_name = 'surrogate.json'
+
+#Label and weather folder suffix of predicted scenarios, so they are never mistaken for simulated ones
+screening_label = 'screening'
+screening_suffix = '_screening'
+
+#EnergyPlus outputs the surrogate predicts (all outputs read by postprocess)
+predicted_variables = list(variables.values())
+
+#Weather drivers of the model, with the trailing mean windows (hours) that stand in for the thermal mass of the building
+driver_columns = ['Dry Bulb Temperature', 'Dew Point Temperature', 'Relative Humidity', 'Wind Speed', 'Total Sky Cover',
+                  'Global Horizontal Radiation', 'Direct Normal Radiation', 'Diffuse Horizontal Radiation']
+temperature_windows = [6, 24, 72, 168]
+radiation_windows = [6, 24]
+
+
+#Mean of the last hours values up to every hour, wrapping around the start of the year
+def trailing_mean(values, hours):
+    extended = np.concatenate([values[len(values) - hours + 1:], values])
+    cumulative = np.concatenate([[0], np.cumsum(extended)])
+    return (cumulative[hours:] - cumulative[:-hours]) / hours
+
+
+#Feature matrix (hour x feature) of the hourly weather data: drivers, trailing means, daily and seasonal harmonics and an intercept
+def weather_features(epw_data):
+
+    drivers = [epw_data[column].to_numpy(dtype=float) for column in driver_columns]
+    temperature = drivers[0]
+    radiation = epw_data['Global Horizontal Radiation'].to_numpy(dtype=float)
+
+    hour = 2 * np.pi * (epw_data['Hour'].to_numpy(dtype=float) - 1) / 24
+    day = 2 * np.pi * np.arange(len(epw_data)) / len(epw_data)
+
+    features = (drivers
+                + [trailing_mean(temperature, hours) for hours in temperature_windows]
+                + [trailing_mean(radiation, hours) for hours in radiation_windows]
+                + [np.sin(hour), np.cos(hour), np.sin(2 * hour), np.cos(2 * hour), np.sin(day), np.cos(day),
+                   np.ones(len(epw_data))])
+    return np.column_stack(features)
+
+
+#Rows of the weather data for the Date/Time stamps of an EnergyPlus output (e.g. ' 06/01  01:00:00'), which follow the run period
+#Raises a ValueError if the weather data has no hour of some stamps (e.g. a 29 February output for a weather file without it)
+def output_rows(epw_data, date_times):
+    stamps = pd.Series(date_times).str.strip()
+    keys = stamps.str[0:2].astype(int) * 10000 + stamps.str[3:5].astype(int) * 100 + stamps.str[7:9].astype(int)
+    epw_keys = epw_data['Month'].to_numpy(dtype=int) * 10000 + epw_data['Day'].to_numpy(dtype=int) * 100 + epw_data['Hour'].to_numpy(dtype=int)
+    rows = pd.Series(np.arange(len(epw_data)), index=epw_keys).groupby(level=0).first().reindex(keys.to_numpy())
+
+    missing = rows.isna().to_numpy()
+    if missing.any():
+        raise ValueError(f'The weather data has no hour for {missing.sum()} of {len(stamps)} output time stamps, '
+                         f'e.g. {stamps[missing].iloc[0]}')
+    return rows.to_numpy(dtype=int)
+
+
+#Features and outputs of one simulation, aligned hour by hour
+def simulation_pairs(simulation_folder):
+
+    output = pd.read_csv(os.path.join(simulation_folder, 'eplusout.csv'))
+    columns = [column for column in output.columns if any(':' + variable in column for variable in predicted_variables)]
+
+    epw_data = read_epw(os.path.join(simulation_folder, 'weather.epw')).dataframe
+    rows = output_rows(epw_data, output['Date/Time'])
+
+    return weather_features(epw_data)[rows], output[columns], output['Date/Time'].tolist()
+
+
+#Least-squares coefficients, fitted on the hours whose features and outputs are all finite (e.g. no missing weather values)
+def fit(features, targets):
+    valid = np.isfinite(features).all(axis=1) & np.isfinite(targets).all(axis=1)
+    coefficients, *_ = np.linalg.lstsq(features[valid], targets[valid], rcond=None)
+    return coefficients
+
+
+#Root mean square and mean absolute errors per output column
+def errors(predicted, actual, columns):
+    difference = predicted - actual
+    return {'rmse': dict(zip(columns, np.sqrt(np.nanmean(difference ** 2, axis=0)).round(3).tolist())),
+            'mae': dict(zip(columns, np.nanmean(np.abs(difference), axis=0).round(3).tolist()))}
+
+
+#Train the model of one building on all its simulated weather scenarios
+#With several scenarios, every scenario is held out once and predicted by a model trained on the others (leave one out)
+def train_building(building_folder, weather_folders):
+
+    pairs = {weather: simulation_pairs(os.path.join(building_folder, weather)) for weather in weather_folders}
+    columns = list(pairs[weather_folders[0]][1].columns)
+    features = {weather: x for weather, (x, _, _) in pairs.items()}
+    targets = {weather: y[columns].to_numpy(dtype=float) for weather, (_, y, _) in pairs.items()}
+
+    if len(weather_folders) > 1:
+        held_out = {}
+        for weather in weather_folders:
+            others = [other for other in weather_folders if other != weather]
+            coefficients = fit(np.vstack([features[other] for other in others]), np.vstack([targets[other] for other in others]))
+            held_out[weather] = features[weather] @ coefficients
+        validation = {'method': 'leave one weather scenario out',
+                      **errors(np.vstack(list(held_out.values())), np.vstack([targets[weather] for weather in held_out]), columns)}
+    else:
+        validation = None
+
+    all_features = np.vstack(list(features.values()))
+    all_targets = np.vstack(list(targets.values()))
+    coefficients = fit(all_features, all_targets)
+    if validation is None:
+        validation = {'method': 'training error (a single simulated weather scenario)',
+                      **errors(all_features @ coefficients, all_targets, columns)}
+
+    return {'columns': columns, 'coefficients': coefficients.tolist(), 'date_time': pairs[weather_folders[0]][2],
+            'trained_on': list(weather_folders), 'validation': validation}
+
+
+#Train the models of all buildings of a run on its simulated scenarios and store them in its workspace
+def train_surrogates(manifest):
+
+    weather_folders = simulated_weathers(manifest)
+    models = {building: {**train_building(building_folder, weather_folders), 'created': manifest['created']}
+              for building, building_folder in zip(manifest['building_names'], manifest['building_folders'])}
+
+    with open(os.path.join(manifest['workspace'], surrogate_file_name), 'w') as f:
+        json.dump(models, f)
+    return models
+
+
+#Models of a run, trained again if the run has been simulated again since they were trained
+def load_surrogates(manifest):
+    surrogate_path = os.path.join(manifest['workspace'], surrogate_file_name)
+    if os.path.exists(surrogate_path):
+        with open(surrogate_path) as f:
+            models = json.load(f)
+        if all(model['created'] == manifest['created'] and model['trained_on'] == simulated_weathers(manifest)
+               for model in models.values()):
+            return models
+    return train_surrogates(manifest)
+
+
+def simulated_weathers(manifest):
+    return [weather for weather in manifest['weather_folders'] if not weather.endswith(screening_suffix)]
+
+
+#Predicted EnergyPlus output (Date/Time and all predicted columns) of a building for a weather file (path or file-like)
+def predict(model, weather_source):
+    epw_data = read_epw(weather_source).dataframe
+    rows = output_rows(epw_data, model['date_time'])
+    predicted = weather_features(epw_data)[rows] @ np.asarray(model['coefficients'])
+    return pd.DataFrame(predicted, columns=model['columns']).assign(**{'Date/Time': model['date_time']})[['Date/Time'] + model['columns']]
+
+
+#Predict new weather scenarios (list of (file name, path or file-like object)) for all buildings of a completed run
+#The predictions are written as the EnergyPlus output of <weather>_screening folders and postprocessed with the simulated
+#scenarios, so they appear on the Results page; returns the updated manifest, which lists them under 'surrogate'
+def add_screening_scenarios(manifest, weathers, output_folder='Output', progress=None):
+
+    workspace = manifest['workspace']
+    with workspace_lock(workspace):
+        start = time.perf_counter()
+        models = load_surrogates(manifest)
+
+        screening_weathers = [os.path.splitext(name)[0] + screening_suffix for name, _ in weathers]
+        for building, building_folder in zip(manifest['building_names'], manifest['building_folders']):
+            for weather, (_, source) in zip(screening_weathers, weathers):
+                simulation_folder = os.path.join(building_folder, weather)
+                os.makedirs(simulation_folder, exist_ok=True)
+                with open(os.path.join(simulation_folder, 'weather.epw'), 'wb') as f:
+                    f.write(read_input(source))
+                predict(models[building], source).to_csv(os.path.join(simulation_folder, 'eplusout.csv'), index=False)
+        prediction_time = time.perf_counter() - start
+
+        weather_folders = manifest['weather_folders'] + [weather for weather in screening_weathers if weather not in manifest['weather_folders']]
+        simulation_folders = [os.path.join(building_folder, weather)
+                              for building_folder in manifest['building_folders'] for weather in weather_folders]
+
+        start = time.perf_counter()
+        settings = manifest['settings']
+        zones = postprocess(simulation_folders, manifest['building_folders'], weather_folders, settings['baseline'],
+                            settings['summer_months'], settings['metrics_thresholds'], manifest['data_path'], progress)
+
+        manifest = {**manifest, 'weather_folders': weather_folders, 'simulation_folders': simulation_folders, 'zones': zones,
+                    'surrogate': {'label': screening_label,
+                                  'weathers': [weather for weather in weather_folders if weather.endswith(screening_suffix)],
+                                  'validation': {building: model['validation'] for building, model in models.items()}},
+                    'timings': {**manifest['timings'], 'surrogate': prediction_time, 'postprocess': time.perf_counter() - start}}
+        write_manifest(workspace, manifest)
+
+    record_run(manifest, output_folder)
+    return manifest
@@ -0,0 +1,126 @@
+##Precomputed liveability and survivability grids for the survivability charts and Activity hours
+import os
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from thermofeel import calculate_wbt
+from .app_workspace import file_lock
+
+#Resolved relative to this module, so the grids are found from any working directory
+survivability_data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'survivability_data')
+
+#Compact binary cache of the grids, rebuilt when any of the source CSV files is newer or its format version differs
+grids_cache_path = 'Output/cache/survivability_grids.npz'
+grids_cache_version = 2
+
+age_suffixes = {'young': 'Young_adult', 'elderly': '65_over'}
+
+#Limit curves over relative humidity (Tair and rh columns)
+curve_files = {'surv': 'rh_version_NewSurvivability_limits_Night-Indoors_3H-{}.csv',
+               'liv': 'rh_version_Liveability_limits_Night-Indoors_3H-{}.csv',
+               'light': 'rh_version_Liveability_light_physical_activity_Night-Indoors_3H-{}.csv'}
+
+#Grids over relative humidity (rows) and temperature (columns)
+bool_grid_files = {'surv_not_liv': 'rh_survive_but_not_livable_survivability_Night-Indoors_3H-{}.csv',
+                   'survivable': 'rh_survivability_array_Night-Indoors_3H-{}.csv'}
+float_grid_files = {'mmax': 'rh_Mmax_Livability_Night-Indoors_3H-{}.csv'}
+
+
+#Temperature and relative humidity ranges of the grids
+def grid_axes():
+    temperature = np.arange(25, 60, 0.1)
+    humidity = np.arange(0.5, 100.5, 0.5)
+    return temperature, humidity
+
+
+def calculate_humidex(temperature, humidity):
+    e = 6.112 * np.exp(17.67 * temperature / (temperature + 243.5)) * humidity / 100
+    humidex = temperature + (5/9) * (e - 10)
+    return humidex
+
+
+#Temperatures at which Humidex reaches each level, for every relative humidity of the grid
+#Humidex increases with temperature, so each isoline is found by interpolating along the rows; levels outside the grid give NaN
+def humidex_isolines(temperature, humidity, humidex_grid, levels):
+    isolines = {}
+    for level in levels:
+        line = np.array([np.interp(level, row, temperature) for row in humidex_grid])
+        line[(humidex_grid[:, 0] > level) | (humidex_grid[:, -1] < level)] = np.nan
+        isolines[level] = line
+    return isolines
+
+
+def source_files():
+    file_names = list(curve_files.values()) + list(bool_grid_files.values()) + list(float_grid_files.values())
+    return [os.path.join(survivability_data_path, name.format(suffix)) for name in file_names for suffix in age_suffixes.values()]
+
+
+#Read the CSV files and compute the WBT and Humidex grids; boolean grids are bit-packed and the grids drawn in the charts
+#stored as float32, while the limit curves, which classify the Activity hours, keep the float64 values of the CSV files
+def build_grids_cache(cache_path=grids_cache_path):
+
+    temperature, humidity = grid_axes()
+    temp_grid, humid_grid = np.meshgrid(temperature, humidity)
+    K = 273.15
+
+    arrays = {'version': np.array(grids_cache_version),
+              'wbt_grid': (calculate_wbt(temp_grid + K, humid_grid) - K).astype(np.float32),
+              'humidex_grid': calculate_humidex(temp_grid, humid_grid).astype(np.float32)}
+
+    for age, suffix in age_suffixes.items():
+        for name, file_name in curve_files.items():
+            curve = pd.read_csv(os.path.join(survivability_data_path, file_name.format(suffix)))
+            arrays[f'{name}_{age}_Tair'] = curve['Tair'].to_numpy(dtype=np.float64)
+            arrays[f'{name}_{age}_rh'] = curve['rh'].to_numpy(dtype=np.float64)
+
+        for name, file_name in bool_grid_files.items():
+            grid = pd.read_csv(os.path.join(survivability_data_path, file_name.format(suffix)), index_col=0).to_numpy(dtype=bool)
+            arrays[f'{name}_{age}'] = np.packbits(grid, axis=None)
+            arrays[f'{name}_{age}_shape'] = np.array(grid.shape)
+
+        for name, file_name in float_grid_files.items():
+            grid = pd.read_csv(os.path.join(survivability_data_path, file_name.format(suffix)), index_col=0)
+            arrays[f'{name}_{age}'] = grid.to_numpy(dtype=np.float32)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+    #Write to a temporary file first so concurrent readers never see a partial cache
+    tmp_path = cache_path + f'.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, cache_path)
+
+
+def cache_is_current(cache_path=grids_cache_path):
+    if not os.path.exists(cache_path):
+        return False
+    with np.load(cache_path) as data:
+        if 'version' not in data.files or int(data['version']) != grids_cache_version:
+            return False
+    cache_mtime = os.path.getmtime(cache_path)
+    return all(os.path.getmtime(fp) <= cache_mtime for fp in source_files())
+
+
+#Process-wide cache of the unpacked grids, built at most once per process
+@lru_cache(maxsize=1)
+def load_grids():
+
+    if not cache_is_current():
+        #Only one process builds the shared cache; the others wait and use it
+        with file_lock(grids_cache_path + '.lock'):
+            if not cache_is_current():
+                build_grids_cache()
+
+    grids = {}
+    with np.load(grids_cache_path) as data:
+        for key in data.files:
+            if key.endswith('_shape') or key == 'version':
+                continue
+            if key + '_shape' in data.files:
+                shape = tuple(data[key + '_shape'])
+                grids[key] = np.unpackbits(data[key], count=shape[0] * shape[1]).reshape(shape).astype(bool)
+            else:
+                grids[key] = data[key]
+
+    grids['temperature'], grids['humidity'] = grid_axes()
+    return grids
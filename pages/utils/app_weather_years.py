@@ -0,0 +1,100 @@
+##Multi-year (e.g. actual meteorological year) weather files, scanned and split one year at a time
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+from .epw import epw
+from .app_heatwave_creation import hottest_week_index, file_stem
+
+#Columns needed to find the hottest week of every year
+scan_columns = ['Year', 'Month', 'Day', 'Dry Bulb Temperature']
+year_columns = scan_columns[1:]
+
+#Weekdays as named in the DATA PERIODS header, from Monday
+weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+#Hottest week and temperatures of every year of a weather file (path or file-like), in a single streaming pass
+#Returns one row per year; the overall hottest year is the row with the largest hottest_week_mean
+def scan_years(source):
+
+    #Only the dates and temperatures of the previous year are kept while the next one is read, and only the first hours
+    #of the next year that a week starting in the previous year can reach are passed on
+    years = []
+    previous = None
+    for year, data in epw().read_years(source, usecols=scan_columns):
+        if previous is not None:
+            years.append(year_statistics(*previous, data['Dry Bulb Temperature'].to_numpy(dtype=float)[:24 * 7 - 1]))
+        previous = (year, data[year_columns].copy())
+        del data
+    if previous is not None:
+        years.append(year_statistics(*previous, np.empty(0)))
+
+    return pd.DataFrame(years, columns=['year', 'hours', 'hottest_week_start', 'hottest_week_mean', 'max_temperature', 'mean_temperature'])
+
+
+#Hottest week and temperatures of one year, where following are the temperatures of the next year (empty for the last one)
+#A year shorter than one week (e.g. the last day of a record) has no hottest week
+def year_statistics(year, data, following):
+
+    temperature = data['Dry Bulb Temperature'].to_numpy(dtype=float)
+    if len(temperature) < 24 * 7:
+        week_start, week_mean = None, np.nan
+    else:
+        week_index, week_mean = hottest_week_index(temperature, following)
+        week_start = f"{data['Month'].iloc[week_index]}/{data['Day'].iloc[week_index]}"
+
+    return {'year': year,
+            'hours': len(data),
+            'hottest_week_start': week_start,
+            'hottest_week_mean': round(week_mean, 2),
+            'max_temperature': round(float(temperature.max()), 1),
+            'mean_temperature': round(float(temperature.mean()), 2)}
+
+
+def hottest_year(years):
+    return int(years.loc[years['hottest_week_mean'].idxmax(), 'year'])
+
+
+#Write the given years of a weather file (path or file-like) as single-year EPW files <input>_<year>.epw
+#The file is streamed, so only one year is held in memory; returns the paths of the written files
+def export_years(source, years, output_folder):
+
+    os.makedirs(output_folder, exist_ok=True)
+    input_name = file_stem(source)
+    years = set(years)
+
+    output_files = []
+    file = epw()
+    for year, data in file.read_years(source):
+        if year not in years:
+            continue
+
+        year_file = epw()
+        year_file.headers = single_year_headers(file.headers, data)
+        year_file.line_terminator = file.line_terminator
+        year_file.decimals = file.decimals
+        year_file.dataframe = data
+
+        output_file = os.path.join(output_folder, f'{input_name}_{year}.epw')
+        year_file.write(output_file)
+        output_files.append(output_file)
+
+    return output_files
+
+
+#Headers of one year of a multi-year file: the leap year flag is set if the year has data for February 29, and the data
+#period starts on the weekday of the first day of the year and spans its dates
+def single_year_headers(headers, data):
+    headers = {name: list(values) for name, values in headers.items()}
+    holidays = headers.get('HOLIDAYS/DAYLIGHT SAVINGS')
+    if holidays:
+        holidays[0] = 'Yes' if np.any((data['Month'] == 2).to_numpy() & (data['Day'] == 29).to_numpy()) else 'No'
+
+    data_periods = headers.get('DATA PERIODS')
+    if data_periods and len(data_periods) >= 6:
+        first, last = data.iloc[0], data.iloc[-1]
+        data_periods[3] = weekdays[date(int(first['Year']), int(first['Month']), int(first['Day'])).weekday()]
+        data_periods[4] = f"{int(first['Month']):>2}/{int(first['Day']):>2}"
+        data_periods[5] = f"{int(last['Month']):>2}/{int(last['Day']):>2}"
+    return headers
@@ -0,0 +1,89 @@
+##Run-scoped workspaces, so concurrent sessions and jobs never share simulation folders or result files
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError: #Windows
+    fcntl = None
+    import msvcrt
+
+#Every run gets its own folder Output/runs/<run id> holding its simulation folders and data files
+runs_folder = 'runs'
+manifest_file_name = 'run.json'
+lock_file_name = '.lock'
+
+#Touched whenever a session of the Results page shows the run, so the runs open in any session can be told from idle ones
+open_file_name = '.open'
+
+
+def new_run_id():
+    return datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+
+
+def run_workspace(output_folder, run_id):
+    return os.path.join(output_folder, runs_folder, run_id)
+
+
+#Exclusive lock on a file, held across processes (e.g. several servers or command line jobs on one machine)
+@contextmanager
+def file_lock(lock_path):
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    with open(lock_path, 'a+') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+#Lock held while a run writes to its workspace, so two jobs never run with the same run id at once
+def workspace_lock(workspace):
+    return file_lock(os.path.join(workspace, lock_file_name))
+
+
+#The manifest describes a completed run (buildings, weather scenarios, zones, settings, data folder) for the Results page
+def write_manifest(workspace, manifest):
+    manifest_path = os.path.join(workspace, manifest_file_name)
+    tmp_path = manifest_path + f'.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_path, manifest_path)
+
+
+#A workspace being rerun is hidden from the Results page until its new manifest is written
+def discard_manifest(workspace):
+    manifest_path = os.path.join(workspace, manifest_file_name)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+#Mark a run as open in a session of the Results page
+def mark_open(workspace):
+    if os.path.isdir(workspace):
+        with open(os.path.join(workspace, open_file_name), 'a'):
+            pass
+        os.utime(os.path.join(workspace, open_file_name))
+
+
+#Time (seconds since the epoch) a session of the Results page last showed the run, or None
+def last_opened(workspace):
+    open_path = os.path.join(workspace, open_file_name)
+    return os.path.getmtime(open_path) if os.path.exists(open_path) else None
+
+
+def read_manifest(workspace):
+    with open(os.path.join(workspace, manifest_file_name)) as f:
+        return json.load(f)
+
@@ -1,7 +1,77 @@
 # -*- coding: utf-8 -*-
 
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import csv
+import io
+import itertools
+
+#The columns of the climate data of an epw file
+column_names=['Year',
+              'Month',
+              'Day',
+              'Hour',
+              'Minute',
+              'Data Source and Uncertainty Flags',
+              'Dry Bulb Temperature',
+              'Dew Point Temperature',
+              'Relative Humidity',
+              'Atmospheric Station Pressure',
+              'Extraterrestrial Horizontal Radiation',
+              'Extraterrestrial Direct Normal Radiation',
+              'Horizontal Infrared Radiation Intensity',
+              'Global Horizontal Radiation',
+              'Direct Normal Radiation',
+              'Diffuse Horizontal Radiation',
+              'Global Horizontal Illuminance',
+              'Direct Normal Illuminance',
+              'Diffuse Horizontal Illuminance',
+              'Zenith Luminance',
+              'Wind Direction',
+              'Wind Speed',
+              'Total Sky Cover',
+              'Opaque Sky Cover (used if Horizontal IR Intensity missing)',
+              'Visibility',
+              'Ceiling Height',
+              'Present Weather Observation',
+              'Present Weather Codes',
+              'Precipitable Water',
+              'Aerosol Optical Depth',
+              'Snow Depth',
+              'Days Since Last Snowfall',
+              'Albedo',
+              'Liquid Precipitation Depth',
+              'Liquid Precipitation Quantity']
+
+#Compact data types for reading: small integers for the date fields, float32 for the measurements
+#The weather codes are kept as text, as they may have leading zeros
+compact_dtypes={name:np.float32 for name in column_names}
+compact_dtypes.update({'Year':np.int16,
+                       'Month':np.int8,
+                       'Day':np.int8,
+                       'Hour':np.int8,
+                       'Minute':np.int8,
+                       'Data Source and Uncertainty Flags':str,
+                       'Present Weather Observation':np.int8,
+                       'Present Weather Codes':str})
+
+#Number of decimals of the climate data columns in the epw format, used for data not read from a file
+#Values read from a file keep the decimals of their column in the file (e.g. Visibility 9999 next to 16.1), and more 
+#decimals are written only where a value needs them (e.g. after adding a UHI intensity of 0.25)
+column_decimals={name:0 for name in column_names}
+column_decimals.update({'Dry Bulb Temperature':1,
+                        'Dew Point Temperature':1,
+                        'Wind Speed':1,
+                        'Visibility':1,
+                        'Aerosol Optical Depth':4,
+                        'Albedo':3,
+                        'Liquid Precipitation Depth':1,
+                        'Liquid Precipitation Quantity':1})
+
+#Most decimals written for any value
+max_decimals=6
 
 class epw():
     """A class which represents an EnergyPlus weather (epw) file
@@ -12,128 +82,367 @@ class epw():
         """
         self.headers={}
         self.dataframe=pd.DataFrame()
+        self.line_terminator='\r\n'
+        self.decimals={}
             
     
-    def read(self,fp):
-        """Reads an epw file 
+    def read(self,fp,usecols=None,dtype=None):
+        """Reads an epw file in a single pass
         
         Arguments:
-            - fp (str): the file path of the epw file   
+            - fp (str or file-like): the file path of the epw file, or a text 
+              or binary file-like object (e.g. a Streamlit upload)
+            - usecols (list): the names of the climate data columns to read, 
+              all columns if None
+            - dtype (dict): the data types of the climate data columns, e.g. 
+              compact_dtypes; inferred if None
         
         """
         
-        self.headers=self._read_headers(fp)
-        self.dataframe=self._read_data(fp)
+        text=self._read_text(fp)
+        first_line_end=text.find('\n')
+        self.line_terminator='\r\n' if first_line_end>0 and text[first_line_end-1]=='\r' else '\n'
+        self.headers,first_row_offset=self._read_headers(text)
+        self.dataframe=self._read_data(text,first_row_offset,usecols,dtype)
+        self.decimals=self._read_decimals(text[first_row_offset:],self.dataframe)
                 
+    
+    def _read_text(self,fp):
+        """Reads the whole content of an epw file with one open
+        
+        Arguments:
+            - fp (str or file-like): the file path or file-like object
+            
+        Return value:
+            - text (str): the content of the file
+            
+        """
         
-    def _read_headers(self,fp):
+        if hasattr(fp,'read'):
+            if hasattr(fp,'seek'):
+                fp.seek(0)
+            text=fp.read()
+        else:
+            with open(fp,'rb') as f:
+                text=f.read()
+        return self._decode(text)
+    
+    
+    def _decode(self,text):
+        """Decodes the content of an epw file as UTF-8, or latin-1 where it is
+        not valid UTF-8
+        
+        Arguments:
+            - text (bytes or str): the content
+            
+        Return value:
+            - text (str): the decoded content
+            
+        """
+        
+        if isinstance(text,bytes):
+            try:
+                text=text.decode('utf-8')
+            except UnicodeDecodeError:
+                text=text.decode('latin-1')
+        return text
+        
+        
+    def _read_headers(self,text):
         """Reads the headers of an epw file
         
         Arguments:
-            - fp (str): the file path of the epw file   
+            - text (str): the content of the epw file
             
         Return value:
             - d (dict): a dictionary containing the header rows 
+            - offset (int): the position of the first row with climate data
             
         """
         
         d={}
-        with open(fp, newline='') as csvfile:
-            csvreader = csv.reader(csvfile, delimiter=',', quotechar='"')
-            for row in csvreader:
-                if row[0].isdigit():
+        offset=0
+        while offset<len(text):
+            end=text.find('\n',offset)
+            end=len(text) if end==-1 else end+1
+            line=text[offset:end]
+            if line[:1].isdigit():
+                break
+            row=self._header_row(line)
+            d[row[0]]=row[1:]
+            offset=end
+        return d,offset
+    
+    
+    def _header_row(self,line):
+        """Splits a header line of an epw file into its fields
+        
+        Arguments:
+            - line (str): the header line, with or without its line terminator
+            
+        Return value:
+            - row (list): the fields of the header line
+            
+        """
+        
+        return next(csv.reader([line.rstrip('\r\n')],delimiter=',',quotechar='"'),[''])
+    
+    
+    def read_years(self,fp,usecols=None,dtype=None,chunksize=8784):
+        """Reads a (multi-year) epw file in chunks, one calendar year at a time,
+        so no more than about one year of climate data is held in memory
+        
+        A new year starts where the month decreases (e.g. from December to 
+        January), so a typical year with months of different years is one year
+        
+        Arguments:
+            - fp (str or file-like): the file path of the epw file, or a 
+              seekable text or binary file-like object
+            - usecols (list): the names of the climate data columns to read, 
+              all columns if None; Year and Month are always read
+            - dtype (dict): the data types of the climate data columns
+            - chunksize (int): the number of rows read at once
+            
+        Return value:
+            - years (generator): (year, df) for every year of the file, with 
+              year the Year of its first row and df its climate data; the 
+              decimals of the columns are those of the rows read so far
+        
+        """
+        
+        f=fp if hasattr(fp,'read') else open(fp,'rb')
+        try:
+            f.seek(0)
+            self._read_header_lines(f)
+            self.decimals={}
+            if usecols is not None:
+                usecols=[name for name in column_names if name in usecols or name in ('Year','Month')]
+            
+            pending=None
+            while True:
+                lines=list(itertools.islice(f,chunksize))
+                if not lines:
                     break
-                else:
-                    d[row[0]]=row[1:]
-        return d
+                text=self._decode(lines[0][:0].join(lines))
+                chunk=self._read_data(text,0,usecols,dtype)
+                for name,decimals in self._read_decimals(text,chunk).items():
+                    self.decimals[name]=min(decimals,self.decimals.get(name,decimals))
+                
+                data=chunk if pending is None else pd.concat([pending,chunk])
+                month=data['Month'].to_numpy()
+                year_starts=np.flatnonzero(month[1:]<month[:-1])+1
+                begin=0
+                for year_start in year_starts:
+                    yield self._year(data.iloc[begin:year_start])
+                    begin=year_start
+                pending=data.iloc[begin:]
+            if pending is not None and len(pending):
+                yield self._year(pending)
+        finally:
+            if f is not fp:
+                f.close()
+    
+    
+    def _read_header_lines(self,f):
+        """Reads the headers of an epw file line by line and leaves the file 
+        at its first row with climate data
+        
+        Arguments:
+            - f (file-like): the seekable epw file, at its start
+        
+        """
+        
+        self.headers={}
+        position=f.tell()
+        line=f.readline()
+        if isinstance(line,bytes):
+            self.line_terminator='\r\n' if line.endswith(b'\r\n') else '\n'
+        else:
+            self.line_terminator='\r\n' if line.endswith('\r\n') else '\n'
+        while line and not line[:1].isdigit():
+            if isinstance(line,bytes):
+                try:
+                    line=line.decode('utf-8')
+                except UnicodeDecodeError:
+                    line=line.decode('latin-1')
+            row=self._header_row(line)
+            self.headers[row[0]]=row[1:]
+            position=f.tell()
+            line=f.readline()
+        f.seek(position)
+        
+    
+    def _year(self,data):
+        """The year of a chunk of climate data and the data with a new index
+        
+        Arguments:
+            - data (pd.DataFrame): the climate data of one year
+            
+        Return value:
+            - year (int): the Year of the first row
+            - df (pd.DataFrame): the climate data, indexed from 0
+            
+        """
+        
+        return int(data['Year'].iloc[0]),data.reset_index(drop=True)
     
     
-    def _read_data(self,fp):
+    def _read_data(self,text,offset,usecols=None,dtype=None):
         """Reads the climate data of an epw file
         
         Arguments:
-            - fp (str): the file path of the epw file   
+            - text (str): the content of the epw file
+            - offset (int): the position of the first row with climate data
+            - usecols (list): the names of the columns to read
+            - dtype (dict): the data types of the columns
             
         Return value:
             - df (pd.DataFrame): a DataFrame comtaining the climate data
             
         """
         
-        names=['Year',
-               'Month',
-               'Day',
-               'Hour',
-               'Minute',
-               'Data Source and Uncertainty Flags',
-               'Dry Bulb Temperature',
-               'Dew Point Temperature',
-               'Relative Humidity',
-               'Atmospheric Station Pressure',
-               'Extraterrestrial Horizontal Radiation',
-               'Extraterrestrial Direct Normal Radiation',
-               'Horizontal Infrared Radiation Intensity',
-               'Global Horizontal Radiation',
-               'Direct Normal Radiation',
-               'Diffuse Horizontal Radiation',
-               'Global Horizontal Illuminance',
-               'Direct Normal Illuminance',
-               'Diffuse Horizontal Illuminance',
-               'Zenith Luminance',
-               'Wind Direction',
-               'Wind Speed',
-               'Total Sky Cover',
-               'Opaque Sky Cover (used if Horizontal IR Intensity missing)',
-               'Visibility',
-               'Ceiling Height',
-               'Present Weather Observation',
-               'Present Weather Codes',
-               'Precipitable Water',
-               'Aerosol Optical Depth',
-               'Snow Depth',
-               'Days Since Last Snowfall',
-               'Albedo',
-               'Liquid Precipitation Depth',
-               'Liquid Precipitation Quantity']
-        
-        first_row=self._first_row_with_climate_data(fp)
-        df=pd.read_csv(fp,
-                       skiprows=first_row,
+        df=pd.read_csv(io.StringIO(text[offset:]),
                        header=None,
-                       names=names)
+                       names=column_names,
+                       usecols=usecols,
+                       dtype=dtype)
         return df
+    
+    
+    def _read_decimals(self,text,data):
+        """Finds the fewest decimals written for a value of every float 
+        column, so unchanged columns are written as they were read
         
-        
-    def _first_row_with_climate_data(self,fp):
-        """Finds the first row with the climate data of an epw file
+        Fields are located in the text at once: the field of every decimal 
+        point is the one ending at the next separator
         
         Arguments:
-            - fp (str): the file path of the epw file   
+            - text (str): the rows with climate data of an epw file
+            - data (pd.DataFrame): the climate data read from the rows
             
         Return value:
-            - i (int): the row number
+            - decimals (dict): the decimals of the float columns, or an empty
+              dictionary if the rows do not all have every column
             
         """
         
-        with open(fp, newline='') as csvfile:
-            csvreader = csv.reader(csvfile, delimiter=',', quotechar='"')
-            for i,row in enumerate(csvreader):
-                if row[0].isdigit():
-                    break
-        return i
+        columns=[name for name,column in data.items() if pd.api.types.is_float_dtype(column)]
+        if not columns or not text:
+            return {}
+        
+        content=np.frombuffer(text.encode('utf-8'),dtype=np.uint8)
+        if content[-1]!=ord('\n'):
+            content=np.append(content,np.uint8(ord('\n')))
+        separators=np.flatnonzero((content==ord(','))|(content==ord('\n')))
+        row_ends=np.flatnonzero(content[separators]==ord('\n'))
+        if not np.array_equal(row_ends,np.arange(len(column_names)-1,len(separators),len(column_names))):
+            return {}
+        
+        field_ends=separators-(content[separators-1]==ord('\r'))
+        points=np.flatnonzero(content==ord('.'))
+        fields=np.searchsorted(separators,points)
+        field_decimals=np.zeros(len(separators),dtype=np.int64)
+        field_decimals[fields]=field_ends[fields]-points-1
+        
+        return {name:int(field_decimals[column_names.index(name)::len(column_names)].min()) for name in columns}
         
         
     def write(self,fp):
-        """Writes an epw file 
+        """Writes an epw file, formatting whole columns at once and writing 
+        the file with a single call
         
         Arguments:
             - fp (str): the file path of the new epw file   
         
         """
         
-        with open(fp, 'w', newline='') as csvfile:
-            csvwriter = csv.writer(csvfile, delimiter=',',
-                                    quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            for k,v in self.headers.items():
-                csvwriter.writerow([k]+v)
-            for row in self.dataframe.itertuples(index= False):
-                csvwriter.writerow(i for i in row)
\ No newline at end of file
+        header_buffer=io.StringIO()
+        csvwriter=csv.writer(header_buffer, delimiter=',', quotechar='"',
+                             quoting=csv.QUOTE_MINIMAL, lineterminator=self.line_terminator)
+        for k,v in self.headers.items():
+            csvwriter.writerow([k]+v)
+        
+        #Climate data fields never contain commas or quotes, so rows are joined without quoting
+        columns=[self._format_column(name,column) for name,column in self.dataframe.items()]
+        rows=pc.binary_join_element_wise(*columns,',').to_pylist() if columns else []
+        body=''.join(row+self.line_terminator for row in rows)
+        
+        with open(fp, 'w', newline='') as f:
+            f.write(header_buffer.getvalue()+body)
+            
+            
+    def _format_column(self,name,column):
+        """Formats a climate data column as text, column-wise: every value 
+        gets the decimals of its column (as read, or the epw precision of the
+        column), or the fewest more decimals that represent it
+        
+        Arguments:
+            - name (str): the name of the column
+            - column (pd.Series): the values of the column
+            
+        Return value:
+            - text (pa.StringArray): the formatted values
+            
+        """
+        
+        if pd.api.types.is_integer_dtype(column):
+            return pa.array(column.to_numpy()).cast(pa.string())
+        if not pd.api.types.is_float_dtype(column):
+            return pa.array(column.to_numpy().astype(str))
+        
+        values=column.to_numpy()
+        wide=values.astype(np.float64)
+        finite=np.isfinite(wide)
+        decimals=np.full(len(values),self.decimals.get(name,column_decimals.get(name,1)))
+        
+        #Float artifacts such as 25.200000000000003 (or 25.2 in float32) are 
+        #represented by fewer decimals than written out in full
+        for _ in range(max_decimals):
+            scale=10.0**decimals
+            rounded=np.rint(wide*scale)/scale
+            if values.dtype==np.float32:
+                exact=rounded.astype(np.float32)==values
+            else:
+                exact=np.abs(rounded-wide)<=1e-9
+            needs_more=finite&~exact&(decimals<max_decimals)
+            if not needs_more.any():
+                break
+            decimals[needs_more]+=1
+        
+        #Values are written as their rounded digits with a decimal point inserted, 
+        #and values that need more than max_decimals as by %f
+        text=pa.nulls(len(values),pa.string())
+        if not finite.all():
+            text=pc.replace_with_mask(text,pa.array(~finite),pa.array(wide[~finite].astype(str)))
+        for value_decimals in np.unique(decimals[finite]):
+            selected=finite&(decimals==value_decimals)
+            if value_decimals==max_decimals:
+                formatted=pa.array(np.char.mod(f'%.{max_decimals}f',wide[selected]))
+            else:
+                formatted=self._format_decimals(wide[selected],int(value_decimals))
+            text=pc.replace_with_mask(text,pa.array(selected),formatted)
+        return text
+    
+    
+    def _format_decimals(self,values,decimals):
+        """Formats values with a fixed number of decimals, as %f for values 
+        represented by that number of decimals
+        
+        Arguments:
+            - values (np.ndarray): the float values
+            - decimals (int): the number of decimals
+            
+        Return value:
+            - text (pa.StringArray): the formatted values
+            
+        """
+        
+        scale=10**decimals
+        digits=pa.array(np.rint(np.abs(values)*scale).astype(np.int64)).cast(pa.string())
+        if decimals:
+            digits=pc.utf8_lpad(digits,decimals+1,'0')
+            digits=pc.binary_join_element_wise(pc.utf8_slice_codeunits(digits,0,-decimals),
+                                               pc.utf8_slice_codeunits(digits,-decimals),'.')
+        #The sign of a negative zero is kept, as by %f
+        sign=pa.array(np.where(np.signbit(values),'-',''))
+        return pc.binary_join_element_wise(sign,digits,'')
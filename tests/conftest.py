@@ -0,0 +1,96 @@
+import shutil
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+#The pages import the helper modules as the utils package, so do the tests
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'pages'))
+
+epw_headers = ['LOCATION,TEST CITY,-,CHE,Synthetic Data,066600,47.38,8.57,1.0,556.0',
+               'DESIGN CONDITIONS,0',
+               'TYPICAL/EXTREME PERIODS,0',
+               'GROUND TEMPERATURES,0',
+               'HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0',
+               'COMMENTS 1,"Synthetic hourly data, for tests"',
+               'COMMENTS 2,',
+               'DATA PERIODS,1,1,Data,Sunday, 1/ 1,12/31']
+
+
+#Hourly EPW data rows from start for the given number of hours, with a seasonal and daily temperature cycle
+def epw_rows(start, hours, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for hour in range(hours):
+        time = start + timedelta(hours=hour)
+        day_of_year = time.timetuple().tm_yday
+        temperature = round(10 - 10 * np.cos(2 * np.pi * (day_of_year - 15) / 365) + 5 * np.sin(2 * np.pi * time.hour / 24)
+                            + rng.normal(), 1)
+        rows.append(f'{time.year},{time.month},{time.day},{time.hour + 1},60,A7A7A7A7*0?9?9?9?9?9?9?9A7A7A7A7A7A7*0E8*0*0,'
+                    f'{temperature},{round(temperature - rng.uniform(0, 8), 1)},{int(rng.uniform(40, 100))},{int(rng.uniform(95000, 96000))},'
+                    f'{int(rng.uniform(0, 1300))},{int(rng.uniform(0, 1400))},{int(rng.uniform(250, 400))},{int(rng.uniform(0, 800))},0,0,'
+                    f'999999,999999,999999,999999,{int(rng.uniform(0, 360))},{round(rng.uniform(0, 12), 1)},{int(rng.uniform(0, 10))},'
+                    f'{int(rng.uniform(0, 10))},9999,77777,9,999999999,{int(rng.uniform(0, 300))},0.0920,0,88,0.160,{round(rng.uniform(0, 2), 1)},1.0')
+    return rows
+
+
+#Writes a synthetic EPW file of hourly data from start (a datetime) and returns its path
+@pytest.fixture
+def write_epw(tmp_path):
+    def write(name='weather.epw', start=datetime(2001, 1, 1), hours=8760, seed=0):
+        path = tmp_path / name
+        path.write_bytes(('\r\n'.join(epw_headers + epw_rows(start, hours, seed)) + '\r\n').encode())
+        return str(path)
+    return write
+
+
+#EnergyPlus hourly output (eplusout.csv) of the zones for an EPW file, following its dry bulb temperature
+def eplus_output(epw_path, zones, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = [line.split(',') for line in open(epw_path).read().splitlines()[len(epw_headers):]]
+    outdoor = np.array([float(row[6]) for row in rows])
+    columns = {'Date/Time': [f' {int(row[1]):02d}/{int(row[2]):02d}  {int(row[3]):02d}:00:00' for row in rows]}
+    for index, zone in enumerate(zones):
+        temperature = 24 + 0.5 * outdoor + index + rng.normal(0, 0.2, len(rows))
+        columns[f'{zone}:Zone Mean Air Temperature [C](Hourly)'] = temperature.round(3)
+        columns[f'{zone}:Zone Air Relative Humidity [%](Hourly)'] = rng.uniform(40, 70, len(rows)).round(3)
+        columns[f'{zone}:Zone Thermal Comfort Pierce Model Standard Effective Temperature [C](Hourly)'] = (temperature + 1).round(3)
+        columns[f'{zone}:Zone Thermal Comfort Fanger Model PMV [](Hourly)'] = ((temperature - 24) / 4).round(3)
+        columns[f'{zone}:Zone Thermal Comfort Mean Radiant Temperature [C](Hourly)'] = (temperature + 0.5).round(3)
+    return pd.DataFrame(columns)
+
+
+#Writes the simulation folder <building>/<weather> of a synthetic EPW file and its EnergyPlus output, returns the folder
+#(the building file is empty, see synthetic_buildings)
+@pytest.fixture
+def write_simulation(tmp_path, write_epw):
+    def write(building, weather, zones=('ZONE1',), start=datetime(2001, 1, 1), hours=8760, seed=0):
+        simulation_folder = tmp_path / 'runs' / building / weather
+        simulation_folder.mkdir(parents=True, exist_ok=True)
+        epw_path = write_epw(f'{weather}.epw', start, hours, seed)
+        shutil.copy(epw_path, simulation_folder / 'weather.epw')
+        (simulation_folder / 'in.idf').write_text('')
+        eplus_output(epw_path, zones, seed).to_csv(simulation_folder / 'eplusout.csv', index=False)
+        return str(simulation_folder)
+    return write
+
+
+#Building files are only read for their inhabited zones, which the synthetic simulations name
+@pytest.fixture
+def synthetic_buildings(monkeypatch, tmp_path):
+    from utils import app_postprocessing
+
+    class FakeIDF:
+        def __init__(self, path):
+            self.path = path
+
+        @staticmethod
+        def setiddname(iddfile):
+            pass
+
+    monkeypatch.setattr(app_postprocessing, 'IDF', FakeIDF)
+    monkeypatch.setattr(app_postprocessing, 'inhabited_zones', lambda idf: ['ZONE1', 'ZONE2'])
+    #Keep the weather and survivability caches (Output/cache) out of the working directory
+    monkeypatch.chdir(tmp_path)
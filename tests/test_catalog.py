@@ -0,0 +1,70 @@
+import os
+import pytest
+
+pytest.importorskip('utils')
+from utils.app_catalog import collect_garbage, list_runs, record_run
+from utils.app_compaction import compact_runs
+from utils.app_workspace import run_workspace, write_manifest, mark_open
+
+
+#Catalogue a completed run whose simulation folder holds an eplusout.csv and an eplusout.eso of the given sizes
+def make_run(output_folder, run_id, created, size=1000):
+    workspace = run_workspace(output_folder, run_id)
+    simulation_folder = os.path.join(workspace, 'building', 'weather')
+    os.makedirs(simulation_folder)
+    for file_name in ('eplusout.csv', 'eplusout.eso'):
+        with open(os.path.join(simulation_folder, file_name), 'wb') as f:
+            f.write(b'0' * size)
+    manifest = {'run_id': run_id, 'created': created, 'workspace': workspace, 'data_path': os.path.join(workspace, 'data'),
+                'building_names': [], 'building_folders': [], 'weather_folders': [], 'simulation_folders': [simulation_folder]}
+    write_manifest(workspace, manifest)
+    record_run(manifest, output_folder)
+    return workspace
+
+
+@pytest.fixture
+def output_folder(tmp_path):
+    output_folder = str(tmp_path / 'Output')
+    for index in range(3):
+        make_run(output_folder, f'run{index}', f'2020-01-0{index + 1}T00:00:00')
+    return output_folder
+
+
+def test_collect_garbage_removes_the_oldest_runs_beyond_the_size(output_folder):
+    result = collect_garbage(output_folder, max_size_bytes=5000)
+
+    assert result['removed'] == ['run0']
+    assert result['freed_bytes'] == os.path.getsize(os.path.join(run_workspace(output_folder, 'run1'), 'run.json')) + 2000
+    assert [run['run_id'] for run in list_runs(output_folder)] == ['run2', 'run1']
+
+
+def test_collect_garbage_keeps_runs_open_in_a_session(output_folder):
+    mark_open(run_workspace(output_folder, 'run0'))
+
+    result = collect_garbage(output_folder, max_age_days=1)
+
+    assert result['removed'] == ['run1', 'run2']
+    assert os.path.isdir(run_workspace(output_folder, 'run0'))
+
+
+def test_collect_garbage_does_not_count_missing_workspaces(output_folder, tmp_path, monkeypatch):
+    os.rename(run_workspace(output_folder, 'run0'), tmp_path / 'moved')
+    #Workspaces are found relative to the output folder, not to the working directory
+    monkeypatch.chdir(tmp_path)
+
+    result = collect_garbage(output_folder, max_age_days=1, keep=['run2'])
+
+    assert result['removed'] == ['run1']
+    assert result['missing'] == ['run0']
+    assert result['freed_bytes'] > 2000 and result['freed_bytes'] < 3000
+    assert [run['run_id'] for run in list_runs(output_folder)] == ['run2', 'run0']
+
+
+def test_compact_runs_deletes_artifacts_once(output_folder):
+    result = compact_runs(output_folder, max_age_days=1, keep=['run2'])
+
+    assert result['compacted'] == ['run0', 'run1']
+    assert result['deleted_files'] == 2 and result['freed_bytes'] == 2000
+    simulation_folder = os.path.join(run_workspace(output_folder, 'run0'), 'building', 'weather')
+    assert sorted(os.listdir(simulation_folder)) == ['eplusout.csv']
+    assert compact_runs(output_folder, max_age_days=1)['compacted'] == ['run2']
@@ -0,0 +1,60 @@
+import io
+from datetime import datetime
+import pytest
+
+pytest.importorskip('utils')
+from utils.epw import epw, compact_dtypes
+
+
+#Replaces the Visibility (9999) of the first row with a decimal value, as in files of mixed sources
+def with_visibility(path, visibility):
+    content = open(path, 'rb').read()
+    content = content.replace(b',9999,', f',{visibility},'.encode(), 1)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return content
+
+
+@pytest.mark.parametrize('dtype', [None, compact_dtypes])
+def test_unchanged_file_round_trips_byte_identical(write_epw, tmp_path, dtype):
+    path = write_epw()
+    content = with_visibility(path, 16.1)
+
+    file = epw()
+    file.read(path, dtype=dtype)
+    file.write(str(tmp_path / 'written.epw'))
+
+    assert file.decimals['Visibility'] == 0
+    assert (tmp_path / 'written.epw').read_bytes() == content
+
+
+def test_changed_values_get_the_decimals_they_need(write_epw, tmp_path):
+    path = write_epw(hours=48)
+    with_visibility(path, 16.1)
+    file = epw()
+    file.read(path)
+    file.dataframe['Dry Bulb Temperature'] = file.dataframe['Dry Bulb Temperature'] + 0.25
+    file.dataframe.loc[0, 'Wind Speed'] = 1 / 3
+    file.write(str(tmp_path / 'written.epw'))
+
+    written = epw()
+    written.read(str(tmp_path / 'written.epw'))
+    rows = (tmp_path / 'written.epw').read_text().splitlines()[8:]
+    assert written.dataframe['Dry Bulb Temperature'].tolist() == pytest.approx(file.dataframe['Dry Bulb Temperature'].tolist())
+    assert rows[0].split(',')[21] == '0.333333'
+    assert rows[0].split(',')[24] == '16.1'
+    assert rows[1].split(',')[24] == '9999'
+    assert {row.split(',')[29] for row in rows} == {'0.0920'}
+
+
+def test_read_years_keeps_the_decimals_of_the_file(write_epw):
+    path = write_epw(start=datetime(2001, 1, 1), hours=8760 + 48)
+    with_visibility(path, 16.1)
+    file = epw()
+    file.read(path)
+
+    years = epw()
+    data = [year for year, _ in years.read_years(io.BytesIO(open(path, 'rb').read()))]
+
+    assert data == [2001, 2002]
+    assert years.decimals == file.decimals
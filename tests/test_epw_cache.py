@@ -0,0 +1,78 @@
+import os
+import threading
+import pytest
+
+pytest.importorskip('utils')
+from utils import app_epw_cache
+from utils.app_epw_cache import derived_value, prune_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_epw_cache, 'epw_cache_folder', str(tmp_path / 'cache'))
+    monkeypatch.setattr(app_epw_cache, '_parsed', app_epw_cache.OrderedDict())
+    monkeypatch.setattr(app_epw_cache, '_derived', {})
+    monkeypatch.setattr(app_epw_cache, '_path_hashes', {})
+    return tmp_path / 'cache'
+
+
+def test_derived_values_of_different_files_are_computed_in_parallel(write_epw):
+    paths = [write_epw('a.epw', hours=48, seed=1), write_epw('b.epw', hours=48, seed=2)]
+    started = threading.Event()
+    release = threading.Event()
+
+    #The first computation waits until the second one has finished, which deadlocks if they run one after the other
+    def slow(file):
+        started.set()
+        assert release.wait(10)
+        return 1
+
+    thread = threading.Thread(target=derived_value, args=(paths[0], 'value', slow))
+    thread.start()
+    assert started.wait(10)
+    assert derived_value(paths[1], 'value', lambda file: 2) == 2
+    release.set()
+    thread.join()
+
+    assert derived_value(paths[0], 'value', lambda file: 3) == 1
+
+
+def test_derived_values_are_computed_again_for_a_new_version(write_epw):
+    path = write_epw(hours=48)
+    assert derived_value(path, 'value', lambda file: 1) == 1
+    assert derived_value(path, 'value', lambda file: 2) == 1
+    assert derived_value(path, 'value', lambda file: 2, version=2) == 2
+
+
+def test_unchanged_files_are_not_read_again(write_epw, monkeypatch):
+    path = write_epw(hours=48)
+    reads = []
+    read_input = app_epw_cache.read_input
+    monkeypatch.setattr(app_epw_cache, 'read_input', lambda source: reads.append(source) or read_input(source))
+
+    assert derived_value(path, 'value', lambda file: len(file.dataframe)) == 48
+    assert len(reads) == 2
+    assert derived_value(path, 'value', lambda file: 0) == 48
+    assert derived_value(path, 'other', lambda file: 1) == 1
+    assert len(reads) == 2
+
+    write_epw(hours=72)
+    assert derived_value(path, 'value', lambda file: len(file.dataframe)) == 72
+    assert len(reads) == 4
+
+
+def test_the_locks_do_not_grow_with_the_number_of_files(write_epw):
+    for seed in range(3):
+        derived_value(write_epw(f'{seed}.epw', hours=24, seed=seed), 'value', lambda file: seed)
+    assert len(app_epw_cache._key_locks) == app_epw_cache.lock_stripes
+
+
+def test_prune_cache_removes_the_least_recently_used_files(cache_folder):
+    cache_folder.mkdir()
+    for index, name in enumerate(['old.parquet', 'new.parquet', 'new.json']):
+        (cache_folder / name).write_bytes(b'0' * 100)
+        os.utime(cache_folder / name, (index, index))
+
+    assert prune_cache(250) == {'removed_files': 1, 'freed_bytes': 100}
+    assert sorted(os.listdir(cache_folder)) == ['new.json', 'new.parquet']
+    assert prune_cache(250) == {'removed_files': 0, 'freed_bytes': 0}
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip('utils')
+from utils.app_fidelity import fidelity_report
+from utils.app_postprocessing import save_summary
+
+
+#Manifest of a run whose summary table (in its data folder) has the given rows
+def run(tmp_path, run_id, fidelity, seconds, rows):
+    data_path = tmp_path / run_id
+    data_path.mkdir()
+    save_summary(rows, data_path / 'summary.parquet')
+    return {'run_id': run_id, 'data_path': str(data_path), 'settings': {'fidelity': fidelity},
+            'timings': {'preprocess': seconds / 4, 'simulation': seconds * 3 / 4, 'postprocess': 100.0}}
+
+
+#Rows of one building, two zones and one weather scenario; the annual statistics are not compared
+def summary_rows(week_degree_hours, peak, light_hours):
+    rows = [('B1', 'Z1', 'hot', 'Temperature', '', 'Annual Degree hours', 1000.0),
+            ('B1', 'Z1', 'hot', 'Humidex', '', 'Peak', peak),
+            ('B1', 'Z1', 'hot', 'Activity hours', 'Elderly (over 65 years)', 'Light physical activities', light_hours)]
+    return rows + [('B1', zone, 'hot', 'Temperature', '', 'Maximum Week Degree hours', value)
+                   for zone, value in zip(('Z1', 'Z2'), week_degree_hours)]
+
+
+def test_fidelity_report_compares_the_hottest_week_results_and_runtimes(tmp_path):
+    reference = run(tmp_path, 'full', 'full', 100.0, summary_rows([10.0, 20.0], 40.0, 5.0))
+    candidate = run(tmp_path, 'fast', 'screening', 40.0, summary_rows([12.0, 17.0], 40.5, 5.0))
+
+    report = fidelity_report(reference, candidate)
+
+    assert report['reference'] == {'run_id': 'full', 'fidelity': 'full', 'seconds': 100.0}
+    assert report['candidate'] == {'run_id': 'fast', 'fidelity': 'screening', 'seconds': 40.0}
+    assert report['saved_seconds'] == 60.0
+    assert report['saved_fraction'] == 0.6
+    errors = {(error['Metric'], error['Age group'], error['Statistic']): error for error in report['errors']}
+    assert set(errors) == {('Temperature', '', 'Maximum Week Degree hours'), ('Humidex', '', 'Peak'),
+                           ('Activity hours', 'Elderly (over 65 years)', 'Light physical activities')}
+    assert errors['Temperature', '', 'Maximum Week Degree hours'] == {
+        'Metric': 'Temperature', 'Age group': '', 'Statistic': 'Maximum Week Degree hours', 'Mean Reference': 15.0,
+        'Mean Error': -0.5, 'Mean Absolute Error': 2.5, 'Maximum Absolute Error': 3.0}
+    assert errors['Humidex', '', 'Peak']['Mean Error'] == 0.5
+    assert errors['Activity hours', 'Elderly (over 65 years)', 'Light physical activities']['Maximum Absolute Error'] == 0.0
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('utils')
+from utils.app_epw_cache import read_epw
+from utils.app_heatwave_creation import relative_humidity, stochastic_heatwave_data
+
+
+#Keep the parsed file cache (Output/cache/epw) out of the working directory
+@pytest.fixture(autouse=True)
+def output_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_relative_humidity_of_saturated_and_drier_air():
+    np.testing.assert_allclose(relative_humidity(np.array([20.0, 30.0]), np.array([20.0, 30.0])), [100, 100])
+    assert relative_humidity(np.array([30.0]), np.array([20.0]))[0] == pytest.approx(55.1, abs=0.1)
+
+
+def test_stochastic_heatwave_humidity_follows_the_warmed_temperatures(write_epw):
+    epw_data = read_epw(write_epw(hours=24 * 30)).dataframe
+    start_index = 24 * 10
+
+    heatwave_data = stochastic_heatwave_data(epw_data, start_index, [20, 21, 22], 3.0)
+
+    hours = slice(start_index, start_index + 3 * 24)
+    source_hours = slice(20 * 24, 23 * 24)
+    dry_bulb = heatwave_data['Dry Bulb Temperature'].to_numpy()[hours]
+    dew_point = heatwave_data['Dew Point Temperature'].to_numpy()[hours]
+    np.testing.assert_allclose(dry_bulb, epw_data['Dry Bulb Temperature'].to_numpy()[source_hours] + 3.0)
+    assert (dew_point <= dry_bulb).all()
+    np.testing.assert_allclose(heatwave_data['Relative Humidity'].to_numpy()[hours], relative_humidity(dry_bulb, dew_point), atol=0.5)
+
+    #Hours outside the heatwave keep the humidity of the file
+    outside = np.r_[0:start_index, start_index + 3 * 24:len(epw_data)]
+    np.testing.assert_array_equal(heatwave_data['Relative Humidity'].to_numpy()[outside], epw_data['Relative Humidity'].to_numpy()[outside])
@@ -0,0 +1,43 @@
+import io
+import os
+import pytest
+
+pytest.importorskip('utils')
+from utils import app_ingest
+from utils.app_ingest import scan_server_directory, validate_input, validate_inputs
+
+
+def test_version_object_is_found_across_blocks(monkeypatch):
+    monkeypatch.setattr(app_ingest, 'validation_chunk_size', 16)
+    content = b'! Model\n' + b'  Building,\n' * 10 + b'  Version,23.1;\n'
+
+    assert validate_input('model.idf', io.BytesIO(content)) is None
+    assert validate_input('model.idf', io.BytesIO(content.replace(b'Version', b'Versions'))) is not None
+    #A Version at the end of a line longer than a block does not start a line
+    assert validate_input('model.idf', io.BytesIO(b'x' * 40 + b' Version,23.1;\n')) is not None
+
+
+def test_weather_files_need_a_location_header(write_epw):
+    assert validate_input('weather.epw', write_epw(hours=24)) is None
+    assert validate_input('weather.epw', io.BytesIO(b'DESIGN CONDITIONS,0\n')) == 'weather.epw: not an EPW file (no LOCATION header)'
+
+
+def test_duplicate_file_names_are_reported(write_epw):
+    path = write_epw(hours=24)
+    errors = validate_inputs([], [('a.epw', path), ('a.epw', path), ('b.epw', path)])
+    assert errors == ['Duplicate weather file names: a']
+
+
+def test_server_directories_are_restricted_to_the_input_root(write_epw, tmp_path):
+    root = tmp_path / 'Input'
+    (root / 'project').mkdir(parents=True)
+    inside = root / 'project' / 'inside.epw'
+    inside.write_bytes(open(write_epw(hours=24), 'rb').read())
+    os.symlink(write_epw('outside.epw', hours=24), root / 'project' / 'linked.epw')
+
+    buildings, weathers = scan_server_directory('project', str(root))
+    assert buildings == [] and weathers == [('inside.epw', str(inside))]
+    with pytest.raises(ValueError, match='not inside the input directory'):
+        scan_server_directory('..', str(root))
+    with pytest.raises(ValueError, match='not inside the input directory'):
+        scan_server_directory(str(tmp_path), str(root))
@@ -0,0 +1,98 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('utils')
+from utils.app_data_access import read_dh_eh, read_hottest_data, read_summary, read_summer_differences
+from utils.app_postprocessing import (calculate_dh_eh, identify_activity_hours, postprocess, read_summary_table, save_summary,
+                                      summary_columns)
+from utils.app_results import BuildingResults
+from utils.app_stores import close_stores
+from utils.app_survivability import curve_files, survivability_data_path
+
+
+#Hourly series of one year at 20 °C with the given hours at 22 °C
+def series_with_hot_hours(hours):
+    data = np.full(8760, 20.0)
+    data[hours] = 22.0
+    return data
+
+
+def test_dh_eh_of_a_hot_day():
+    assert calculate_dh_eh(series_with_hot_hours(np.arange(4000, 4024)), 20) == (48.0, 24, 48.0, 24)
+
+
+def test_dh_eh_maximum_week_wraps_around_the_year():
+    assert calculate_dh_eh(series_with_hot_hours(np.r_[0:12, 8748:8760]), 20)[2:] == (48.0, 24)
+
+
+def test_dh_eh_of_stored_results_match_float64():
+    data = np.full(8760, 26.0)
+    data[::7] = 26.1
+    results = BuildingResults(['Temperature'], ['Zone'], ['weather'], 8760)
+    results.set('Temperature', 'Zone', 'weather', data)
+
+    assert calculate_dh_eh(results.get('Temperature', 'Zone', 'weather'), 26.1) == calculate_dh_eh(data, 26.1)
+    assert calculate_dh_eh(results.get('Temperature', 'Zone', 'weather'), 26.1)[1] == 0
+
+
+#Hours at the limit of light physical activities of young adults (36.3 °C at 50% relative humidity in the source data,
+#slightly above 36.3 as a float64) are classified as with the values of the source data
+def test_activity_hours_use_the_precision_of_the_limit_curves(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    curve = pd.read_csv(os.path.join(survivability_data_path, curve_files['light'].format('Young_adult')))
+    limit = curve.loc[curve['rh'] == 50, 'Tair'].iloc[0]
+
+    assert limit > 36.3
+
+    young, _ = identify_activity_hours([36.3, limit, 36.4], [50, 50, 50])
+    assert young == [1, 2, 0, 0]
+
+
+summary_rows = [('B1', 'Z1', 'w1', 'Temperature', '', 'Threshold', 26.0),
+                ('B1', 'Z1', 'w1', 'Activity hours', 'Young (18-40 years)', 'Light physical activities', 5.0),
+                ('B1', 'Z1', 'w1', 'Activity hours', 'Elderly (over 65 years)', 'Light physical activities', 7.0)]
+
+
+def test_activity_hours_keep_their_age_group_apart_from_the_metric(tmp_path):
+    save_summary(summary_rows, tmp_path / 'summary.parquet')
+    summary = read_summary_table(tmp_path / 'summary.parquet')
+
+    assert list(summary.columns) == summary_columns
+    activity_hours = summary[summary['Metric'] == 'Activity hours']
+    assert dict(zip(activity_hours['Age group'], activity_hours['Value'])) == {'Young (18-40 years)': 5.0, 'Elderly (over 65 years)': 7.0}
+
+
+def test_summaries_with_the_age_group_as_metric_are_converted(tmp_path):
+    save_summary(summary_rows, tmp_path / 'summary.parquet')
+    legacy = pd.DataFrame([row[:3] + (row[4] or row[3],) + row[5:] for row in summary_rows],
+                          columns=[column for column in summary_columns if column != 'Age group'])
+    legacy.to_parquet(tmp_path / 'legacy.parquet', index=False)
+
+    converted = read_summary_table(tmp_path / 'legacy.parquet')
+    expected = read_summary_table(tmp_path / 'summary.parquet')
+    pd.testing.assert_frame_equal(converted.astype(str), expected.astype(str))
+
+
+def test_postprocess_writes_the_data_files_of_the_results_page(write_simulation, synthetic_buildings, tmp_path):
+    weathers = ['base', 'hot']
+    simulation_folders = [write_simulation('B1', weather, zones=('ZONE1', 'ZONE2'), seed=seed) for seed, weather in enumerate(weathers)]
+    data_path = str(tmp_path / 'data')
+    thresholds = {'Humidex': 35, 'SET': 30, 'Temperature': 30, 'PMV': 1.5, 'WBGT': 23}
+
+    zones = postprocess(simulation_folders, [str(tmp_path / 'runs' / 'B1')], weathers, 'base', [6, 7, 8], thresholds, data_path)
+
+    assert zones == {'B1': ['ZONE1', 'ZONE2']}
+    summary = read_summary(data_path)
+    assert set(summary.index.get_level_values('Weather')) == set(weathers)
+    assert summary.xs(('B1', 'ZONE1', 'hot', 'Temperature', '', 'Threshold')) == 30
+    activity_hours = summary.xs(('B1', 'ZONE2', 'base', 'Activity hours', 'Young (18-40 years)'))
+    assert activity_hours.sum() == 7 * 16
+
+    temperature = pd.read_csv(simulation_folders[1] + '/eplusout.csv')['ZONE1:Zone Mean Air Temperature [C](Hourly)'].to_numpy()
+    assert read_dh_eh(data_path, 'B1', 'hot', 'Temperature', 'ZONE1', 30) == calculate_dh_eh(temperature, 30)
+    assert summary.xs(('B1', 'ZONE1', 'hot', 'Temperature', '', 'Annual Degree hours')) == calculate_dh_eh(temperature, 30)[0]
+    assert len(read_hottest_data(data_path, 'B1', 'hot', 'Temperature', 'ZONE1')) == 3 * 7 * 24
+    assert len(read_summer_differences(data_path, 'B1', 'hot', 'base', 'Temperature', 'ZONE1', (6, 7, 8))) == 92 * 24
+    close_stores(data_path)
@@ -0,0 +1,94 @@
+import os
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip('utils')
+from utils import app_BEM
+from utils.app_BEM import BEM_simulation, simulation_fidelity
+from utils.app_preprocessing import apply_fidelity, define_output, output_keys
+
+
+#The objects of a building file as eppy exposes them, for the functions that only read and set fields
+class FakeIDF:
+    def __init__(self, **idfobjects):
+        self.idfobjects = {object_type: list(objects) for object_type, objects in idfobjects.items()}
+
+    #Object types in the order of the file, as eppy lists them
+    @property
+    def model(self):
+        return SimpleNamespace(dtls=list(self.idfobjects))
+
+    def newidfobject(self, object_type, **fields):
+        self.idfobjects.setdefault(object_type, []).append(SimpleNamespace(key=object_type, **fields))
+
+    def popidfobject(self, object_type, index):
+        return self.idfobjects[object_type].pop(index)
+
+
+def zone(name):
+    return SimpleNamespace(key='ZONE', Name=name)
+
+
+def people(name, zone_name):
+    return SimpleNamespace(key='PEOPLE', Name=name, Zone_or_ZoneList_or_Space_or_SpaceList_Name=zone_name)
+
+
+def building(timesteps):
+    return FakeIDF(TIMESTEP=[SimpleNamespace(Number_of_Timesteps_per_Hour=timesteps)],
+                   BUILDING=[SimpleNamespace(Maximum_Number_of_Warmup_Days=25, Minimum_Number_of_Warmup_Days=6,
+                                             Loads_Convergence_Tolerance_Value=0.04, Temperature_Convergence_Tolerance_Value=0.4)],
+                   SHADOWCALCULATION=[])
+
+
+@pytest.mark.parametrize('timesteps, expected', [(6, 2), (1, 1), ('', 2)])
+def test_screening_never_raises_the_timesteps(timesteps, expected):
+    idf_file = building(timesteps)
+    apply_fidelity(idf_file, 'screening')
+
+    assert idf_file.idfobjects['TIMESTEP'][0].Number_of_Timesteps_per_Hour == expected
+    assert idf_file.idfobjects['BUILDING'][0].Maximum_Number_of_Warmup_Days == 10
+    assert idf_file.idfobjects['SHADOWCALCULATION'][0].Shading_Calculation_Update_Frequency == 60
+
+
+def test_full_fidelity_keeps_the_building_file():
+    idf_file = building(6)
+    apply_fidelity(idf_file, 'full')
+    assert idf_file.idfobjects['TIMESTEP'][0].Number_of_Timesteps_per_Hour == 6
+    assert idf_file.idfobjects['SHADOWCALCULATION'] == []
+
+
+def test_output_keys_of_inhabited_zones():
+    idf_file = FakeIDF(ZONE=[zone('Living'), zone('Attic'), zone('Bedroom')],
+                       PEOPLE=[people('Living People', 'LIVING'), people('Bedroom People', 'Bedroom')])
+    assert output_keys(idf_file) == {'zone': ['LIVING', 'BEDROOM'], 'people': ['*']}
+
+
+def test_output_keys_use_a_wildcard_where_all_zones_are_inhabited():
+    assert output_keys(FakeIDF(ZONE=[zone('Living')], PEOPLE=[people('Living People', 'Living')])) == {'zone': ['*'], 'people': ['*']}
+
+
+def test_no_zone_outputs_without_inhabited_zones():
+    idf_file = FakeIDF(ZONE=[zone('Attic'), zone('Garage')], PEOPLE=[people('Garden People', 'Garden')])
+    idf_file.newidfobject('OUTPUT:VARIABLE', Key_Value='*', Variable_Name='Zone Mean Air Temperature', Reporting_Frequency='Hourly')
+
+    assert output_keys(idf_file) == {'zone': [], 'people': []}
+    define_output(idf_file)
+    assert idf_file.idfobjects['OUTPUT:VARIABLE'] == []
+
+
+def test_simulations_are_reused_only_with_the_same_fidelity(tmp_path, monkeypatch):
+    simulated = []
+    def run(arguments):
+        simulated.append(arguments[2])
+        open(os.path.join(arguments[2], 'eplusout.csv'), 'w').close()
+        return SimpleNamespace(returncode=0)
+    monkeypatch.setattr(app_BEM.subprocess, 'run', run)
+    folders = [str(tmp_path / name) for name in ('a', 'b')]
+    for folder in folders:
+        os.makedirs(folder)
+
+    assert BEM_simulation(folders, fidelity='screening') == {folder: 0 for folder in folders}
+    assert [simulation_fidelity(folder) for folder in folders] == ['screening', 'screening']
+    assert BEM_simulation(folders, fidelity='screening') == {folder: None for folder in folders}
+    assert BEM_simulation(folders) == {folder: 0 for folder in folders}
+    assert simulation_fidelity(folders[0]) == 'full' and len(simulated) == 4
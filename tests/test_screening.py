@@ -0,0 +1,53 @@
+import shutil
+import pytest
+
+pytest.importorskip('utils')
+from utils.app_screening import screen_weathers
+
+
+#Keep the parsed file cache (Output/cache/epw) out of the working directory
+@pytest.fixture(autouse=True)
+def output_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+#Weather scenarios (file name, path) of copies of the same synthetic file
+def copies(write_epw, tmp_path, names):
+    path = write_epw('source.epw', hours=24 * 14)
+    weathers = []
+    for index, name in enumerate(names):
+        (tmp_path / str(index)).mkdir()
+        weathers.append((name, shutil.copy(path, tmp_path / str(index) / name)))
+    return weathers
+
+
+def test_duplicate_of_the_baseline_ranked_above_it_is_skipped(write_epw, tmp_path):
+    weathers = copies(write_epw, tmp_path, ['copy.epw', 'base.epw'])
+    weathers.append(('other.epw', write_epw('other.epw', hours=24 * 14, seed=1)))
+
+    selected, table = screen_weathers(weathers, 20, baseline='base', workers=1)
+
+    decisions = dict(zip(table['Weather'], table['Decision']))
+    assert decisions == {'copy': 'Skip (duplicate)', 'base': 'Simulate (baseline)', 'other': 'Simulate'}
+    assert selected == weathers[1:]
+
+
+def test_decisions_follow_the_scenario_not_its_file_name(write_epw, tmp_path):
+    weathers = copies(write_epw, tmp_path, ['hot.epw', 'hot.epw'])
+
+    selected, table = screen_weathers(weathers, 20, workers=1)
+
+    assert list(table['Decision']) == ['Simulate', 'Skip (duplicate)']
+    assert selected == weathers[:1]
+
+
+def test_scenarios_below_the_severity_are_skipped(write_epw):
+    weathers = [(f'{seed}.epw', write_epw(f'{seed}.epw', hours=24 * 14, seed=seed)) for seed in range(3)]
+
+    _, table = screen_weathers(weathers, 20, metric='Maximum Temperature', workers=1)
+    threshold = table['Maximum Temperature'].iloc[1]
+    selected, table = screen_weathers(weathers, 20, metric='Maximum Temperature', min_severity=threshold, workers=1)
+
+    assert list(table['Rank']) == [1, 2, 3]
+    assert list(table['Decision']) == ['Simulate', 'Simulate', 'Skip (below severity)']
+    assert [name for name, _ in selected] == sorted(table['Weather'].iloc[:2] + '.epw')
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('utils')
+from utils.app_catalog import list_runs
+from utils.app_data_access import read_summary
+from utils.app_postprocessing import postprocess
+from utils.app_stores import close_stores
+from utils.app_surrogate import add_screening_scenarios, fit, output_rows, screening_suffix
+from utils.app_workspace import read_manifest
+
+
+def weather_hours(start, hours):
+    times = pd.date_range(start, periods=hours, freq='h')
+    return pd.DataFrame({'Month': times.month, 'Day': times.day, 'Hour': times.hour + 1})
+
+
+def test_output_rows_follow_the_run_period():
+    epw_data = weather_hours('2001-01-01', 8760)
+    rows = output_rows(epw_data, [' 06/01  01:00:00', ' 06/01  02:00:00', ' 12/31  24:00:00', ' 01/01  01:00:00'])
+    assert rows.tolist() == [151 * 24, 151 * 24 + 1, 8759, 0]
+
+
+def test_output_rows_without_weather_data_raise():
+    epw_data = weather_hours('2001-01-01', 8760)
+    with pytest.raises(ValueError, match='no hour for 2 of 3 output time stamps, e.g. 02/29  01:00:00'):
+        output_rows(epw_data, [' 02/28  24:00:00', ' 02/29  01:00:00', ' 02/29  02:00:00'])
+
+
+def test_fit_skips_hours_with_missing_features_or_outputs():
+    rng = np.random.default_rng(0)
+    features = np.column_stack([rng.normal(size=100), np.ones(100)])
+    targets = features @ np.array([[2.0], [1.0]])
+    features[3, 0] = np.nan
+    targets[5, 0] = np.inf
+
+    np.testing.assert_allclose(fit(features, targets), [[2.0], [1.0]])
+
+
+def test_screening_scenarios_are_predicted_and_postprocessed(write_simulation, write_epw, synthetic_buildings, tmp_path):
+    weathers = ['base', 'hot']
+    simulation_folders = [write_simulation('B1', weather, zones=('ZONE1', 'ZONE2'), seed=seed) for seed, weather in enumerate(weathers)]
+    building_folders = [str(tmp_path / 'runs' / 'B1')]
+    data_path = str(tmp_path / 'data')
+    settings = {'baseline': 'base', 'summer_months': [6, 7, 8],
+                'metrics_thresholds': {'Humidex': 35, 'SET': 30, 'Temperature': 30, 'PMV': 1.5, 'WBGT': 23}}
+    zones = postprocess(simulation_folders, building_folders, weathers, settings['baseline'], settings['summer_months'],
+                        settings['metrics_thresholds'], data_path)
+    manifest = {'run_id': 'run', 'created': '2001-01-01T00:00:00', 'workspace': str(tmp_path), 'building_names': ['B1'],
+                'building_folders': building_folders, 'weather_folders': weathers, 'simulation_folders': simulation_folders,
+                'zones': zones, 'settings': settings, 'data_path': data_path, 'timings': {}}
+
+    manifest = add_screening_scenarios(manifest, [('new.epw', write_epw('new.epw', seed=2))], str(tmp_path / 'Output'))
+
+    assert manifest['weather_folders'] == ['base', 'hot', 'new' + screening_suffix]
+    assert manifest['surrogate']['weathers'] == ['new' + screening_suffix]
+    assert set(manifest['surrogate']['validation']['B1']) == {'method', 'rmse', 'mae'}
+    assert read_manifest(str(tmp_path)) == manifest
+    assert [run['run_id'] for run in list_runs(str(tmp_path / 'Output'))] == ['run']
+    predicted = pd.read_csv(tmp_path / 'runs' / 'B1' / ('new' + screening_suffix) / 'eplusout.csv')
+    assert len(predicted) == 8760 and predicted.notna().all().all()
+    summary = read_summary(data_path)
+    assert set(summary.index.get_level_values('Weather')) == set(manifest['weather_folders'])
+    assert set(summary.xs('new' + screening_suffix, level='Weather').index.get_level_values('Zone')) == {'ZONE1', 'ZONE2'}
+    close_stores(data_path)
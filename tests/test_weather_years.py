@@ -0,0 +1,85 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('utils')
+from utils import app_weather_years
+from utils.app_heatwave_creation import hottest_week_index
+from utils.app_weather_years import scan_years, export_years, hottest_year
+from utils.epw import epw
+
+
+def test_hottest_week_index_matches_a_loop_over_day_starts():
+    temperature = np.random.default_rng(1).normal(20, 5, 8760)
+    extended = np.concatenate([temperature, temperature])
+    means = [extended[start:start + 168].mean() for start in range(0, 8760, 24)]
+
+    week_start, week_mean = hottest_week_index(temperature)
+
+    assert week_start == 24 * int(np.argmax(means))
+    assert week_mean == pytest.approx(max(means))
+
+
+def test_hottest_week_index_uses_the_following_hours_instead_of_wrapping():
+    temperature = np.full(8760, 10.0)
+    temperature[:24] = temperature[-24:] = 30
+
+    #A typical year wraps around, so the first week holding both the last and the first day is the hottest
+    assert hottest_week_index(temperature)[0] == 8760 - 6 * 24
+    #In a record, the last days of a year run into the next year, and the last year has no following hours
+    assert hottest_week_index(temperature, np.full(167, 10.0))[0] == 0
+    assert hottest_week_index(temperature, np.empty(0))[0] == 0
+
+
+def test_hottest_week_index_rejects_data_shorter_than_a_week():
+    with pytest.raises(ValueError):
+        hottest_week_index(np.ones(100), np.empty(0))
+
+
+def test_scan_years_with_a_partial_final_year(write_epw):
+    path = write_epw(start=datetime(2001, 1, 1), hours=2 * 8760 + 24)
+
+    years = scan_years(path)
+
+    assert years['year'].tolist() == [2001, 2002, 2003]
+    assert years['hours'].tolist() == [8760, 8760, 24]
+    assert pd.isna(years['hottest_week_start'].iloc[2])
+    assert np.isnan(years['hottest_week_mean'].iloc[2])
+    assert hottest_year(years) in (2001, 2002)
+
+    #Every year matches a scan of its own hours followed by the next year's
+    file = epw()
+    file.read(path)
+    temperature = file.dataframe['Dry Bulb Temperature'].to_numpy(dtype=float)
+    for k in range(2):
+        start, mean = hottest_week_index(temperature[k * 8760:(k + 1) * 8760], temperature[(k + 1) * 8760:])
+        assert years['hottest_week_mean'].iloc[k] == round(mean, 2)
+
+
+def test_scan_years_keeps_only_the_temperatures_and_dates_of_the_previous_year(write_epw, monkeypatch):
+    path = write_epw(start=datetime(2001, 1, 1), hours=2 * 8760)
+    scanned = []
+    def year_statistics(year, data, following):
+        scanned.append((year, list(data.columns), len(following)))
+        return {}
+    monkeypatch.setattr(app_weather_years, 'year_statistics', year_statistics)
+
+    scan_years(path)
+
+    assert scanned == [(2001, ['Month', 'Day', 'Dry Bulb Temperature'], 167), (2002, ['Month', 'Day', 'Dry Bulb Temperature'], 0)]
+
+
+def test_export_years_sets_the_data_period_of_every_year(write_epw, tmp_path):
+    path = write_epw(start=datetime(2003, 1, 1), hours=8760 + 8784 + 24)
+
+    output_files = export_years(path, [2004, 2005], str(tmp_path / 'years'))
+
+    leap_year, partial_year = epw(), epw()
+    leap_year.read(output_files[0])
+    partial_year.read(output_files[1])
+    assert leap_year.headers['DATA PERIODS'][3:] == ['Thursday', ' 1/ 1', '12/31']
+    assert leap_year.headers['HOLIDAYS/DAYLIGHT SAVINGS'][0] == 'Yes'
+    assert len(leap_year.dataframe) == 8784
+    assert partial_year.headers['DATA PERIODS'][3:] == ['Saturday', ' 1/ 1', ' 1/ 1']
+    assert partial_year.headers['HOLIDAYS/DAYLIGHT SAVINGS'][0] == 'No'